@@ -0,0 +1,140 @@
+"""Latency of the headless query API (``streamlit_app/api.py``).
+
+Writes synthetic dashboard data (``synthetic.write_dashboard``), starts the
+API server in its own process and sends it random queries over one
+keep-alive connection: cluster lookups, filtered and paginated cluster lists
+(JSON and Arrow), bounding boxes, top-N rollups and ``If-None-Match``
+revalidations. Reports p50/p99 per query kind as seen by the client and as
+spent in the handler (``Server-Timing``):
+
+    python benchmarks/bench_api.py --rows 1000000 --requests 2000
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, os.path.join(ROOT, "streamlit_app"))
+
+import data_store  # noqa: E402
+import synthetic  # noqa: E402
+
+API = os.path.join(ROOT, "streamlit_app", "api.py")
+
+
+def start_server(data_dir):
+    process = subprocess.Popen(
+        [sys.executable, API, "--data-dir", data_dir, "--port", "0"], stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()  # "serving ... on http://host:port" once ready
+    host, port = line.rsplit("//", 1)[1].strip().split(":")
+    return process, host, int(port)
+
+
+def _query(params):
+    return urlencode({name: value for name, value in params.items() if value is not None})
+
+
+def queries(filters, cluster_ids, rng):
+    """Yield ``(kind, path, headers)`` forever."""
+    zones = [None] + filters["zones"]
+    organizations = [None] + filters["organizations"]
+    south, west, north, east = synthetic.CITY_BBOX
+    while True:
+        kind = rng.choice(["cluster", "clusters", "clusters_arrow", "bbox", "top", "not_modified"])
+        if kind == "cluster":
+            yield kind, f"/clusters/{rng.choice(cluster_ids)}", {}
+        elif kind in ("clusters", "clusters_arrow"):
+            params = {"zone": rng.choice(zones), "organization": rng.choice(organizations)}
+            if rng.random() < 0.5:
+                params["min_num_times"] = rng.randint(1, 10)
+            params["limit"] = rng.choice([10, 100, 500])
+            params["offset"] = rng.choice([0, 0, 100, 1000])
+            if kind == "clusters_arrow":
+                params["format"] = "arrow"
+            yield kind, "/clusters?" + _query(params), {}
+        elif kind == "bbox":
+            # a map view of roughly 1-5 km
+            lat, long, size = rng.uniform(south, north), rng.uniform(west, east), rng.uniform(0.01, 0.05)
+            bbox = f"{lat - size / 2},{long - size / 2},{lat + size / 2},{long + size / 2}"
+            yield kind, "/clusters?" + _query({"bbox": bbox, "limit": 100}), {}
+        elif kind == "top":
+            if rng.random() < 0.5:
+                path = "/top/zones?" + _query({"n": 10, "organization": rng.choice(organizations)})
+            else:
+                path = "/top/organizations?" + _query({"n": 10, "zone": rng.choice(zones)})
+            yield kind, path, {}
+        else:
+            yield kind, "/filters", {"If-None-Match": filters["etag"]}
+
+
+def get(connection, path, headers):
+    start = time.perf_counter()
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    seconds = time.perf_counter() - start
+    timing = response.getheader("Server-Timing", "app;dur=0").split("dur=")[1]
+    return response, body, seconds, float(timing) / 1000
+
+
+def bench(n_rows, n_requests, work_dir, seed=0):
+    shutil.rmtree(work_dir, ignore_errors=True)
+    n_clusters, _ = synthetic.write_dashboard(work_dir, n_rows, seed)
+    data_store.ensure_store(work_dir)
+    cluster_ids = data_store.load_clusters(work_dir)["cluster_id"].tolist()
+
+    process, host, port = start_server(work_dir)
+    try:
+        connection = http.client.HTTPConnection(host, port)
+        response, body, _, _ = get(connection, "/filters", {})
+        filters = {**json.loads(body), "etag": response.getheader("ETag")}
+
+        rng = random.Random(seed)
+        times = {}
+        stream = queries(filters, cluster_ids, rng)
+        for _ in range(50):  # warm up
+            get(connection, *next(stream)[1:])
+        for _ in range(n_requests):
+            kind, path, headers = next(stream)
+            response, body, seconds, server_seconds = get(connection, path, headers)
+            assert response.status == (304 if kind == "not_modified" else 200), (path, response.status, body)
+            times.setdefault(kind, []).append((seconds, server_seconds))
+    finally:
+        process.terminate()
+        process.wait()
+    shutil.rmtree(work_dir)
+
+    result = {"rows": n_rows, "clusters": n_clusters, "requests": n_requests}
+    for kind, samples in sorted(times.items()):
+        client, server = np.array(samples).T * 1000
+        result[kind] = {
+            "requests": len(samples),
+            "p50_ms": float(np.percentile(client, 50)),
+            "p99_ms": float(np.percentile(client, 99)),
+            "server_p50_ms": float(np.percentile(server, 50)),
+            "server_p99_ms": float(np.percentile(server, 99)),
+        }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic reports behind the dashboard")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "bench_api"))
+    args = parser.parse_args()
+
+    print(json.dumps(bench(args.rows, args.requests, args.work_dir), indent=2))
@@ -0,0 +1,86 @@
+"""Per-report cost of ``ClusterAssigner`` on a synthetic clustered city.
+
+Clusters synthetic coordinates with ``dbscan``, splits every location cluster
+into a few text sub-clusters with random unit embeddings, fits the assigner,
+checks that core points and their own embeddings are assigned back to their
+cluster, then times one report at a time and whole batches:
+
+    python benchmarks/bench_assign.py --points 200000 --queries 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_dbscan import synthetic_coords  # noqa: E402
+from pipeline.assign import ClusterAssigner  # noqa: E402
+from pipeline.spatial_cluster import dbscan  # noqa: E402
+
+EMBEDDING_DIM = 768  # comment + type embedding of paraphrase-multilingual-MiniLM-L12-v2
+
+
+def synthetic_clusters(n_points, seed=0):
+    rng = np.random.default_rng(seed)
+    coords = synthetic_coords(n_points, seed)
+    labels = dbscan(coords)
+    text = rng.integers(0, 3, n_points)
+    topics = rng.normal(size=(3, EMBEDDING_DIM))
+    embeddings = topics[text] + rng.normal(scale=0.3, size=(n_points, EMBEDDING_DIM))
+
+    cluster_ids = np.array([f"{c}_{t}" for c, t in zip(labels, text)], dtype=object)
+    noise = np.flatnonzero(labels < 0)
+    cluster_ids[noise] = [f"noise_{i + 1}" for i in range(len(noise))]
+    return coords, cluster_ids, embeddings.astype(np.float32)
+
+
+def bench(n_points, n_queries):
+    coords, cluster_ids, embeddings = synthetic_clusters(n_points)
+    result = {"points": n_points}
+
+    start = time.perf_counter()
+    assigner = ClusterAssigner.fit(coords, cluster_ids, embeddings)
+    result["fit_seconds"] = time.perf_counter() - start
+    result["core_points"] = len(assigner.core_coords)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "assigner.npz")
+        assigner.save(path)
+        assigner = ClusterAssigner.load(path)
+
+    # Core points are their own nearest core point
+    rng = np.random.default_rng(1)
+    spatial = np.array([-1 if c.startswith("noise") else int(c.split("_")[0]) for c in cluster_ids])
+    sample = rng.choice(n_points, n_queries)
+    got = assigner.spatial_clusters(coords[sample])
+    is_core = np.isin(np.radians(coords[sample]), assigner.core_coords).all(axis=1)
+    assert np.array_equal(got[is_core], spatial[sample][is_core])
+    assert (got[spatial[sample] < 0] < 0).mean() > 0.9  # noise mostly stays noise
+
+    start = time.perf_counter()
+    for i in sample:
+        assigner.assign(coords[i, 0], coords[i, 1], embeddings[i])
+    result["single_report_ms"] = (time.perf_counter() - start) / n_queries * 1000
+
+    start = time.perf_counter()
+    assigned = assigner.assign_batch(coords[sample], embeddings[sample])
+    result["batch_report_ms"] = (time.perf_counter() - start) / n_queries * 1000
+    clustered = spatial[sample] >= 0
+    result["clustered_same_id"] = float(
+        np.mean(np.array(assigned)[clustered] == cluster_ids[sample][clustered])
+    )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.points, args.queries), indent=2))
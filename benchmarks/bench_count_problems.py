@@ -0,0 +1,108 @@
+"""Columnar recurrence counting vs the per-cluster Python loop / RDD path.
+
+NumPy (default): the ``merge_occurrences`` kernel against the notebook's
+per-cluster loop over the same sorted arrays; the sort both need is timed
+separately. The loop is skipped above ``--loop-limit`` rows.
+
+Spark (``--spark``): ``count_problems_spark`` (applyInPandas) against the
+notebook's ``rdd.groupBy`` path on a generated DataFrame.
+
+    python benchmarks/bench_count_problems.py --rows 1000000,10000000,50000000
+    python benchmarks/bench_count_problems.py --rows 1000000,10000000 --spark
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.recurrence import (  # noqa: E402
+    count_problems_rdd,
+    count_problems_rows,
+    count_problems_spark,
+    merge_occurrences,
+)
+
+DAY = 24 * 3600 * 10**9
+
+
+def synthetic_arrays(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_clusters = max(n_rows // 20, 1)
+    groups = rng.zipf(1.6, n_rows) % n_clusters
+    timestamps = rng.integers(0, 730 * DAY, n_rows)
+    last_activities = timestamps + rng.exponential(5 * DAY, n_rows).astype(np.int64)
+    return groups, timestamps, last_activities
+
+
+def bench_numpy(n_rows, loop_limit):
+    groups, timestamps, last_activities = synthetic_arrays(n_rows)
+    result = {"rows": n_rows}
+
+    # Both paths need the rows sorted by (cluster, timestamp, last_activity)
+    start = time.perf_counter()
+    order = np.lexsort((last_activities, timestamps, groups))
+    g, ts, la = groups[order], timestamps[order], last_activities[order]
+    result["sort_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first, count, _ = merge_occurrences(g, ts, la)
+    result["columnar_seconds"] = time.perf_counter() - start
+
+    if n_rows <= loop_limit:
+        start = time.perf_counter()
+        bounds = np.r_[first, len(g)]
+        expected = [
+            count_problems_rows(zip(ts[a:b].tolist(), la[a:b].tolist()))
+            for a, b in zip(bounds[:-1], bounds[1:])
+        ]
+        result["python_loop_seconds"] = time.perf_counter() - start
+        assert np.array_equal(count, expected)
+    return result
+
+
+def bench_spark(n_rows):
+    from pyspark.sql import SparkSession
+    from pyspark.sql import functions as F
+
+    spark = SparkSession.builder.master("local[*]").appName("bench").getOrCreate()
+    n_clusters = max(n_rows // 20, 1)
+    start_ts = F.lit(1627776000)  # 2021-08-01
+    df = (
+        spark.range(n_rows)
+        .withColumn("cluster_id", F.concat((F.rand(1) * n_clusters).cast("long"), F.lit("_0")))
+        .withColumn("ts", start_ts + (F.rand(2) * 730 * 86400).cast("long"))
+        .withColumn("timestamp", F.col("ts").cast("timestamp"))
+        .withColumn("last_activity", (F.col("ts") - F.log(F.rand(3)) * 5 * 86400).cast("timestamp"))
+        .withColumn("state", F.lit("เสร็จสิ้น"))
+        .drop("id", "ts")
+        .cache()
+    )
+    df.count()
+
+    result = {"rows": n_rows}
+    for name, fn in [("spark_columnar_seconds", count_problems_spark), ("spark_rdd_seconds", count_problems_rdd)]:
+        start = time.perf_counter()
+        fn(df).write.format("noop").mode("overwrite").save()
+        result[name] = time.perf_counter() - start
+    df.unpersist()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="1000000,10000000,50000000")
+    parser.add_argument("--loop-limit", type=int, default=10000000)
+    parser.add_argument("--spark", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.rows.split(",")]
+    results = [
+        bench_spark(n) if args.spark else bench_numpy(n, args.loop_limit) for n in sizes
+    ]
+    print(json.dumps(results, indent=2))
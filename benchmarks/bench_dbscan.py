@@ -0,0 +1,65 @@
+"""Tile-partitioned DBSCAN vs the notebook's single-process run.
+
+Generates report coordinates around Bangkok (dense hot spots of repeated
+reports plus scattered noise), checks that ``partitioned_dbscan`` gives the
+same labels as ``dbscan`` and times both for several pool sizes:
+
+    python benchmarks/bench_dbscan.py --points 200000,1000000 --jobs 1,2,4,8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.spatial_cluster import dbscan, partitioned_dbscan  # noqa: E402
+
+BANGKOK_BBOX = (13.5, 100.3, 14.0, 100.95)  # south, west, north, east
+
+
+def synthetic_coords(n_points, seed=0):
+    rng = np.random.default_rng(seed)
+    south, west, north, east = BANGKOK_BBOX
+    n_spots = max(n_points // 50, 1)
+    spots = np.c_[rng.uniform(south, north, n_spots), rng.uniform(west, east, n_spots)]
+    n_noise = n_points // 5
+    # ~50 reports spread ~10 m around each hot spot
+    clustered = spots[rng.integers(0, n_spots, n_points - n_noise)]
+    clustered += rng.normal(0, 0.0001, clustered.shape)
+    noise = np.c_[rng.uniform(south, north, n_noise), rng.uniform(west, east, n_noise)]
+    coords = np.r_[clustered, noise]
+    return coords[rng.permutation(len(coords))]
+
+
+def bench(n_points, jobs, tile_size):
+    coords = synthetic_coords(n_points)
+    result = {"points": n_points}
+
+    start = time.perf_counter()
+    expected = dbscan(coords)
+    result["single_process_seconds"] = time.perf_counter() - start
+    result["clusters"] = int(expected.max()) + 1
+
+    for n_jobs in jobs:
+        start = time.perf_counter()
+        labels = partitioned_dbscan(coords, tile_size=tile_size, n_jobs=n_jobs)
+        result[f"partitioned_{n_jobs}_jobs_seconds"] = time.perf_counter() - start
+        assert np.array_equal(labels, expected)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", default="200000,1000000")
+    parser.add_argument("--jobs", default="1,2,4,8")
+    parser.add_argument("--tile-size", type=float, default=0.02)
+    args = parser.parse_args()
+
+    jobs = [int(n) for n in args.jobs.split(",")]
+    results = [bench(int(n), jobs, args.tile_size) for n in args.points.split(",")]
+    print(json.dumps(results, indent=2))
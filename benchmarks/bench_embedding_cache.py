@@ -0,0 +1,67 @@
+"""Embedding cache hit rate and time saved over repeated pipeline runs.
+
+Encodes synthetic comments (with the duplicates real reports have) and their
+``type`` strings through ``report_embeddings`` twice against a fresh
+``EmbeddingCache``: the cold run encodes each distinct text once, the warm run
+should be all hits. Both must equal encoding without the cache. Needs
+sentence-transformers and the notebook's model:
+
+    python benchmarks/bench_embedding_cache.py --reports 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.assign import report_embeddings  # noqa: E402
+from pipeline.embedding_cache import EmbeddingCache  # noqa: E402
+
+MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+TYPES = ["ถนน", "ทางเท้า", "น้ำท่วม", "ไฟฟ้า", "ความสะอาด", "ท่อระบายน้ำ", "จราจร", "แสงสว่าง"]
+WORDS = ["ไฟ", "ดับ", "ถนน", "เป็น", "หลุม", "ขยะ", "เยอะ", "น้ำ", "ท่วม", "ซอย", "หน้า", "บ้าน", "ทางเท้า", "ชำรุด"]
+
+
+def synthetic_reports(n_reports, seed=0):
+    rng = np.random.default_rng(seed)
+    n_distinct = max(n_reports // 3, 1)  # follow-ups repeat earlier comments
+    distinct = [" ".join(rng.choice(WORDS, rng.integers(3, 12))) for _ in range(n_distinct)]
+    comments = [distinct[i] for i in rng.integers(0, n_distinct, n_reports)]
+    types = [
+        "{" + ",".join(rng.choice(TYPES, rng.integers(1, 3), replace=False)) + "}"
+        for _ in range(n_reports)
+    ]
+    return comments, types
+
+
+def bench(n_reports):
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(MODEL_NAME)
+    comments, types = synthetic_reports(n_reports)
+
+    start = time.perf_counter()
+    expected = report_embeddings(model, comments, types)
+    results = {"reports": n_reports, "uncached_seconds": time.perf_counter() - start}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in ["cold", "warm"]:
+            cache = EmbeddingCache(tmp, MODEL_NAME)
+            start = time.perf_counter()
+            embeddings = report_embeddings(model, comments, types, cache=cache)
+            results[run] = dict(cache.stats(), seconds=time.perf_counter() - start)
+            np.testing.assert_allclose(embeddings, expected, atol=1e-5)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.reports), indent=2))
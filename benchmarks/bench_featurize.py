@@ -0,0 +1,63 @@
+"""Comments per second of the per-cluster loop vs the corpus-wide ``featurize``.
+
+The per-cluster path embeds, cleans and NER-tags every spatial cluster on its
+own like ``traffy-cluster.ipynb``; ``featurize`` does the whole corpus in
+fixed-size batches with NER in a process pool. Needs sentence-transformers
+and PyThaiNLP's ``thainer`` model:
+
+    python benchmarks/bench_featurize.py --reports 20000 --jobs 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_embedding_cache import synthetic_reports  # noqa: E402
+from pipeline.featurize import MODEL_NAME, extract_named_entities, featurize  # noqa: E402
+from pipeline.text_clean import clean_sentences, clean_type  # noqa: E402
+
+
+def per_cluster(df, model, ner):
+    # The notebook's loop body, without the clustering itself
+    for _, target_df in df.groupby("cluster", sort=False):
+        texts = target_df["comment"].tolist()
+        model.encode(texts, show_progress_bar=False)
+        model.encode(target_df["type"].map(clean_type).tolist(), show_progress_bar=False)
+        [extract_named_entities(text, ner) for text in clean_sentences(texts, True)]
+
+
+def bench(n_reports, n_jobs, batch_size):
+    from pythainlp.tag import NER
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(MODEL_NAME)
+    comments, types = synthetic_reports(n_reports)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"comment": comments, "type": types, "cluster": rng.zipf(1.6, n_reports) % 2000})
+
+    start = time.perf_counter()
+    per_cluster(df, model, NER("thainer"))
+    seconds = time.perf_counter() - start
+    result = {"reports": n_reports, "per_cluster_comments_per_second": n_reports / seconds}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = featurize(df, model, tmp, batch_size=batch_size, n_jobs=n_jobs)
+    result["featurize_comments_per_second"] = stats["comments_per_second"]
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=20000)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=4096)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.reports, args.jobs, args.batch_size), indent=2))
@@ -0,0 +1,107 @@
+"""Streaming ingestion vs the notebook's rewrite-then-load of the raw dump.
+
+Writes a messy synthetic ``bangkok_traffy.csv`` with ``synthetic.write_raw_csv``
+(short rows, rows with too many fields, multi-line comments), then runs each
+path in a fresh interpreter so peak memory can be compared:
+
+- ``notebook``: copy the file with ``csv.reader``/``csv.writer`` dropping short
+  rows, load the copy whole, ``dropna``, split ``coords``, clean comments;
+- ``ingest``: ``pipeline.ingest`` in chunks, with ``--jobs`` processes.
+
+Both must keep the same reports with the same cleaned comments and
+coordinates:
+
+    python benchmarks/bench_ingest.py --rows 200000,1000000 --jobs 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+from synthetic import write_raw_csv  # noqa: E402
+
+NOTEBOOK = """
+import csv, json, resource, sys, time
+import pandas as pd
+sys.path.insert(0, {root!r})
+from pipeline.ingest import REQUIRED_COLUMNS
+from pipeline.text_clean import clean_comment
+
+start = time.perf_counter()
+with open({raw!r}, 'r', encoding='utf-8', errors='replace') as infile, \\
+     open({copy!r}, 'w', encoding='utf-8', newline='') as outfile:
+    writer = csv.writer(outfile)
+    for row in csv.reader(infile):
+        if len(row) > 1:
+            writer.writerow(row)
+df = pd.read_csv({copy!r}, dtype=str, keep_default_na=False, na_values=[""], on_bad_lines="skip")
+df = df.dropna(subset=REQUIRED_COLUMNS)
+parts = df["coords"].str.split(",", expand=True)
+df["longitude"] = pd.to_numeric(parts[0], errors="coerce")
+df["latitude"] = pd.to_numeric(parts[1], errors="coerce")
+df["comment"] = df["comment"].map(clean_comment)
+seconds = time.perf_counter() - start
+df[["ticket_id", "comment", "latitude", "longitude"]].to_parquet({out!r})
+print(json.dumps({{"seconds": seconds, "rows": len(df),
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+INGEST = """
+import json, resource, sys
+sys.path.insert(0, {root!r})
+from pipeline.ingest import ingest
+
+stats = ingest({raw!r}, {out!r}, n_jobs={jobs})
+print(json.dumps({{"seconds": stats["seconds"], "rows": stats["rows_written"],
+    "mb_per_second": stats["mb_per_second"],
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def run(template, **kwargs):
+    code = template.format(root=ROOT, **kwargs)
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench(n_rows, jobs, work_dir):
+    sys.path.insert(0, ROOT)
+    from pipeline.storage import read_stage
+
+    os.makedirs(work_dir, exist_ok=True)
+    raw = os.path.join(work_dir, "bangkok_traffy.csv")
+    write_raw_csv(raw, n_rows, messy=True)
+    size = os.path.getsize(raw)
+    result = {"rows": n_rows, "mb": size / 1e6}
+
+    notebook_out = os.path.join(work_dir, "notebook.parquet")
+    result["notebook"] = run(NOTEBOOK, raw=raw, copy=os.path.join(work_dir, "cleaned_traffy.csv"), out=notebook_out)
+    result["notebook"]["mb_per_second"] = size / 1e6 / result["notebook"]["seconds"]
+    stage_out = os.path.join(work_dir, "reports")
+    result["ingest"] = run(INGEST, raw=raw, out=stage_out, jobs=jobs)
+
+    columns = ["ticket_id", "comment", "latitude", "longitude"]
+    expected = pd.read_parquet(notebook_out).reset_index(drop=True)
+    actual = read_stage(stage_out, columns=columns)
+    pd.testing.assert_frame_equal(actual, expected[columns], check_dtype=False)
+
+    shutil.rmtree(work_dir)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="200000,1000000")
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--work-dir", default="/tmp/bench_ingest")
+    args = parser.parse_args()
+
+    results = [bench(int(n), args.jobs, args.work_dir) for n in args.rows.split(",")]
+    print(json.dumps(results, indent=2))
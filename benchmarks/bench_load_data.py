@@ -0,0 +1,83 @@
+"""Startup time and memory of the dashboard loaders: CSV parsing vs Arrow store.
+
+Each loader runs in a fresh interpreter so the numbers reflect a cold start:
+
+    python benchmarks/bench_load_data.py --data-dir streamlit_app --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "streamlit_app")
+
+CHILD = """
+import json, sys, time
+
+
+def peak_rss_mb():
+    # VmHWM, not ru_maxrss: the latter carries over the parent's peak across exec
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+interpreter = peak_rss_mb()
+sys.path.insert(0, {app_dir!r})
+import data_store
+
+before = peak_rss_mb()
+start = time.perf_counter()
+df, report_df = getattr(data_store, {loader!r})({data_dir!r})
+seconds = time.perf_counter() - start
+after = peak_rss_mb()
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_mb": after,
+    "imports_rss_mb": before - interpreter,
+    "rss_delta_mb": after - before,  # what loading the data added
+    "rows": len(df) + len(report_df),
+}}))
+"""
+
+
+def run_loader(loader, data_dir):
+    code = CHILD.format(app_dir=os.path.abspath(APP_DIR), loader=loader, data_dir=data_dir)
+    out = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench(data_dir, repeat):
+    sys.path.insert(0, os.path.abspath(APP_DIR))
+    import data_store
+
+    # Build outside the timed runs, the store is a one-off conversion
+    data_store.ensure_store(data_dir)
+
+    results = {}
+    for loader in ["load_csv", "load_store"]:
+        runs = [run_loader(loader, data_dir) for _ in range(repeat)]
+        results[loader] = {
+            "seconds_median": statistics.median(r["seconds"] for r in runs),
+            "rss_mb_median": statistics.median(r["rss_mb"] for r in runs),
+            "rss_delta_mb_median": statistics.median(r["rss_delta_mb"] for r in runs),
+            "imports_rss_mb_median": statistics.median(r["imports_rss_mb"] for r in runs),
+            "rows": runs[0]["rows"],
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data-dir", default=APP_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = bench(os.path.abspath(args.data_dir), args.repeat)
+    print(json.dumps(results, indent=2))
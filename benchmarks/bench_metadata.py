@@ -0,0 +1,216 @@
+"""Cluster ids and metadata vs the notebook's windows and joins.
+
+pandas (default): ``assign_cluster_ids`` + ``cluster_metadata`` against a
+port of the notebook's steps (row numbers, mean location, noise comments,
+organization ranking, one join each), checked for the same result.
+
+Spark (``--spark``): ``assign_cluster_ids_spark`` + ``cluster_metadata_spark``
+against the notebook's cells (``row_number`` over an unpartitioned window),
+both written to the ``noop`` sink; the ids are checked to be the same.
+
+    python benchmarks/bench_metadata.py --rows 100000,1000000
+    python benchmarks/bench_metadata.py --rows 1000000,10000000 --spark
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.metadata import (  # noqa: E402
+    METADATA_COLUMNS,
+    assign_cluster_ids,
+    assign_cluster_ids_spark,
+    cluster_metadata,
+    cluster_metadata_spark,
+)
+
+ORGANIZATIONS = ["เขตบางรัก", "เขตปทุมวัน", "เขตจตุจักร", "การไฟฟ้านครหลวง", "สำนักการโยธา"]
+
+
+def synthetic_reports(n_rows, seed=0):
+    """Clustered reports (``df_with_clustering``) and their ``cluster_info``."""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(n_rows // 20, 1)
+    cluster = rng.integers(0, n_clusters, n_rows)
+    cluster[rng.random(n_rows) < 0.2] = -1
+    text_cluster = rng.integers(0, 3, n_rows).astype(float)
+    text_cluster[cluster == -1] = np.nan
+    text_cluster[rng.random(n_rows) < 0.02] = np.nan  # skipped for an empty vocabulary
+    df = pd.DataFrame(
+        {
+            "cluster": cluster,
+            "text_cluster": text_cluster,
+            "comment": [f"comment {i}" for i in range(n_rows)],
+            "latitude": 13.7 + rng.normal(0, 0.05, n_rows),
+            "longitude": 100.5 + rng.normal(0, 0.05, n_rows),
+            "organization": rng.choice(ORGANIZATIONS, n_rows),
+        }
+    )
+    pairs = df.loc[df["text_cluster"].notna(), ["cluster", "text_cluster"]].drop_duplicates()
+    cluster_info = pd.DataFrame(
+        {
+            "cluster_id": pairs["cluster"].to_numpy(),
+            "text_cluster": pairs["text_cluster"].to_numpy(),
+            "cluster_desc": [f"desc {c}_{int(t)}" for c, t in zip(pairs["cluster"], pairs["text_cluster"])],
+        }
+    )
+    return df, cluster_info
+
+
+# ------------------------- NOTEBOOK -----------------------------
+
+
+def reference_pandas(df, cluster_info):
+    df = df.copy()
+    row_number = pd.Series(np.arange(1, len(df) + 1), index=df.index)
+    noise = (df["cluster"].astype(str) == "-1") | df["text_cluster"].isna()
+    df["cluster"] = df["cluster"].astype(str).where(~noise, "noise_" + row_number.astype(str))
+    df["cluster_id"] = [
+        c if pd.isna(t) else f"{c}_{int(t)}" for c, t in zip(df["cluster"], df["text_cluster"])
+    ]
+    df = df.drop(columns=["cluster", "text_cluster"])
+
+    info = cluster_info.copy()
+    info["cluster_id"] = [f"{c}_{int(t)}" for c, t in zip(info["cluster_id"], info["text_cluster"])]
+    info = info.drop(columns="text_cluster")
+
+    mean_coords = df.groupby("cluster_id").agg(lat=("latitude", "mean"), lon=("longitude", "mean")).reset_index()
+    info = info.merge(mean_coords, on="cluster_id", how="right")
+
+    noise_desc = (
+        df[df["cluster_id"].str.startswith("noise_")]
+        .groupby("cluster_id")["comment"].first().rename("noise_comment").reset_index()
+    )
+    filled = info.merge(noise_desc, on="cluster_id", how="left")
+    filled["cluster_desc"] = filled["cluster_desc"].fillna(filled["noise_comment"])
+    filled = filled.drop(columns="noise_comment")
+
+    counts = df.groupby(["cluster_id", "organization"]).size().rename("count").reset_index()
+    counts = counts.sort_values(["cluster_id", "count"], ascending=[True, False], kind="stable")
+    max_organization = counts.drop_duplicates("cluster_id")[["cluster_id", "organization"]]
+    filled = filled.merge(max_organization, on="cluster_id", how="left")
+    return df, filled[METADATA_COLUMNS]
+
+
+def reference_spark(df, cluster_info):
+    from pyspark.sql import functions as F
+    from pyspark.sql.window import Window
+
+    df = df.withColumn("row_id", F.monotonically_increasing_id())
+    window_spec = Window.orderBy("row_id")
+    df = df.withColumn(
+        "cluster",
+        F.when(
+            (F.col("cluster") == "-1") | (F.col("text_cluster").isNull()),
+            F.concat(F.lit("noise_"), F.row_number().over(window_spec)),
+        ).otherwise(F.col("cluster")),
+    ).drop("row_id")
+    df = df.withColumn("cluster_id", F.concat_ws("_", F.col("cluster"), F.col("text_cluster").cast("int")))
+    df = df.drop("cluster", "text_cluster")
+
+    cluster_info = cluster_info.withColumn(
+        "cluster_id", F.concat_ws("_", F.col("cluster_id"), F.col("text_cluster").cast("int"))
+    ).drop("text_cluster")
+    mean_coords = df.groupBy("cluster_id").agg(F.mean("latitude").alias("lat"), F.mean("longitude").alias("lon"))
+    cluster_info = cluster_info.join(mean_coords, on="cluster_id", how="right")
+
+    noise_desc = (
+        df.filter(F.col("cluster_id").startswith("noise_"))
+        .groupBy("cluster_id")
+        .agg(F.first("comment", ignorenulls=True).alias("noise_comment"))
+    )
+    filled = (
+        cluster_info.join(noise_desc, on="cluster_id", how="left")
+        .withColumn(
+            "cluster_desc",
+            F.when(F.col("cluster_desc").isNull(), F.col("noise_comment")).otherwise(F.col("cluster_desc")),
+        )
+        .drop("noise_comment")
+    )
+    counts = df.groupBy("cluster_id", "organization").count()
+    max_organization = counts.withColumn(
+        "rank", F.row_number().over(Window.partitionBy("cluster_id").orderBy(F.col("count").desc()))
+    ).filter(F.col("rank") == 1).drop("rank", "count")
+    filled = filled.join(max_organization.select("cluster_id", "organization"), on="cluster_id", how="left")
+    return df, filled
+
+
+# ------------------------- BENCH -----------------------------
+
+
+def _same_metadata(a, b):
+    # organization ties are broken arbitrarily by both, so compare the rest
+    columns = ["cluster_id", "cluster_desc", "lat", "lon"]
+    a = a[columns].sort_values("cluster_id").reset_index(drop=True)
+    b = b[columns].sort_values("cluster_id").reset_index(drop=True)
+    pd.testing.assert_frame_equal(a, b, check_dtype=False)
+
+
+def bench_pandas(n_rows):
+    df, cluster_info = synthetic_reports(n_rows)
+    result = {"rows": n_rows}
+
+    start = time.perf_counter()
+    expected_df, expected = reference_pandas(df, cluster_info)
+    result["notebook_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with_ids = assign_cluster_ids(df)
+    metadata = cluster_metadata(with_ids, cluster_info)
+    result["pipeline_seconds"] = time.perf_counter() - start
+
+    assert with_ids["cluster_id"].tolist() == expected_df["cluster_id"].tolist()
+    _same_metadata(metadata, expected)
+    result["clusters"] = len(metadata)
+    return result
+
+
+def pipeline_spark(df, cluster_info):
+    with_ids = assign_cluster_ids_spark(df)
+    return with_ids, cluster_metadata_spark(with_ids, cluster_info)
+
+
+def bench_spark(n_rows, path):
+    from pyspark.sql import SparkSession
+
+    spark = SparkSession.builder.master("local[*]").appName("bench").getOrCreate()
+    df, cluster_info = synthetic_reports(n_rows)
+    df.to_parquet(path, index=False)  # a file scan keeps the partitions stable
+    reports = spark.read.parquet(path)
+    info = spark.createDataFrame(cluster_info)
+
+    result = {"rows": n_rows, "partitions": reports.rdd.getNumPartitions()}
+    for name, fn in [
+        ("spark_notebook_seconds", reference_spark),
+        ("spark_pipeline_seconds", pipeline_spark),
+    ]:
+        start = time.perf_counter()
+        ids, metadata = fn(reports, info)
+        ids.write.format("noop").mode("overwrite").save()
+        metadata.write.format("noop").mode("overwrite").save()
+        result[name] = time.perf_counter() - start
+
+    expected_ids = reference_spark(reports, info)[0].select("cluster_id")
+    pipeline_ids = assign_cluster_ids_spark(reports).select("cluster_id")
+    assert expected_ids.exceptAll(pipeline_ids).count() == 0
+    assert pipeline_ids.exceptAll(expected_ids).count() == 0
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="100000,1000000")
+    parser.add_argument("--spark", action="store_true")
+    parser.add_argument("--path", default="/tmp/bench_metadata.parquet")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.rows.split(",")]
+    results = [bench_spark(n, args.path) if args.spark else bench_pandas(n) for n in sizes]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,129 @@
+"""Zone point extraction: the notebook's whole-bbox scan vs tiled streaming.
+
+Writes a synthetic Overpass JSON extract of Bangkok (tags drawn from the zone
+keywords and from unrelated OSM tags), then extracts zone points with the
+notebook's ``extract_tagged_zone_points`` on one whole-bbox response and with
+``iter_tiled_elements`` + ``ZoneMatcher`` over tiles, both served by
+``local_fetch``; both must give the same points:
+
+    python benchmarks/bench_osm_zones.py --elements 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.osm_zones import (  # noqa: E402
+    extract_zone_points,
+    iter_tiled_elements,
+    local_fetch,
+    write_zone_points,
+)
+from pipeline.zones import BANGKOK_BBOX, ZONES  # noqa: E402
+
+OTHER_TAGS = {
+    "name": ["ซอยสุขุมวิท 11", "Wat Pho", "7-Eleven", "บ้านเลขที่ 5", "Central World"],
+    "highway": ["residential", "primary", "footway", "bus_stop"],
+    "amenity": ["bench", "toilets", "cafe", "Restaurant", "school", "place_of_worship"],
+    "building": ["yes", "house", "commercial", "apartments"],
+    "source": ["survey", "bing"],
+}
+
+
+def reference_points(data):
+    # extract_tagged_zone_points from api_for_zone_module.ipynb
+    points = []
+    for el in data.get("elements", []):
+        tags = el.get("tags", {})
+        lat = el.get("lat") or el.get("center", {}).get("lat")
+        lon = el.get("lon") or el.get("center", {}).get("lon")
+        if lat is None or lon is None:
+            continue
+        for zone, keywords in ZONES.items():
+            if any(
+                kw in str(tags.get(k, "")).lower() or k.lower() in keywords
+                for k, v in tags.items()
+                for kw in keywords
+            ):
+                points.append((lat, lon, zone))
+                break
+    return points
+
+
+def synthetic_extract(n_elements, seed=0):
+    rng = random.Random(seed)
+    keywords = [kw for words in ZONES.values() for kw in words]
+    south, west, north, east = BANGKOK_BBOX
+    elements = []
+    for i in range(n_elements):
+        tags = {}
+        for _ in range(rng.randint(0, 4)):
+            key = rng.choice(list(OTHER_TAGS))
+            tags[key] = rng.choice(OTHER_TAGS[key])
+        if rng.random() < 0.3:
+            tags[rng.choice(["leisure", "landuse", "shop", "Tourism"])] = rng.choice(keywords).upper()
+        if rng.random() < 0.05:
+            tags[rng.choice(keywords)] = "yes"
+        # some elements lie outside the bbox, some sit on tile borders
+        lat = round(rng.uniform(south - 0.01, north + 0.01), rng.choice([1, 2, 7]))
+        lon = round(rng.uniform(west - 0.01, east + 0.01), rng.choice([1, 2, 7]))
+        if rng.random() < 0.7:
+            element = {"type": "node", "id": i, "lat": lat, "lon": lon}
+        else:
+            # ways and relations span up to a few tiles around their center
+            half_lat, half_lon = rng.uniform(0, 0.15), rng.uniform(0, 0.15)
+            element = {
+                "type": rng.choice(["way", "relation"]),
+                "id": i,
+                "bounds": {"minlat": lat - half_lat, "minlon": lon - half_lon, "maxlat": lat + half_lat, "maxlon": lon + half_lon},
+                "center": {"lat": lat, "lon": lon},
+            }
+        if tags:
+            element["tags"] = tags
+        elements.append(element)
+    return {"elements": elements}
+
+
+def bench(n_elements, tile_size):
+    result = {"elements": n_elements}
+    with tempfile.TemporaryDirectory() as tmp:
+        extract = os.path.join(tmp, "extract.json")
+        with open(extract, "w") as f:
+            json.dump(synthetic_extract(n_elements), f)
+
+        # the notebook's single whole-bbox query, answered by the same stand-in
+        start = time.perf_counter()
+        expected = reference_points({"elements": list(local_fetch(extract)(BANGKOK_BBOX))})
+        result["notebook_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        points = extract_zone_points(iter_tiled_elements(tile_size=tile_size, fetch=local_fetch(extract)))
+        result["zone_points"] = write_zone_points(points, os.path.join(tmp, "zone_points.csv"))
+        result["tiled_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = list(extract_zone_points(local_fetch(extract)(BANGKOK_BBOX)))
+        result["untiled_seconds"] = time.perf_counter() - start
+        assert actual == expected
+
+        # tiles reorder the points, but each one is kept exactly once
+        with open(os.path.join(tmp, "zone_points.csv"), encoding="utf-8") as f:
+            next(f)
+            tiled = Counter(tuple(line.rstrip("\n").split(",")) for line in f)
+        assert tiled == Counter((str(lat), str(lon), zone) for lat, lon, zone in expected)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--elements", type=int, default=200000)
+    parser.add_argument("--tile-size", type=float, default=0.1)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.elements, args.tile_size), indent=2))
@@ -0,0 +1,127 @@
+"""Incremental recurrence counting vs the batch algorithm on synthetic histories.
+
+Checks that ``count_problems`` and applying a history batch by batch to
+``RecurrenceState`` (including late reports handled through ``rebuild``) give
+the same ``num_times``/``status`` as the notebook's per-cluster loop, then
+times a full recompute against one incremental batch:
+
+    python benchmarks/bench_recurrence.py --reports 200000 --batches 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.recurrence import (  # noqa: E402
+    RecurrenceState,
+    count_problems,
+    count_problems_rows,
+    prepare_reports,
+)
+
+STATES = ["เสร็จสิ้น", "กำลังดำเนินการ", "รอรับเรื่อง"]
+
+
+def synthetic_history(n_reports, n_clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2021-08-01", tz="UTC").value
+    two_years = 2 * 365 * 24 * 3600 * 10**9
+    timestamp = start + rng.integers(0, two_years, n_reports)
+    # most reports are closed within days, some stay open for months
+    duration = rng.exponential(5 * 24 * 3600, n_reports) * 10**9
+    duration[rng.random(n_reports) < 0.05] *= 30
+    last_activity = timestamp + duration.astype(np.int64)
+
+    cluster = rng.zipf(1.6, n_reports) % n_clusters
+    text_cluster = rng.integers(0, 3, n_reports)
+    cluster_id = np.char.add(np.char.add(cluster.astype(str), "_"), text_cluster.astype(str))
+    cluster_id[rng.random(n_reports) < 0.1] = "noise_1"
+
+    def iso(values):
+        return pd.to_datetime(values, utc=True).strftime("%Y-%m-%d %H:%M:%S.%f+00")
+
+    return pd.DataFrame(
+        {
+            "cluster_id": cluster_id,
+            "timestamp": iso(timestamp),
+            "last_activity": iso(last_activity),
+            "state": rng.choice(STATES, n_reports),
+        }
+    )
+
+
+def reference_counts(history):
+    # The notebook's per-cluster Python loop
+    results = []
+    for cluster_id, rows in prepare_reports(history).groupby("cluster_id"):
+        pairs = zip(rows["timestamp_ts"], rows["last_activity_ts"])
+        results.append((cluster_id, count_problems_rows(pairs), rows["state"].iloc[-1]))
+    return pd.DataFrame(results, columns=["cluster_id", "num_times", "status"])
+
+
+def check_equivalence(history, n_batches, late_fraction=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    expected = reference_counts(history)
+    pd.testing.assert_frame_equal(expected, count_problems(history), check_dtype=False)
+
+    # batches arrive in filing order, a few reports arrive one batch late
+    history = history.sort_values(["timestamp", "last_activity"], kind="stable")
+    batch_of = np.arange(len(history)) * n_batches // len(history)
+    late = rng.random(len(history)) < late_fraction
+    batch_of[late] = np.minimum(batch_of[late] + 1, n_batches - 1)
+
+    state = RecurrenceState()
+    seen = []
+    for i in range(n_batches):
+        batch = history[batch_of == i]
+        seen.append(batch)
+        stale = state.apply(batch)
+        if stale:
+            state.rebuild(pd.concat(seen), stale)
+
+    actual = state.results()
+    pd.testing.assert_frame_equal(
+        expected.sort_values("cluster_id").reset_index(drop=True),
+        actual,
+        check_dtype=False,
+    )
+
+
+def bench(n_reports, n_batches):
+    history = synthetic_history(n_reports, max(n_reports // 20, 1))
+    check_equivalence(history, n_batches)
+
+    start = time.perf_counter()
+    count_problems(history)
+    batch_seconds = time.perf_counter() - start
+
+    # Cost of one more batch: incremental vs recomputing the whole history
+    cut = len(history) * (n_batches - 1) // n_batches
+    ordered = history.sort_values(["timestamp", "last_activity"], kind="stable")
+    state = RecurrenceState()
+    state.apply(ordered.iloc[:cut])
+    start = time.perf_counter()
+    state.apply(ordered.iloc[cut:])
+    incremental_seconds = time.perf_counter() - start
+
+    return {
+        "reports": n_reports,
+        "batch_rows": len(history) - cut,
+        "full_recompute_seconds": batch_seconds,
+        "incremental_batch_seconds": incremental_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=200000)
+    parser.add_argument("--batches", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.reports, args.batches), indent=2))
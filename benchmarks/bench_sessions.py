@@ -0,0 +1,146 @@
+"""Memory of the dashboard under many simultaneous sessions.
+
+Writes synthetic dashboard data (``synthetic.write_dashboard``), then for each
+session count starts a fresh interpreter that opens that many ``AppTest``
+sessions of ``app.py`` and reruns them concurrently: every session switches
+between the map and the graphs page and picks filters (most users pick one
+of a few popular zones). Peak and final RSS should stay flat as sessions are
+added, since all of them share one table, its indexes and the selected rows;
+a session only holds the elements it was sent.
+
+``--rev`` runs the same load against the app of another commit (extracted
+with ``git archive``) for comparison:
+
+    python benchmarks/bench_sessions.py --rows 1000000 --sessions 1,10,25,50,75 --rev HEAD~1
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, os.path.join(ROOT, "streamlit_app"))
+
+import data_store  # noqa: E402
+import synthetic  # noqa: E402
+
+CHILD = """
+import json, os, random, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.testing.v1 import AppTest
+
+os.chdir({data_dir!r})
+sys.path.insert(0, os.path.dirname({app!r}))
+PAGES = ["🗺️ แผนที่", "📊 กราฟและตาราง"]
+incomplete = []
+
+
+def rss_mb(field="VmRSS"):
+    # VmHWM is the peak; unlike ru_maxrss it isn't inherited from the parent
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+
+
+def session(i):
+    rng = random.Random(i)
+    at = AppTest.from_file({app!r}, default_timeout=600)
+    seconds = []
+
+    def rerun():
+        # AppTest run from many threads now and then returns an empty page
+        # (no exception, no elements); those runs are retried and counted
+        for _ in range(3):
+            start = time.perf_counter()
+            at.run()
+            assert not at.exception, at.exception
+            if at.radio:
+                break
+            incomplete.append(i)
+        seconds.append(time.perf_counter() - start)
+
+    rerun()
+    for _ in range({reruns}):
+        at.radio[0].set_value(rng.choice(PAGES))
+        rerun()
+        # zone filter: one of the first few (popular) zones or none
+        zones = at.sidebar.selectbox[-2].options
+        at.sidebar.selectbox[-2].set_value(zones[min(int(rng.expovariate(0.7)), len(zones) - 1)])
+        rerun()
+    return at, seconds
+
+
+before = rss_mb()
+with ThreadPoolExecutor({sessions}) as pool:
+    results = list(pool.map(session, range({sessions})))
+seconds = [s for _, s in results for s in s]
+seconds.sort()
+print(json.dumps({{
+    "sessions": {sessions},
+    "reruns": len(seconds),
+    "incomplete_runs": len(incomplete),
+    "rerun_p50_ms": 1000 * seconds[len(seconds) // 2],
+    "rerun_p95_ms": 1000 * seconds[int(len(seconds) * 0.95)],
+    "baseline_rss_mb": before,
+    "rss_mb": rss_mb(),  # every session still open
+    "peak_rss_mb": rss_mb("VmHWM"),
+}}))
+"""
+
+
+def run_sessions(app, data_dir, sessions, reruns):
+    code = CHILD.format(app=app, data_dir=data_dir, sessions=sessions, reruns=reruns)
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def checkout(rev, work_dir):
+    # the app and the pipeline package it imports, as of ``rev``
+    target = os.path.join(work_dir, rev.replace("/", "_"))
+    os.makedirs(target)
+    archive = subprocess.run(
+        ["git", "archive", rev, "streamlit_app", "pipeline"], cwd=ROOT, check=True, capture_output=True
+    ).stdout
+    subprocess.run(["tar", "-x", "-C", target], input=archive, check=True)
+    return os.path.join(target, "streamlit_app", "app.py")
+
+
+def bench(n_rows, session_counts, reruns, revs, work_dir):
+    shutil.rmtree(work_dir, ignore_errors=True)
+    data_dir = os.path.join(work_dir, "data")
+    n_clusters, n_comments = synthetic.write_dashboard(data_dir, n_rows)
+    # built once up front, not by the first sessions at the same time
+    data_store.ensure_store(data_dir)
+    apps = {"current": os.path.abspath(os.path.join(ROOT, "streamlit_app", "app.py"))}
+    for rev in revs:
+        apps[rev] = checkout(rev, work_dir)
+
+    result = {"rows": n_rows, "clusters": n_clusters, "comments": n_comments}
+    for name, app in apps.items():
+        runs = [run_sessions(app, data_dir, n, reruns) for n in session_counts]
+        # MB added per extra open session, fitted over all session counts
+        slope = np.polyfit(session_counts, [r["rss_mb"] for r in runs], 1)[0] if len(runs) > 1 else None
+        result[name] = {"runs": runs, "rss_mb_per_session": slope}
+    shutil.rmtree(work_dir)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic reports behind the dashboard")
+    parser.add_argument("--sessions", default="1,10,25,50,75")
+    parser.add_argument("--reruns", type=int, default=3, help="page/filter changes per session")
+    parser.add_argument("--rev", action="append", default=[], help="also run the app of this commit")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "bench_sessions"))
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.sessions.split(",")]
+    print(json.dumps(bench(args.rows, counts, args.reruns, args.rev, args.work_dir), indent=2))
@@ -0,0 +1,97 @@
+"""Stage outputs as one CSV vs partitioned Parquet with a manifest.
+
+For a synthetic report table, times what the notebooks do between stages
+(write one CSV, read it back inferring the types, then filter) against
+``write_stage`` + ``read_stage`` reading only a few columns of one status,
+and checks that both give the same rows:
+
+    python benchmarks/bench_storage.py --rows 1000000,5000000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.storage import export_csv, read_stage, write_stage  # noqa: E402
+
+STATES = ["เสร็จสิ้น", "กำลังดำเนินการ", "รอรับเรื่อง"]
+ORGANIZATIONS = ["เขตบางรัก", "เขตปทุมวัน", "เขตจตุจักร", "การไฟฟ้านครหลวง", "สำนักการโยธา"]
+
+
+def synthetic_table(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2021-08-01", tz="UTC").value
+    return pd.DataFrame(
+        {
+            "cluster_id": np.char.add(rng.integers(0, n_rows // 20 + 1, n_rows).astype(str), "_0"),
+            "timestamp": pd.to_datetime(start + rng.integers(0, 730 * 86400, n_rows) * 10**9, utc=True),
+            "state": rng.choice(STATES, n_rows),
+            "organization": rng.choice(ORGANIZATIONS, n_rows),
+            "comment": np.char.add("ถนนชำรุด ", rng.integers(0, 10**6, n_rows).astype(str)),
+            "latitude": 13.7 + rng.normal(0, 0.05, n_rows),
+            "longitude": 100.5 + rng.normal(0, 0.05, n_rows),
+        }
+    )
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def _size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def bench(n_rows, work_dir):
+    os.makedirs(work_dir, exist_ok=True)
+    df = synthetic_table(n_rows)
+    csv_path = os.path.join(work_dir, "stage.csv")
+    stage_path = os.path.join(work_dir, "stage")
+    columns = ["cluster_id", "timestamp", "state"]
+    result = {"rows": n_rows}
+
+    _, result["csv_write_seconds"] = _timed(lambda: df.to_csv(csv_path, index=False))
+    csv_df, result["csv_read_seconds"] = _timed(lambda: pd.read_csv(csv_path))
+    expected = csv_df.loc[csv_df["state"] == STATES[1], columns]
+    result["csv_bytes"] = _size(csv_path)
+
+    _, result["parquet_write_seconds"] = _timed(lambda: write_stage(df, stage_path, partition_cols=["state"]))
+    pruned, result["parquet_pruned_read_seconds"] = _timed(
+        lambda: read_stage(stage_path, columns=columns, filters=[("state", "==", STATES[1])])
+    )
+    _, result["parquet_full_read_seconds"] = _timed(lambda: read_stage(stage_path))
+    result["parquet_bytes"] = _size(stage_path)
+    _, result["csv_export_seconds"] = _timed(lambda: export_csv(stage_path, csv_path))
+
+    # same rows and types (the CSV leaves the timestamps as text)
+    key = ["cluster_id", "timestamp"]
+    pruned = pruned.sort_values(key).reset_index(drop=True)
+    expected = expected.assign(timestamp=pd.to_datetime(expected["timestamp"], utc=True))
+    expected = expected.sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(pruned, expected, check_dtype=False)
+    assert pruned["timestamp"].dtype == df["timestamp"].dtype
+
+    shutil.rmtree(work_dir)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="1000000,5000000")
+    parser.add_argument("--work-dir", default="/tmp/bench_storage")
+    args = parser.parse_args()
+
+    results = [bench(int(n), args.work_dir) for n in args.rows.split(",")]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,121 @@
+"""Text cleaning: the notebooks' functions vs ``pipeline.text_clean``.
+
+Checks on synthetic messy comments (HTML, URLs, e-mails, digits, odd
+whitespace) that ``clean_sentences`` and ``clean_comment`` return exactly
+what the notebook code returns, then times both, with ``clean_sentences``
+also run across a process pool. ``--duplicates`` is the share of sentences
+that repeat an earlier one (follow-up reports); since each distinct sentence
+is tokenized once, it should match the data being cleaned:
+
+    python benchmarks/bench_text_clean.py --sentences 50000 --duplicates 0.1 --jobs 8
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.text_clean import clean_comment, clean_sentences, remove_list  # noqa: E402
+
+PIECES = [
+    "ไฟดับ", "ถนนชำรุด", "หลุมใหญ่", "ขยะเยอะมาก", "น้ำท่วมซอย", "หน้าบ้าน", "ครับ", "ช่วยด้วยค่ะ",
+    "รบกวนตรวจสอบ", "ทางเท้า", "Traffy", "BTS", "<br>", "<a href='x'>ลิงก์</a>", "https://t.co/AbC",
+    "www.bangkok.go.th", "me@mail.com", "@BMA", "123/4", "ซ.5", "!!", "\n", "\t", " ", "　",
+    "ก.ม.", "😡", "İstanbul",
+]
+
+
+def reference_clean_sentence(sentence, remove_stopwords=False):
+    # clean_sentence from traffy-cluster.ipynb
+    from pythainlp.corpus import thai_stopwords
+    from pythainlp.tokenize import word_tokenize as thai_word_tokenize
+
+    sentence = sentence.lower()
+    sentence = re.sub(r'<.*?>', '', sentence)
+    sentence = re.sub(r'http\S+|www\S+|https\S+', '', sentence)
+    sentence = re.sub(r'\S*@\S*', '', sentence)
+    sentence = re.sub(r'[^a-zA-Zก-ฮะ-์\s]', '', sentence)
+    sentence = re.sub(r'\s+', ' ', sentence).strip()
+    word_tokens = thai_word_tokenize(sentence)
+    if remove_stopwords:
+        stop_words = set(thai_stopwords())
+        word_tokens = [word for word in word_tokens if (word not in stop_words) and (word not in remove_list)]
+    return ' '.join(word_tokens)
+
+
+def reference_clean_text(text):
+    # clean_text from DataPreparation(spark).ipynb
+    if text:
+        text = re.sub(r'\n', ' ', text)
+        text = re.sub(r'[^\u0E00-\u0E7Fa-zA-Z0-9\s]', '', text)
+        return text.strip()
+    return ""
+
+
+def synthetic_sentences(n_sentences, duplicates=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    n_distinct = max(int(n_sentences * (1 - duplicates)), 1)
+    distinct = [
+        rng.choice(["", " "]).join(rng.choice(PIECES, rng.integers(1, 15)))
+        for _ in range(n_distinct)
+    ]
+    # follow-ups repeat earlier comments
+    repeats = [distinct[i] for i in rng.integers(0, n_distinct, n_sentences - n_distinct)]
+    sentences = distinct + repeats
+    rng.shuffle(sentences)
+    return sentences + ["", None]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench(n_sentences, n_jobs, duplicates=0.1):
+    sentences = synthetic_sentences(n_sentences, duplicates)
+    result = {"sentences": len(sentences), "distinct": len(set(sentences))}
+
+    expected, result["notebook_clean_text_seconds"] = timed(
+        lambda: [reference_clean_text(s) for s in sentences]
+    )
+    actual, result["clean_comment_seconds"] = timed(lambda: [clean_comment(s) for s in sentences])
+    assert actual == expected
+    result["clean_comment_speedup"] = result["notebook_clean_text_seconds"] / result["clean_comment_seconds"]
+
+    for remove_stopwords in [False, True]:
+        suffix = "_stopwords" if remove_stopwords else ""
+        expected, result["notebook_clean_sentences" + suffix + "_seconds"] = timed(
+            lambda: [reference_clean_sentence(str(s), remove_stopwords) for s in sentences]
+        )
+        actual, result["clean_sentences" + suffix + "_seconds"] = timed(
+            clean_sentences, sentences, remove_stopwords
+        )
+        assert actual == expected
+        actual, result[f"clean_sentences{suffix}_{n_jobs}_jobs_seconds"] = timed(
+            clean_sentences, sentences, remove_stopwords, n_jobs=n_jobs
+        )
+        assert actual == expected
+        notebook_seconds = result["notebook_clean_sentences" + suffix + "_seconds"]
+        result["clean_sentences" + suffix + "_speedup"] = (
+            notebook_seconds / result["clean_sentences" + suffix + "_seconds"]
+        )
+        result[f"clean_sentences{suffix}_{n_jobs}_jobs_speedup"] = (
+            notebook_seconds / result[f"clean_sentences{suffix}_{n_jobs}_jobs_seconds"]
+        )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=50000)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of repeated sentences")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    print(json.dumps(bench(args.sentences, args.jobs, args.duplicates), indent=2))
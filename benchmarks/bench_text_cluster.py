@@ -0,0 +1,111 @@
+"""Dense vs memory-bounded text sub-clustering of one big spatial cluster.
+
+Each mode runs in a fresh interpreter on the same synthetic cluster so peak
+memory can be compared: ``working_mb`` is the peak above the inputs, to hold
+against ``--memory-limit`` (MB), which forces the graph mode below the size
+where the dense matrix would still fit. ``adjusted_rand`` compares the graph
+mode's partition with the dense path's (1.0 is the same partition); ``--rows``
+above ``--dense-max-rows`` only run the graph mode. With one ``--types`` and a
+small ``--topic-scale`` every report is within the threshold of another
+topic's, so the whole cluster is one component, as at a real junction:
+
+    python benchmarks/bench_text_cluster.py --rows 2000,5000,10000,20000 --memory-limit 64
+    python benchmarks/bench_text_cluster.py --rows 2000,5000,10000,20000 --memory-limit 64 --types 1 --topic-scale 0.65
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = """
+import json, sys, time
+import numpy as np
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {bench_dir!r})
+from bench_text_cluster import synthetic_cluster
+from pipeline.text_cluster import cluster_texts
+
+
+def peak_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+embeddings, type_embeddings, ner_features = synthetic_cluster({rows}, n_types={types}, topic_scale={topic_scale})
+before = peak_rss_mb()
+start = time.perf_counter()
+labels = cluster_texts(embeddings, type_embeddings, ner_features, memory_limit={memory_limit})
+seconds = time.perf_counter() - start
+np.save({out!r}, labels)
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_mb": peak_rss_mb(),
+    "working_mb": peak_rss_mb() - before,
+    "sub_clusters": int(labels.max()) + 1,
+}}))
+"""
+
+WORDS = ["ไฟดับ", "ถนน", "หลุม", "ขยะ", "น้ำท่วม", "ซอย", "บ้าน", "ทางเท้า", "ชำรุด", "สายไฟ", "ต้นไม้", "รถ"]
+
+
+def synthetic_cluster(n_rows, seed=0, n_types=8, topic_scale=1.0):
+    # comments on a handful of topics, like the reports at one busy junction;
+    # one type and closer topics (topic_scale < 1) make it a single component
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(20, 384)) * topic_scale
+    embeddings = topics[rng.integers(0, 20, n_rows)] + rng.normal(scale=0.8, size=(n_rows, 384))
+    type_embeddings = rng.normal(size=(n_types, 384))[rng.integers(0, n_types, n_rows)]
+    vocabulary = WORDS + [f"ซอย{i}" for i in range(500)]
+    ner_features = [" ".join(rng.choice(vocabulary, 5)) for _ in range(n_rows)]
+    return embeddings.astype(np.float32), type_embeddings.astype(np.float32), ner_features
+
+
+def run_mode(rows, memory_limit, out, types, topic_scale):
+    code = CHILD.format(
+        root=os.path.abspath(ROOT),
+        bench_dir=os.path.dirname(os.path.abspath(__file__)),
+        rows=rows,
+        types=types,
+        topic_scale=topic_scale,
+        memory_limit=memory_limit,
+        out=out,
+    )
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench(rows, memory_limit_mb, dense_max_rows, types=8, topic_scale=1.0):
+    from sklearn.metrics import adjusted_rand_score
+
+    result = {"rows": rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        dense_out, graph_out = os.path.join(tmp, "dense.npy"), os.path.join(tmp, "graph.npy")
+        result["graph"] = run_mode(rows, memory_limit_mb * 1024**2, graph_out, types, topic_scale)
+        if rows <= dense_max_rows:
+            result["dense"] = run_mode(rows, 2**62, dense_out, types, topic_scale)
+            result["adjusted_rand"] = adjusted_rand_score(np.load(dense_out), np.load(graph_out))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="2000,5000,10000,20000")
+    parser.add_argument("--memory-limit", type=int, default=64)
+    parser.add_argument("--dense-max-rows", type=int, default=10000, help="skip the dense path above this")
+    parser.add_argument("--types", type=int, default=8, help="distinct type strings")
+    parser.add_argument("--topic-scale", type=float, default=1.0, help="spread of the comment topics")
+    args = parser.parse_args()
+    results = [
+        bench(int(n), args.memory_limit, args.dense_max_rows, args.types, args.topic_scale)
+        for n in args.rows.split(",")
+    ]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,71 @@
+"""Zone lookup: the notebook's pickled 1-NN classifier vs ``ZoneRaster``.
+
+Fits ``KNeighborsClassifier(n_neighbors=1)`` on synthetic zone points inside
+``BANGKOK_BBOX`` (clumped like real OSM tags), rasterizes it, checks that both
+give the same zone for random report locations (some outside the box) and
+times the lookups:
+
+    python benchmarks/bench_zones.py --zone-points 100000 --lookups 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.zones import BANGKOK_BBOX, ZONES, ZoneRaster  # noqa: E402
+
+
+def synthetic_zone_points(n_points, seed=0):
+    rng = np.random.default_rng(seed)
+    south, west, north, east = BANGKOK_BBOX
+    n_areas = max(n_points // 200, 1)
+    areas = np.column_stack([rng.uniform(south, north, n_areas), rng.uniform(west, east, n_areas)])
+    area_zone = rng.integers(0, len(ZONES), n_areas)
+    area = rng.integers(0, n_areas, n_points)
+    coords = areas[area] + rng.normal(0, 0.01, (n_points, 2))
+    # most points take their area's zone, some are mixed in
+    zone = np.where(rng.random(n_points) < 0.8, area_zone[area], rng.integers(0, len(ZONES), n_points))
+    return coords, np.array(list(ZONES), dtype=object)[zone]
+
+
+def bench(n_points, n_lookups, cell_size):
+    coords, zone = synthetic_zone_points(n_points)
+    knn = KNeighborsClassifier(n_neighbors=1).fit(coords, zone)
+    result = {"zone_points": n_points, "lookups": n_lookups}
+
+    start = time.perf_counter()
+    raster = ZoneRaster.from_points(coords[:, 0], coords[:, 1], zone, cell_size=cell_size)
+    result["build_seconds"] = time.perf_counter() - start
+    result["cells"] = int(raster.raster.size)
+    result["ambiguous_fraction"] = raster.ambiguous_fraction
+
+    rng = np.random.default_rng(1)
+    south, west, north, east = BANGKOK_BBOX
+    lat = rng.uniform(south - 0.05, north + 0.05, n_lookups)
+    lon = rng.uniform(west - 0.05, east + 0.05, n_lookups)
+
+    start = time.perf_counter()
+    expected = knn.predict(np.column_stack([lat, lon]))
+    result["knn_predict_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = raster.predict(lat, lon)
+    result["raster_predict_seconds"] = time.perf_counter() - start
+    assert np.array_equal(actual, expected)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--zone-points", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000000)
+    parser.add_argument("--cell-size", type=float, default=0.0005)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.zone_points, args.lookups, args.cell_size), indent=2))
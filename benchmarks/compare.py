@@ -0,0 +1,57 @@
+"""Compare two ``run.py`` result files and flag regressions.
+
+Times (``*seconds``, ``*_ms``) and memory (``*_rss_delta_mb``) should go
+down and throughputs (``*_per_second``) up; any metric more than ``--threshold`` worse than in the
+baseline is a regression and makes the script exit with status 1:
+
+    python benchmarks/compare.py benchmarks/results/1m-1a2b3c4.json benchmarks/results/1m-5d6e7f8.json
+"""
+
+import argparse
+import json
+import sys
+
+
+def direction(metric):
+    """+1 if bigger is better, -1 if smaller is better, None for counts and sizes."""
+    if metric.endswith("_per_second"):
+        return 1
+    if metric.endswith(("seconds", "_ms", "_rss_delta_mb")):
+        return -1
+    return None
+
+
+def compare(baseline, current, threshold=0.1):
+    """Rows ``(benchmark, metric, baseline, current, change, regression)``."""
+    rows = []
+    for name, metrics in current["benchmarks"].items():
+        before = baseline["benchmarks"].get(name, {})
+        for metric, value in metrics.items():
+            sign = direction(metric)
+            if sign is None or metric not in before or not before[metric]:
+                continue
+            change = value / before[metric] - 1
+            rows.append((name, metric, before[metric], value, change, sign * change < -threshold))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change tolerated (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline["rows"] != current["rows"]:
+        print(f"warning: comparing {baseline['rows']} rows against {current['rows']}", file=sys.stderr)
+
+    rows = compare(baseline, current, args.threshold)
+    print(f"{baseline['commit']} -> {current['commit']} ({current['scale']})")
+    for name, metric, before, after, change, regression in rows:
+        flag = "  REGRESSION" if regression else ""
+        print(f"{name:15} {metric:28} {before:12.4g} {after:12.4g} {change:+8.1%}{flag}")
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
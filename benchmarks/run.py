@@ -0,0 +1,237 @@
+"""End-to-end benchmark suite on synthetic data, results as JSON.
+
+Generates ``synthetic`` reports at a named scale and times every hot path:
+
+- ``load_data``: cold start of the dashboard loaders (CSV vs Arrow store);
+- ``filters``: building ``FilterIndex`` and the latency of the sidebar filters
+  of ``app.py`` (``select`` + ``take``);
+- ``count_problems``: ``num_times``/``status`` over the whole report history;
+- ``dbscan``: ``partitioned_dbscan`` of the report locations;
+- ``text_cluster``: ``cluster_texts`` on the busiest hot spot;
+- ``zones``: building a ``ZoneRaster`` and predicting the zone of every report.
+
+The results go to ``benchmarks/results/<scale>-<commit>.json`` with the
+commit, machine and scale they were measured on; ``compare.py`` diffs two
+of them:
+
+    python benchmarks/run.py --scale 1m
+    python benchmarks/compare.py benchmarks/results/1m-1a2b3c4.json benchmarks/results/1m-5d6e7f8.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "streamlit_app"))
+
+import synthetic  # noqa: E402
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000, "50m": 50_000_000}
+BENCHMARKS = ["load_data", "filters", "count_problems", "dbscan", "text_cluster", "zones"]
+RESULTS_DIR = os.path.join(HERE, "results")
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _percentiles_ms(seconds):
+    seconds = np.asarray(seconds) * 1000
+    return {"p50_ms": float(np.percentile(seconds, 50)), "p95_ms": float(np.percentile(seconds, 95))}
+
+
+# ------------------------- BENCHMARKS -----------------------------
+
+
+def bench_load_data(n_rows, seed, work_dir, repeat):
+    import bench_load_data
+
+    data_dir = os.path.join(work_dir, "dashboard")
+    n_clusters, n_comments = synthetic.write_dashboard(data_dir, n_rows, seed)
+    result = {"clusters": n_clusters, "comments": n_comments}
+    for loader, stats in bench_load_data.bench(data_dir, repeat).items():
+        result[f"{loader}_seconds"] = stats["seconds_median"]
+        # peak RSS added by the load itself, not the interpreter and its imports
+        result[f"{loader}_rss_delta_mb"] = stats["rss_delta_mb_median"]
+    return result
+
+
+def bench_filters(n_rows, seed, work_dir, n_queries):
+    import data_store
+    from filters import FilterIndex
+
+    data_dir = os.path.join(work_dir, "dashboard")
+    if not os.path.exists(os.path.join(data_dir, "cluster_data.csv")):
+        synthetic.write_dashboard(data_dir, n_rows, seed)
+    data_store.ensure_store(data_dir)
+    df = data_store.load_clusters(data_dir)
+    index, build_seconds = _timed(FilterIndex, df)
+
+    # the sidebar: "-" or one zone, "-" or one organization, sometimes a minimum count
+    rng = np.random.default_rng([seed, 10])
+    zones = ["-"] + sorted(df["zone"].unique())
+    organizations = ["-"] + index.organization_names
+    seconds, rows = [], 0
+    for _ in range(n_queries):
+        zone = zones[rng.integers(len(zones))]
+        org = organizations[rng.integers(len(organizations))]
+        min_num_times = int(rng.integers(1, 5)) if rng.random() < 0.3 else None
+        start = time.perf_counter()
+        selected = index.take(df, index.select(
+            zone=None if zone == "-" else zone,
+            organization=None if org == "-" else org,
+            min_num_times=min_num_times,
+        ))
+        seconds.append(time.perf_counter() - start)
+        rows += len(selected)
+    return {
+        "clusters": len(df),
+        "queries": n_queries,
+        "mean_rows": rows / n_queries,
+        "index_build_seconds": build_seconds,
+        **_percentiles_ms(seconds),
+    }
+
+
+def bench_count_problems(n_rows, seed):
+    from pipeline.recurrence import count_problems
+
+    df = synthetic.reports(n_rows, seed, ["spot", "timestamp", "last_activity", "state"])
+    df["cluster_id"] = synthetic.cluster_ids(df.pop("spot").to_numpy(), seed)
+    counts, seconds = _timed(count_problems, df)
+    return {"reports": len(df), "clusters": len(counts), "seconds": seconds, "reports_per_second": len(df) / seconds}
+
+
+def bench_dbscan(n_rows, seed, n_jobs):
+    from pipeline.spatial_cluster import partitioned_dbscan
+
+    coords = synthetic.reports(n_rows, seed, ["latitude", "longitude"]).to_numpy()
+    labels, seconds = _timed(partitioned_dbscan, coords, n_jobs=n_jobs)
+    return {
+        "points": len(coords),
+        "clusters": int(labels.max()) + 1,
+        "noise": int((labels < 0).sum()),
+        "seconds": seconds,
+        "points_per_second": len(coords) / seconds,
+    }
+
+
+def bench_text_cluster(n_rows, seed, max_rows):
+    from bench_text_cluster import synthetic_cluster
+
+    from pipeline.text_cluster import cluster_texts
+
+    # the busiest hot spot is the biggest matrix the stage builds
+    spots = synthetic.HotSpots(n_rows, seed)
+    rows = int(min(max(spots.share.max() * n_rows * synthetic.HOT_SPOT_SHARE, 2), max_rows))
+    labels, seconds = _timed(cluster_texts, *synthetic_cluster(rows, seed))
+    return {"rows": rows, "text_clusters": int(labels.max()) + 1, "seconds": seconds}
+
+
+def bench_zones(n_rows, seed, n_points):
+    from pipeline.zones import ZoneRaster
+
+    coords, zone = synthetic.zone_points(n_points, seed)
+    raster, build_seconds = _timed(ZoneRaster.from_points, coords[:, 0], coords[:, 1], zone)
+    reports = synthetic.reports(n_rows, seed, ["latitude", "longitude"])
+    _, seconds = _timed(raster.predict, reports["latitude"].to_numpy(), reports["longitude"].to_numpy())
+    return {
+        "zone_points": n_points,
+        "lookups": len(reports),
+        "build_seconds": build_seconds,
+        "predict_seconds": seconds,
+        "lookups_per_second": len(reports) / seconds,
+    }
+
+
+# ------------------------- SUITE -----------------------------
+
+
+def _git(*args):
+    try:
+        out = subprocess.run(["git", *args], cwd=ROOT, check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def environment():
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_suite(scale, seed=0, only=None, work_dir="/tmp/bench_suite", repeat=3, n_queries=500,
+              n_jobs=None, text_rows=5000, zone_points=100_000):
+    n_rows = SCALES[scale] if scale in SCALES else int(scale)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    runs = {
+        "load_data": lambda: bench_load_data(n_rows, seed, work_dir, repeat),
+        "filters": lambda: bench_filters(n_rows, seed, work_dir, n_queries),
+        "count_problems": lambda: bench_count_problems(n_rows, seed),
+        "dbscan": lambda: bench_dbscan(n_rows, seed, n_jobs),
+        "text_cluster": lambda: bench_text_cluster(n_rows, seed, text_rows),
+        "zones": lambda: bench_zones(n_rows, seed, zone_points),
+    }
+    results = {}
+    try:
+        for name in only or BENCHMARKS:
+            print(f"{name} ...", file=sys.stderr, flush=True)
+            results[name] = runs[name]()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {**environment(), "scale": scale, "rows": n_rows, "seed": seed, "benchmarks": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="100k", help=f"{', '.join(SCALES)} or a row count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", choices=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts per loader")
+    parser.add_argument("--queries", type=int, default=500, help="random filter selections")
+    parser.add_argument("--jobs", type=int, default=None, help="DBSCAN processes (default: all cores)")
+    parser.add_argument("--text-rows", type=int, default=5000, help="cap on the text sub-clustering rows")
+    parser.add_argument("--zone-points", type=int, default=100_000)
+    parser.add_argument("--work-dir", default="/tmp/bench_suite")
+    parser.add_argument("--out", help=f"result file (default: {os.path.relpath(RESULTS_DIR)}/<scale>-<commit>.json)")
+    args = parser.parse_args()
+
+    report = run_suite(
+        args.scale,
+        seed=args.seed,
+        only=args.only,
+        work_dir=args.work_dir,
+        repeat=args.repeat,
+        n_queries=args.queries,
+        n_jobs=args.jobs,
+        text_rows=args.text_rows,
+        zone_points=args.zone_points,
+    )
+    out = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        suffix = "-dirty" if report["dirty"] else ""
+        out = os.path.join(RESULTS_DIR, f"{args.scale}-{report['commit'] or 'nogit'}{suffix}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"-> {out}", file=sys.stderr)
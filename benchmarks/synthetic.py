@@ -0,0 +1,296 @@
+"""Reproducible Bangkok-like Traffy reports at any scale (10k to 50M rows).
+
+The real dump sits behind Google Drive links, so the benchmarks use this
+generator instead. For a given ``n_rows`` and ``seed`` it always produces the
+same data, chunk by chunk, so 50M rows never have to be in memory at once:
+
+- about 80% of the reports fall within ~10 m of a hot spot (a junction, a
+  market, a flooded soi); hot spots are denser towards the city center, their
+  sizes are heavy-tailed and each has a usual problem type and district;
+- the rest is scattered over the city;
+- comments are Thai sentences built from per-type phrases, ``type`` is a
+  ``{...}`` set like in the dump, ``organization`` a comma-joined list of a
+  district office and sometimes an agency;
+- ``state`` follows the dump's rough shares, ``last_activity`` is
+  ``timestamp`` plus a log-normal handling time.
+
+Tables for the other stages (clustered reports, dashboard CSVs, zone points)
+are derived from the same hot spots:
+
+    python benchmarks/synthetic.py raw --rows 1000000 --out bangkok_traffy.csv
+    python benchmarks/synthetic.py dashboard --rows 1000000 --out /tmp/dashboard
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline.ingest import SCHEMA  # noqa: E402
+from pipeline.storage import write_stage  # noqa: E402
+from pipeline.zones import ZONES  # noqa: E402
+
+CITY_BBOX = (13.55, 100.35, 13.95, 100.9)  # south, west, north, east of the reports
+CENTER = (13.75, 100.53)
+CHUNK_ROWS = 250_000
+HOT_SPOT_SHARE = 0.8
+REPORTS_PER_SPOT = 40
+
+# type -> (share, phrases)
+TYPES = {
+    "ถนน": (0.18, ["ถนนเป็นหลุมเป็นบ่อ", "ถนนทรุดตัว", "ผิวถนนชำรุด", "ยางมะตอยหลุดร่อน"]),
+    "ทางเท้า": (0.12, ["ทางเท้าชำรุด", "กระเบื้องทางเท้าแตก", "ทางเท้าไม่เรียบ", "มีหลุมบนทางเท้า"]),
+    "น้ำท่วม": (0.11, ["น้ำท่วมขัง", "ฝนตกแล้วน้ำท่วมซอย", "น้ำระบายไม่ทัน", "น้ำท่วมถนนหน้าบ้าน"]),
+    "ความสะอาด": (0.1, ["ขยะล้นถัง", "มีการทิ้งขยะริมถนน", "กลิ่นเหม็นจากขยะ", "ไม่มีการเก็บขยะ"]),
+    "แสงสว่าง": (0.09, ["ไฟฟ้าส่องสว่างดับ", "เสาไฟไม่ติด", "ซอยมืดมาก", "ไฟกระพริบทั้งคืน"]),
+    "ท่อระบายน้ำ": (0.08, ["ท่อระบายน้ำอุดตัน", "ฝาท่อหาย", "ท่อแตก", "น้ำเน่าในท่อ"]),
+    "กีดขวาง": (0.08, ["จอดรถกีดขวาง", "วางของบนทางเท้า", "ร้านค้ารุกล้ำทางเท้า", "รถเสียจอดขวาง"]),
+    "จราจร": (0.07, ["รถติดมาก", "สัญญาณไฟจราจรเสีย", "ไม่มีทางม้าลาย", "รถขับย้อนศร"]),
+    "ต้นไม้": (0.06, ["กิ่งไม้ใหญ่จะหัก", "ต้นไม้บังป้าย", "ต้นไม้ล้มขวางถนน", "ขอให้ตัดแต่งกิ่งไม้"]),
+    "เสียงรบกวน": (0.05, ["เสียงดังตอนกลางคืน", "ก่อสร้างเสียงดัง", "เปิดเพลงเสียงดัง", "รถแต่งเสียงดัง"]),
+    "สายไฟ": (0.04, ["สายไฟห้อยต่ำ", "สายสื่อสารระโยงระยาง", "สายไฟขาด", "เสาไฟเอียง"]),
+    "คลอง": (0.02, ["ผักตบชวาในคลอง", "น้ำในคลองเน่าเสีย", "เขื่อนริมคลองพัง", "ขยะในคลอง"]),
+}
+EXTRA_PHRASES = ["ช่วยด้วยครับ", "รบกวนตรวจสอบด้วยค่ะ", "เป็นมาหลายวันแล้ว", "อันตรายมาก", "แจ้งหลายครั้งแล้ว", ""]
+DISTRICTS = [
+    "บางรัก", "ปทุมวัน", "จตุจักร", "บางกะปิ", "ห้วยขวาง", "ดินแดง", "พญาไท", "ราชเทวี", "สาทร", "บางนา",
+    "คลองเตย", "วัฒนา", "บางซื่อ", "ดุสิต", "พระนคร", "ลาดพร้าว", "บางเขน", "ดอนเมือง", "หลักสี่", "สายไหม",
+    "มีนบุรี", "ลาดกระบัง", "ประเวศ", "สวนหลวง", "บางพลัด", "ธนบุรี", "คลองสาน", "จอมทอง", "ภาษีเจริญ", "บางแค",
+]
+AGENCIES = ["การไฟฟ้านครหลวง", "สำนักการโยธา", "สำนักการระบายน้ำ", "สำนักงานตำรวจแห่งชาติ", "สำนักสิ่งแวดล้อม"]
+STATES = {"เสร็จสิ้น": 0.72, "กำลังดำเนินการ": 0.14, "รอรับเรื่อง": 0.1, "ส่งต่อ": 0.04}
+START = pd.Timestamp("2021-08-01", tz="UTC")
+DAYS = 3 * 365
+
+TYPE_NAMES = list(TYPES)
+TYPE_SHARES = np.array([share for share, _ in TYPES.values()])
+TYPE_SHARES /= TYPE_SHARES.sum()
+
+
+def _weights(names, rng, alpha=1.1):
+    # a few districts / agencies get most of the reports
+    weights = 1 / np.arange(1, len(names) + 1) ** alpha
+    return rng.permutation(weights / weights.sum())
+
+
+class HotSpots:
+    """The hot spots of a dataset of ``n_rows`` reports, the same for every chunk."""
+
+    def __init__(self, n_rows, seed=0):
+        rng = np.random.default_rng([seed, 0])
+        n_spots = max(int(n_rows * HOT_SPOT_SHARE) // REPORTS_PER_SPOT, 1)
+        south, west, north, east = CITY_BBOX
+        self.lat = np.clip(rng.normal(CENTER[0], 0.08, n_spots), south, north)
+        self.lon = np.clip(rng.normal(CENTER[1], 0.1, n_spots), west, east)
+        # heavy tail (a few very busy junctions), capped so that the busiest
+        # spot has about as many reports at any scale
+        sizes = np.minimum(rng.pareto(1.5, n_spots) + 1, 100)
+        self.share = sizes / sizes.sum()
+        self.type = rng.choice(len(TYPES), n_spots, p=TYPE_SHARES)
+        self.district = rng.choice(len(DISTRICTS), n_spots, p=_weights(DISTRICTS, rng))
+        self.n_spots = n_spots
+
+
+def _comments(rng, type_codes):
+    n = len(type_codes)
+    phrase = rng.integers(0, 4, n)
+    second = rng.integers(0, 4, n)
+    extra = rng.integers(0, len(EXTRA_PHRASES), n)
+    place = rng.integers(1, 200, n)
+    phrases = [TYPES[name][1] for name in TYPE_NAMES]
+    return [
+        f"{phrases[t][p]} ซอย {s} {phrases[t][q]} {EXTRA_PHRASES[e]}".strip()
+        for t, p, q, s, e in zip(type_codes, phrase, second, place, extra)
+    ]
+
+
+def generate_reports(n_rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Yield typed report chunks (the columns of ``pipeline.ingest.SCHEMA`` plus ``spot``).
+
+    ``spot`` is the hot spot a report was drawn around, -1 for scattered ones.
+    """
+    spots = HotSpots(n_rows, seed)
+    agency_weights = _weights(AGENCIES, np.random.default_rng([seed, 1]))
+    for chunk, offset in enumerate(range(0, n_rows, chunk_rows)):
+        rng = np.random.default_rng([seed, 2, chunk])
+        n = min(chunk_rows, n_rows - offset)
+
+        spot = rng.choice(spots.n_spots, n, p=spots.share)
+        spot[rng.random(n) >= HOT_SPOT_SHARE] = -1
+        clustered = spot >= 0
+        south, west, north, east = CITY_BBOX
+        lat = np.where(clustered, spots.lat[spot] + rng.normal(0, 0.00006, n), rng.uniform(south, north, n))
+        lon = np.where(clustered, spots.lon[spot] + rng.normal(0, 0.00006, n), rng.uniform(west, east, n))
+
+        # reports at a hot spot mostly share its usual type
+        type_code = rng.choice(len(TYPES), n, p=TYPE_SHARES)
+        usual = clustered & (rng.random(n) < 0.7)
+        type_code[usual] = spots.type[spot[usual]]
+        second_type = rng.choice(len(TYPES), n, p=TYPE_SHARES)
+        has_second = rng.random(n) < 0.25
+        types = [
+            "{" + TYPE_NAMES[t] + ("," + TYPE_NAMES[u] if both and u != t else "") + "}"
+            for t, u, both in zip(type_code, second_type, has_second)
+        ]
+
+        district = np.where(clustered, spots.district[spot], rng.integers(0, len(DISTRICTS), n))
+        agency = rng.choice(len(AGENCIES), n, p=agency_weights)
+        with_agency = rng.random(n) < 0.3
+        organization = [
+            "เขต" + DISTRICTS[d] + ("," + AGENCIES[a] if w else "")
+            for d, a, w in zip(district, agency, with_agency)
+        ]
+
+        timestamp = START + pd.to_timedelta(rng.integers(0, DAYS * 86400, n), unit="s")
+        hours = rng.lognormal(np.log(72), 1.2, n)
+        last_activity = timestamp + pd.to_timedelta(hours * 3600, unit="s").round("s")
+
+        yield pd.DataFrame(
+            {
+                "ticket_id": [f"{2021 + (offset + i) // 10**7}-{(offset + i) % 10**7:07X}" for i in range(n)],
+                "type": types,
+                "organization": organization,
+                "comment": _comments(rng, type_code),
+                "photo": "https://storage.traffy.in.th/p.jpg",
+                "photo_after": None,
+                "address": [f"ซอย {s} เขต{DISTRICTS[d]} กรุงเทพมหานคร" for s, d in zip(rng.integers(1, 200, n), district)],
+                "subdistrict": None,
+                "district": ["เขต" + DISTRICTS[d] for d in district],
+                "province": "กรุงเทพมหานคร",
+                "state": rng.choice(list(STATES), n, p=list(STATES.values())),
+                "timestamp": timestamp,
+                "last_activity": last_activity,
+                "star": np.where(rng.random(n) < 0.4, rng.integers(1, 6, n), np.nan),
+                "count_reopen": rng.poisson(0.05, n).astype(float),
+                "longitude": lon,
+                "latitude": lat,
+                "spot": spot,
+            }
+        )
+
+
+def reports(n_rows, seed=0, columns=None):
+    """All ``n_rows`` reports in one DataFrame (only ``columns`` kept, to save memory)."""
+    chunks = [chunk if columns is None else chunk[columns] for chunk in generate_reports(n_rows, seed)]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _iso(timestamps):
+    return timestamps.dt.strftime("%Y-%m-%d %H:%M:%S.%f+00")
+
+
+def write_raw_csv(path, n_rows, seed=0, messy=False):
+    """Write reports like ``bangkok_traffy.csv`` (``coords`` is ``"lon,lat"``).
+
+    With ``messy`` some comments span several lines, some reports miss their
+    organization, and every chunk ends with a short row and a row with too
+    many fields, like in the real dump.
+    """
+    columns = [
+        "ticket_id", "type", "organization", "comment", "photo", "photo_after", "coords", "address",
+        "subdistrict", "district", "province", "timestamp", "state", "star", "count_reopen", "last_activity",
+    ]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(columns) + "\n")
+        for chunk_index, chunk in enumerate(generate_reports(n_rows, seed)):
+            if messy:
+                rng = np.random.default_rng([seed, 6, chunk_index])
+                multiline = rng.random(len(chunk)) < 0.05
+                chunk.loc[multiline, "comment"] = chunk.loc[multiline, "comment"].str.replace(" ซอย", "\nซอย")
+                chunk.loc[rng.random(len(chunk)) < 0.02, "organization"] = None
+            raw = chunk.assign(
+                coords=chunk["longitude"].map("{:.6f}".format) + "," + chunk["latitude"].map("{:.6f}".format),
+                timestamp=_iso(chunk["timestamp"]),
+                last_activity=_iso(chunk["last_activity"]),
+                star=chunk["star"].astype("Int64"),
+                count_reopen=chunk["count_reopen"].astype("Int64"),
+            )
+            raw[columns].to_csv(f, header=False, index=False, quoting=csv.QUOTE_MINIMAL)
+            if messy:
+                f.write("broken\n")
+                f.write(",".join(["x"] * (len(columns) + 3)) + "\n")
+
+
+def write_reports_stage(path, n_rows, seed=0):
+    """Write the reports as the typed stage ``pipeline.ingest`` produces."""
+    batches = (
+        batch
+        for chunk in generate_reports(n_rows, seed)
+        for batch in pa.Table.from_pandas(chunk.drop(columns="spot"), schema=SCHEMA, preserve_index=False).to_batches()
+    )
+    return write_stage(batches, path, schema=SCHEMA)
+
+
+def cluster_ids(spot, seed=0):
+    """``cluster_id`` of clustered reports: ``<spot>_<text cluster>``, noise otherwise."""
+    rng = np.random.default_rng([seed, 3])
+    text_cluster = rng.integers(0, 3, len(spot))
+    ids = np.char.add(np.char.add(spot.astype(str), "_"), text_cluster.astype(str)).astype(object)
+    noise = spot < 0
+    ids[noise] = np.char.add("noise_", (np.flatnonzero(noise) + 1).astype(str))
+    return ids
+
+
+def dashboard_tables(n_rows, seed=0):
+    """``cluster_data`` and ``example_comment`` as the dashboard reads them."""
+    df = reports(n_rows, seed, ["spot", "comment", "organization", "latitude", "longitude", "state"])
+    df["cluster_id"] = cluster_ids(df["spot"].to_numpy(), seed)
+    df = df[df["spot"] >= 0]
+
+    grouped = df.groupby("cluster_id", sort=False)
+    cluster_data = grouped.agg(
+        num_times=("comment", "size"),
+        status=("state", "last"),
+        cluster_desc=("comment", "first"),
+        lat=("latitude", "mean"),
+        long=("longitude", "mean"),
+        organization=("organization", "first"),
+    ).reset_index()
+    cluster_data["num_times"] = np.maximum(cluster_data["num_times"] // 3, 1)
+    rng = np.random.default_rng([seed, 4])
+    cluster_data["zone"] = np.array(list(ZONES), dtype=object)[rng.integers(0, len(ZONES), len(cluster_data))]
+    example_comment = df[["cluster_id", "comment"]].rename(columns={"cluster_id": "cluster"})
+    return cluster_data, example_comment
+
+
+def write_dashboard(out_dir, n_rows, seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    cluster_data, example_comment = dashboard_tables(n_rows, seed)
+    cluster_data.to_csv(os.path.join(out_dir, "cluster_data.csv"), index=False)
+    example_comment.to_csv(os.path.join(out_dir, "example_comment.csv"), index=False)
+    return len(cluster_data), len(example_comment)
+
+
+def zone_points(n_points, seed=0):
+    """Tagged OSM-like points: ``(lat, lon)`` and zone names, zones coming in patches."""
+    rng = np.random.default_rng([seed, 5])
+    south, west, north, east = CITY_BBOX
+    n_areas = max(n_points // 200, 1)
+    areas = np.column_stack([rng.uniform(south, north, n_areas), rng.uniform(west, east, n_areas)])
+    area_zone = rng.integers(0, len(ZONES), n_areas)
+    area = rng.integers(0, n_areas, n_points)
+    coords = areas[area] + rng.normal(0, 0.01, (n_points, 2))
+    zone = np.where(rng.random(n_points) < 0.8, area_zone[area], rng.integers(0, len(ZONES), n_points))
+    return coords, np.array(list(ZONES), dtype=object)[zone]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic Traffy data")
+    parser.add_argument("kind", choices=["raw", "reports", "dashboard"])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    if args.kind == "raw":
+        write_raw_csv(args.out, args.rows, args.seed)
+    elif args.kind == "reports":
+        write_reports_stage(args.out, args.rows, args.seed)
+    else:
+        print(write_dashboard(args.out, args.rows, args.seed))
@@ -0,0 +1 @@
+"""Importable versions of the processing steps prototyped in ``notebooks/``."""
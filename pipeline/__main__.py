@@ -0,0 +1,56 @@
+"""Run the notebook pipeline from the raw dump to the dashboard tables.
+
+    python -m pipeline --raw bangkok_traffy.csv --zone-points zone_points.csv \\
+        --work-dir work --export streamlit_app
+
+Unchanged stages are reused from ``--work-dir``; ``--until`` stops after the
+given stages and ``--force`` reruns stages even when they are cached.
+"""
+
+import argparse
+import json
+import logging
+import os
+
+from pipeline import featurize, spatial_cluster, text_cluster, zones
+from pipeline.orchestrator import run_pipeline
+from pipeline.stages import build_stages, export_dashboard
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raw", required=True, help="bangkok_traffy.csv")
+    zone_source = parser.add_mutually_exclusive_group()
+    zone_source.add_argument("--zone-points", help="CSV with lat, lon, zone (skips the OSM stage)")
+    zone_source.add_argument("--osm-json", help="local Overpass JSON extract instead of the API")
+    parser.add_argument("--work-dir", default="work")
+    parser.add_argument("--eps-m", type=float, default=spatial_cluster.EPS * spatial_cluster.EARTH_RADIUS_KM * 1000)
+    parser.add_argument("--min-samples", type=int, default=spatial_cluster.MIN_SAMPLES)
+    parser.add_argument("--model", default=featurize.MODEL_NAME)
+    parser.add_argument("--distance-threshold", type=float, default=text_cluster.DISTANCE_THRESHOLD)
+    parser.add_argument("--zone-cell-size", type=float, default=zones.CELL_SIZE)
+    parser.add_argument("--until", nargs="*", help="only run these stages and their inputs")
+    parser.add_argument("--force", nargs="*", default=[], help="rerun these stages")
+    parser.add_argument("--jobs", type=int, default=0, help="processes per stage (0 for all cores)")
+    parser.add_argument("--workers", type=int, default=None, help="stages running at the same time")
+    parser.add_argument("--export", help="directory to write cluster_data.csv and example_comment.csv to")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%H:%M:%S")
+    stages = build_stages(
+        args.raw,
+        zone_points=args.zone_points,
+        osm_json=args.osm_json,
+        eps=args.eps_m / 1000 / spatial_cluster.EARTH_RADIUS_KM,
+        min_samples=args.min_samples,
+        model_name=args.model,
+        distance_threshold=args.distance_threshold,
+        zone_cell_size=args.zone_cell_size,
+        embedding_cache=os.path.join(args.work_dir, "embedding_cache"),
+        n_jobs=args.jobs or None,
+    )
+    results = run_pipeline(
+        stages, args.work_dir, targets=args.until or ["dashboard"], force=args.force, max_workers=args.workers
+    )
+    if args.export and "dashboard" in results:
+        counts = export_dashboard(results["dashboard"]["path"], args.export)
+        logging.info("exported %s", json.dumps(counts))
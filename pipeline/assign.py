@@ -0,0 +1,205 @@
+"""Give newly arriving reports a ``cluster_id`` without rerunning the pipeline.
+
+``traffy-cluster.ipynb`` labels reports in two steps: the 15 m DBSCAN on the
+coordinates (``pipeline.spatial_cluster``), then an agglomerative clustering of
+the comments inside every location cluster. ``ClusterAssigner`` keeps what a
+new report is compared with in both steps:
+
+- the core points of every location cluster in a haversine BallTree; a report
+  joins the cluster of its nearest core point if that is within eps, which is
+  how DBSCAN reaches border points, otherwise it is noise;
+- the centroid of every text sub-cluster in the sentence embedding space
+  (comment embedding followed by type embedding, see ``report_embeddings``);
+  a report joins the closest centroid of its location cluster if the cosine
+  distance is within the clustering threshold, otherwise it is noise.
+
+Noise reports get a fresh ``noise_<n>`` id, like the pipeline's noise rows.
+Per report this is one tree query and one small dot product, so assignment
+runs well below a millisecond; the embedding itself is the caller's (batched)
+job.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from sklearn.neighbors import BallTree
+
+from pipeline.spatial_cluster import EPS, MIN_SAMPLES
+from pipeline.text_clean import clean_type
+
+DISTANCE_THRESHOLD = 0.5  # AgglomerativeClustering distance_threshold in the notebook
+
+
+def report_embeddings(model, comments, types, batch_size=256, cache=None):
+    """Comment and type embeddings side by side, the space centroids live in.
+
+    With an ``EmbeddingCache`` only texts it hasn't seen are sent to ``model``.
+    """
+    comments = [str(comment) for comment in comments]
+    types = [clean_type(value) for value in types]
+
+    def encode(texts):
+        if cache is not None:
+            return cache.encode(model, texts, batch_size=batch_size)
+        return model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+
+    return np.concatenate([encode(comments), encode(types)], axis=1)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _spatial_cluster(cluster_ids):
+    # "<spatial>_<text>" -> spatial label, -1 for noise ids
+    return np.array(
+        [-1 if cid.startswith("noise") else int(cid.split("_")[0]) for cid in cluster_ids],
+        dtype=np.int64,
+    )
+
+
+class ClusterAssigner:
+    def __init__(
+        self,
+        core_coords,
+        core_clusters,
+        centroids,
+        centroid_ids,
+        offsets,
+        next_noise,
+        eps=EPS,
+        threshold=DISTANCE_THRESHOLD,
+    ):
+        self.core_coords = core_coords  # radians
+        self.core_clusters = core_clusters
+        self.centroids = centroids  # unit vectors sorted by location cluster
+        self.centroid_ids = centroid_ids
+        self.offsets = offsets  # location cluster c -> centroids[offsets[c]:offsets[c + 1]]
+        self.next_noise = next_noise
+        self.eps = eps
+        self.threshold = threshold
+        # without core points (all noise) every report is noise, no tree needed
+        self._tree = BallTree(core_coords, metric="haversine") if len(core_coords) else None
+
+    @classmethod
+    def fit(
+        cls,
+        coords,
+        cluster_ids,
+        embeddings,
+        eps=EPS,
+        min_samples=MIN_SAMPLES,
+        threshold=DISTANCE_THRESHOLD,
+    ):
+        """Build the assigner from the pipeline's output.
+
+        ``coords`` are all reports (latitude, longitude in degrees) that went
+        into DBSCAN, ``cluster_ids`` their final ids and ``embeddings`` their
+        ``report_embeddings``.
+        """
+        coords_rad = np.radians(np.asarray(coords, dtype=np.float64))
+        cluster_ids = np.asarray(cluster_ids, dtype=object).astype(str)
+        spatial = _spatial_cluster(cluster_ids)
+
+        # Core points are recomputed over all reports, noise included
+        clustered = np.flatnonzero(spatial >= 0)
+        core = clustered[:0]
+        if len(clustered):
+            counts = BallTree(coords_rad, metric="haversine").query_radius(
+                coords_rad[clustered], eps, count_only=True
+            )
+            core = clustered[counts >= min_samples]
+
+        unit = _normalize(embeddings)[clustered]
+        codes, centroid_ids = pd.factorize(cluster_ids[clustered])
+        members = coo_matrix(
+            (np.ones(len(codes), dtype=np.float32), (codes, np.arange(len(codes)))),
+            shape=(len(centroid_ids), len(codes)),
+        )
+        sums = members.tocsr() @ unit
+        centroid_spatial = _spatial_cluster(centroid_ids)
+        order = np.argsort(centroid_spatial, kind="stable")
+        n_spatial = int(spatial.max()) + 1 if len(clustered) else 0
+        offsets = np.searchsorted(centroid_spatial[order], np.arange(n_spatial + 1))
+
+        noise = [int(cid[len("noise_"):]) for cid in cluster_ids if cid.startswith("noise_")]
+        return cls(
+            coords_rad[core],
+            spatial[core],
+            _normalize(sums[order]),
+            np.asarray(centroid_ids, dtype=str)[order],
+            offsets,
+            max(noise, default=0) + 1,
+            eps=eps,
+            threshold=threshold,
+        )
+
+    def _noise_id(self):
+        cluster_id = f"noise_{self.next_noise}"
+        self.next_noise += 1
+        return cluster_id
+
+    def _text_cluster(self, spatial, embedding):
+        start, end = self.offsets[spatial], self.offsets[spatial + 1]
+        if start == end:
+            return self._noise_id()
+        similarity = self.centroids[start:end] @ embedding
+        best = int(np.argmax(similarity))
+        if 1 - similarity[best] > self.threshold:
+            return self._noise_id()
+        return str(self.centroid_ids[start + best])
+
+    def spatial_clusters(self, coords):
+        """Location cluster per report, -1 when no core point is within eps."""
+        coords_rad = np.radians(np.atleast_2d(np.asarray(coords, dtype=np.float64)))
+        if self._tree is None:
+            return np.full(len(coords_rad), -1, dtype=np.int64)
+        distance, nearest = self._tree.query(coords_rad, k=1)
+        spatial = self.core_clusters[nearest[:, 0]]
+        return np.where(distance[:, 0] <= self.eps, spatial, -1)
+
+    def assign(self, lat, long, embedding):
+        """``cluster_id`` of one new report."""
+        return self.assign_batch([[lat, long]], [embedding])[0]
+
+    def assign_batch(self, coords, embeddings):
+        """``cluster_id`` per new report, in input order."""
+        spatial = self.spatial_clusters(coords)
+        unit = _normalize(embeddings)
+        return [
+            self._noise_id() if s < 0 else self._text_cluster(s, e)
+            for s, e in zip(spatial.tolist(), unit)
+        ]
+
+    def save(self, path):
+        # Write-then-rename so an interrupted save never leaves half an index
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            core_coords=self.core_coords,
+            core_clusters=self.core_clusters,
+            centroids=self.centroids,
+            centroid_ids=self.centroid_ids,
+            offsets=self.offsets,
+            params=np.array([self.next_noise, self.eps, self.threshold], dtype=np.float64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            next_noise, eps, threshold = data["params"]
+            return cls(
+                data["core_coords"],
+                data["core_clusters"],
+                data["centroids"],
+                data["centroid_ids"],
+                data["offsets"],
+                int(next_noise),
+                eps=float(eps),
+                threshold=float(threshold),
+            )
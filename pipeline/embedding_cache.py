@@ -0,0 +1,148 @@
+"""Persistent cache of sentence embeddings, keyed by text and model.
+
+``traffy-cluster.ipynb`` encodes the comments and the cleaned ``type`` strings
+of every spatial cluster separately, so the few hundred distinct type
+combinations are encoded thousands of times and unchanged comments are encoded
+again on every run. ``EmbeddingCache`` stores every vector once:
+
+- the key is a 16-byte blake2b hash of the model name and the exact text, so
+  a cached vector is always the one the model returns for that text;
+- vectors are appended to ``vectors.f32``, a float32 matrix read through a
+  memory map, and their keys to ``keys.bin`` in the same row order;
+- ``encode`` looks every text up and only sends the distinct misses to the
+  model, in batches.
+
+Vectors are written before their keys, so a run that dies half way leaves at
+most a few unreferenced rows, which are dropped when the cache is opened.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+KEY_SIZE = 16
+
+
+def text_key(model_name, text):
+    digest = hashlib.blake2b(digest_size=KEY_SIZE)
+    digest.update(model_name.encode())
+    digest.update(b"\0")
+    digest.update(str(text).encode())
+    return digest.digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path, model_name):
+        self.path = path
+        self.model_name = model_name
+        self._keys_path = os.path.join(path, "keys.bin")
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._meta_path = os.path.join(path, "meta.json")
+        os.makedirs(path, exist_ok=True)
+
+        self.meta = {"model": model_name, "dim": None, "seconds_per_text": 0.0}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.meta.update(json.load(f))
+        self._index = {}
+        self._vectors = None
+        self._load()
+
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    @property
+    def dim(self):
+        return self.meta["dim"]
+
+    def _load(self):
+        if self.dim is None:
+            return
+        row_bytes = self.dim * 4
+        n_keys = os.path.getsize(self._keys_path) // KEY_SIZE if os.path.exists(self._keys_path) else 0
+        n_vectors = (
+            os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        )
+        n = min(n_keys, n_vectors)
+        # Drop a torn tail left by an interrupted append
+        for file_path, size in [(self._keys_path, n * KEY_SIZE), (self._vectors_path, n * row_bytes)]:
+            if os.path.exists(file_path) and os.path.getsize(file_path) != size:
+                os.truncate(file_path, size)
+
+        if n:
+            with open(self._keys_path, "rb") as f:
+                keys = f.read()
+            self._index = {keys[i * KEY_SIZE : (i + 1) * KEY_SIZE]: i for i in range(n)}
+        self._map_vectors()
+
+    def _map_vectors(self):
+        n = len(self._index)
+        self._vectors = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+            if n
+            else np.empty((0, self.dim), dtype=np.float32)
+        )
+
+    def __len__(self):
+        return len(self._index)
+
+    def _write_meta(self):
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _append(self, keys, vectors, seconds):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.meta["dim"] = vectors.shape[1]
+        # running average of the model's cost per text, to price cache hits
+        n = len(self)
+        self.meta["seconds_per_text"] = (self.meta["seconds_per_text"] * n + seconds) / (n + len(keys))
+        self._write_meta()
+
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._keys_path, "ab") as f:
+            f.write(b"".join(keys))
+        self._index.update(zip(keys, range(n, n + len(keys))))
+        self._map_vectors()
+
+    def encode(self, model, texts, batch_size=256):
+        """Embeddings of ``texts`` (n x dim), encoding only texts not cached yet."""
+        keys = [text_key(self.model_name, text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._index and key not in missing:
+                missing[key] = str(text)
+
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        if missing:
+            start = time.perf_counter()
+            vectors = model.encode(list(missing.values()), batch_size=batch_size, show_progress_bar=False)
+            seconds = time.perf_counter() - start
+            self.encode_seconds += seconds
+            self._append(list(missing), vectors, seconds)
+
+        rows = np.fromiter((self._index[key] for key in keys), dtype=np.int64, count=len(keys))
+        return np.asarray(self._vectors[rows])
+
+    def stats(self):
+        """Hit rate of this run, and the encoding time the hits saved."""
+        lookups = self.hits + self.misses
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "encode_seconds": self.encode_seconds,
+            "estimated_seconds_saved": self.hits * self.meta["seconds_per_text"],
+            "cached_vectors": len(self),
+        }
@@ -0,0 +1,191 @@
+"""Corpus-wide featurization for the text sub-clustering.
+
+``traffy-cluster.ipynb`` embeds, cleans and NER-tags comments one spatial
+cluster at a time, so the model only ever sees small batches and NER runs on
+one core. ``featurize`` does all of it once for the whole corpus instead:
+
+- comments are embedded in large fixed-size batches (optionally through an
+  ``EmbeddingCache``) into ``comment_embeddings.npy``;
+- the cleaned ``type`` strings are a small vocabulary, embedded once into
+  ``type_embeddings.npy`` with a per-row code in ``type_codes.npy``;
+- ``clean_sentences`` + ``ner.tag`` run in a process pool, one ``thainer``
+  model per worker, while the main process embeds the next batch; the NER
+  features go to ``ner.parquet``.
+
+Rows are keyed by the DataFrame index (``rows.npy``), and ``meta.json`` is
+written last, so a directory without it is an unfinished run.
+``Features.load`` memory-maps the result and ``take`` slices it by row, which
+is all ``pipeline.text_cluster`` needs per spatial cluster.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pipeline.text_clean import clean_sentences, clean_type
+
+MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+
+_ner = None  # one NER model per worker process
+
+
+def _init_ner():
+    from pythainlp.tag import NER
+
+    global _ner
+    _ner = NER("thainer")
+
+
+def extract_named_entities(text, ner):
+    entities = ner.tag(text)
+    named_entities = [word for word, tag in entities if tag != 'O']
+
+    # หากไม่มี named entities ให้คืนค่าเป็นคำที่เป็นข้อความดั้งเดิม
+    if not named_entities:
+        return text
+    return " ".join(named_entities)
+
+
+def ner_features(texts):
+    """NER features of raw comments, as the notebook computes them per cluster."""
+    if _ner is None:
+        _init_ner()
+    return [extract_named_entities(text, _ner) for text in clean_sentences(texts, True)]
+
+
+def _encode(model, texts, batch_size, cache):
+    if cache is not None:
+        return cache.encode(model, texts, batch_size=batch_size)
+    return model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+
+
+def featurize(
+    df,
+    model,
+    out_dir,
+    batch_size=4096,
+    encode_batch_size=256,
+    ner_chunk_size=256,
+    n_jobs=None,
+    cache=None,
+    model_name=MODEL_NAME,
+):
+    """Write the features of every row of ``df`` (``comment``, ``type``) to ``out_dir``."""
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    start = time.perf_counter()
+    rows = df.index.to_numpy(dtype=np.int64)
+    comments = [str(comment) for comment in df["comment"]]
+    n = len(comments)
+    np.save(os.path.join(out_dir, "rows.npy"), rows)
+
+    type_codes, type_vocabulary = pd.factorize(df["type"].map(clean_type))
+    np.save(os.path.join(out_dir, "type_codes.npy"), type_codes.astype(np.int32))
+    type_embeddings = _encode(model, list(type_vocabulary), encode_batch_size, cache)
+    np.save(os.path.join(out_dir, "type_embeddings.npy"), np.asarray(type_embeddings, dtype=np.float32))
+
+    comment_embeddings = None
+    ner = [None] * n
+    embed_seconds = 0.0
+    pending = deque()  # (batch start, NER futures) still running
+
+    def collect(batch_start, futures):
+        position = batch_start
+        for future in futures:
+            features = future.result()
+            ner[position : position + len(features)] = features
+            position += len(features)
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_ner) as pool:
+        for batch_start in range(0, n, batch_size):
+            texts = comments[batch_start : batch_start + batch_size]
+            pending.append(
+                (
+                    batch_start,
+                    [
+                        pool.submit(ner_features, texts[i : i + ner_chunk_size])
+                        for i in range(0, len(texts), ner_chunk_size)
+                    ],
+                )
+            )
+
+            embed_start = time.perf_counter()
+            vectors = np.asarray(_encode(model, texts, encode_batch_size, cache), dtype=np.float32)
+            if comment_embeddings is None:
+                comment_embeddings = np.lib.format.open_memmap(
+                    os.path.join(out_dir, "comment_embeddings.npy"),
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(n, vectors.shape[1]),
+                )
+            comment_embeddings[batch_start : batch_start + len(texts)] = vectors
+            embed_seconds += time.perf_counter() - embed_start
+
+            # keep one batch of NER in flight behind the embedding
+            while len(pending) > 1:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+
+    if comment_embeddings is not None:
+        comment_embeddings.flush()
+        del comment_embeddings
+    pd.DataFrame({"row": rows, "ner": ner}).to_parquet(os.path.join(out_dir, "ner.parquet"), index=False)
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "model": model_name,
+        "comments": n,
+        "types": len(type_vocabulary),
+        "seconds": seconds,
+        "embed_seconds": embed_seconds,
+        "comments_per_second": n / seconds if seconds else 0.0,
+    }
+    with open(meta_path, "w") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+
+class Features:
+    def __init__(self, rows, comment_embeddings, type_codes, type_embeddings, ner):
+        self.rows = pd.Index(rows)
+        self.comment_embeddings = comment_embeddings
+        self.type_codes = type_codes
+        self.type_embeddings = type_embeddings
+        self.ner = ner
+
+    @classmethod
+    def load(cls, out_dir):
+        if not os.path.exists(os.path.join(out_dir, "meta.json")):
+            raise FileNotFoundError(f"no finished featurize run in {out_dir}")
+        rows = np.load(os.path.join(out_dir, "rows.npy"))
+        if len(rows):
+            comment_embeddings = np.load(os.path.join(out_dir, "comment_embeddings.npy"), mmap_mode="r")
+        else:
+            comment_embeddings = np.empty((0, 0), dtype=np.float32)
+        return cls(
+            rows,
+            comment_embeddings,
+            np.load(os.path.join(out_dir, "type_codes.npy")),
+            np.load(os.path.join(out_dir, "type_embeddings.npy")),
+            pd.read_parquet(os.path.join(out_dir, "ner.parquet"))["ner"].to_numpy(dtype=object),
+        )
+
+    def take(self, rows):
+        """``(comment embeddings, type embeddings, NER features)`` of ``rows``."""
+        positions = self.rows.get_indexer(rows)
+        if (positions < 0).any():
+            raise KeyError("rows without features, rerun featurize")
+        return (
+            np.asarray(self.comment_embeddings[positions]),
+            self.type_embeddings[self.type_codes[positions]],
+            self.ner[positions].tolist(),
+        )
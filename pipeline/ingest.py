@@ -0,0 +1,152 @@
+"""Streaming ingestion of the raw ``bangkok_traffy.csv`` dump.
+
+``DataPreparation(spark).ipynb`` first copies the dump row by row with
+``csv.reader``/``csv.writer`` to drop short rows, reads the copy back with
+Spark, drops reports missing a required field, splits ``coords`` into
+``longitude``/``latitude`` and cleans ``comment`` with ``clean_text``.
+``ingest`` does the same in one pass over the original file, keeping the
+original text in ``raw_comment`` for the steps that use it (``traffy-cluster``
+embeds and shows the comments as written):
+
+- the C CSV parser reads fixed-size chunks (``on_bad_lines="skip"``, blank
+  lines skipped), so peak memory depends on the chunk size, not the file;
+- chunks are cleaned and typed (floats for the coordinates, UTC timestamps)
+  in a process pool while the main process parses the next ones;
+- typed batches stream into a ``pipeline.storage`` stage as they come, and
+  the manifest records the throughput in MB/s.
+
+    python -m pipeline.ingest bangkok_traffy.csv --out work/reports --jobs 4
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+from pipeline.storage import write_stage
+from pipeline.text_clean import clean_comment
+
+REQUIRED_COLUMNS = ["organization", "comment", "timestamp", "state", "last_activity"]
+CHUNK_ROWS = 100_000
+
+TEXT_COLUMNS = [
+    "ticket_id", "type", "organization", "comment", "photo", "photo_after",
+    "address", "subdistrict", "district", "province", "state",
+]
+RAW_COLUMNS = TEXT_COLUMNS + ["coords", "timestamp", "last_activity", "star", "count_reopen"]
+SCHEMA = pa.schema(
+    [(name, pa.string()) for name in TEXT_COLUMNS]
+    + [
+        ("raw_comment", pa.string()),
+        ("timestamp", pa.timestamp("ns", tz="UTC")),
+        ("last_activity", pa.timestamp("ns", tz="UTC")),
+        ("star", pa.float64()),
+        ("count_reopen", pa.float64()),
+        ("longitude", pa.float64()),
+        ("latitude", pa.float64()),
+    ]
+)
+
+
+def clean_chunk(chunk):
+    """One chunk of raw rows (all strings) as a typed Arrow table of ``SCHEMA``."""
+    chunk = chunk.reindex(columns=RAW_COLUMNS).dropna(subset=REQUIRED_COLUMNS)
+
+    # "lon,lat" -> two floats, unparsable parts become missing
+    parts = chunk["coords"].str.split(",", expand=True).reindex(columns=[0, 1])
+    columns = {name: chunk[name] for name in TEXT_COLUMNS}
+    columns["comment"] = chunk["comment"].map(clean_comment)
+    columns["raw_comment"] = chunk["comment"]
+    for name in ["timestamp", "last_activity"]:
+        columns[name] = pd.to_datetime(chunk[name], utc=True, format="ISO8601", errors="coerce")
+    for name in ["star", "count_reopen"]:
+        columns[name] = pd.to_numeric(chunk[name], errors="coerce")
+    columns["longitude"] = pd.to_numeric(parts[0], errors="coerce")
+    columns["latitude"] = pd.to_numeric(parts[1], errors="coerce")
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=SCHEMA, preserve_index=False)
+
+
+def read_raw_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Raw rows of the dump as string DataFrames of ``chunk_rows`` rows."""
+    return pd.read_csv(
+        path,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
+        quotechar='"',
+        on_bad_lines="skip",
+        encoding="utf-8",
+        encoding_errors="replace",
+        chunksize=chunk_rows,
+    )
+
+
+def iter_clean_tables(path, chunk_rows=CHUNK_ROWS, n_jobs=1, stats=None):
+    """Cleaned tables of the dump in file order, chunks cleaned by ``n_jobs`` processes."""
+    stats = stats if stats is not None else {}
+    stats.setdefault("rows_read", 0)
+    stats.setdefault("rows_written", 0)
+
+    def counted(table, n_raw):
+        stats["rows_read"] += n_raw
+        stats["rows_written"] += table.num_rows
+        return table
+
+    if n_jobs == 1:
+        for chunk in read_raw_chunks(path, chunk_rows):
+            yield counted(clean_chunk(chunk), len(chunk))
+        return
+
+    n_jobs = n_jobs or os.cpu_count()
+    pending = deque()  # (future, raw row count), in file order
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        for chunk in read_raw_chunks(path, chunk_rows):
+            pending.append((pool.submit(clean_chunk, chunk), len(chunk)))
+            # bounded read-ahead keeps memory independent of the file size
+            while len(pending) > 2 * n_jobs:
+                future, n_raw = pending.popleft()
+                yield counted(future.result(), n_raw)
+        while pending:
+            future, n_raw = pending.popleft()
+            yield counted(future.result(), n_raw)
+
+
+def _throughput(stats, start):
+    stats["seconds"] = time.perf_counter() - start
+    stats["mb_per_second"] = stats["input_bytes"] / 1e6 / stats["seconds"] if stats["seconds"] else 0.0
+
+
+def ingest(path, out_path, chunk_rows=CHUNK_ROWS, n_jobs=1):
+    """Clean the raw dump at ``path`` into the stage ``out_path``; returns the stats."""
+    start = time.perf_counter()
+    stats = {"source": os.path.abspath(path), "input_bytes": os.path.getsize(path)}
+
+    def batches():
+        for table in iter_clean_tables(path, chunk_rows, n_jobs, stats):
+            yield from table.to_batches()
+        # the manifest is written after the last batch, so it gets the totals
+        _throughput(stats, start)
+
+    write_stage(batches(), out_path, schema=SCHEMA, info=stats)
+    _throughput(stats, start)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the raw Traffy dump into a Parquet stage")
+    parser.add_argument("raw", help="bangkok_traffy.csv")
+    parser.add_argument("--out", default="work/reports")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--jobs", type=int, default=1, help="cleaning processes (0 for all cores)")
+    args = parser.parse_args()
+
+    stats = ingest(args.raw, args.out, args.chunk_rows, args.jobs or None)
+    print(
+        f"{stats['rows_written']}/{stats['rows_read']} rows, "
+        f"{stats['input_bytes'] / 1e6:.1f} MB in {stats['seconds']:.1f}s "
+        f"({stats['mb_per_second']:.1f} MB/s) -> {args.out}"
+    )
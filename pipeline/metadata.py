@@ -0,0 +1,148 @@
+"""``cluster_id`` of every report and the cluster metadata (``processing-traffy.ipynb``).
+
+Reports that DBSCAN left as noise (``cluster == -1``) or that got no text
+sub-cluster become their own cluster ``noise_<n>``, where ``n`` is the
+report's 1-based position in the table; every other report gets
+``<cluster>_<text_cluster>``. The metadata of a cluster is the mean location
+of its reports, its ``cluster_desc`` from ``cluster_info`` (the comment of
+the report for noise clusters) and its most frequent organization.
+
+The notebook numbers the reports with ``row_number`` over a window without a
+partition, which moves the whole table into one task, then builds the
+metadata from three aggregations (one more ``row_number`` window for the
+organization) and three joins. Here:
+
+- ``n`` is the report's position inside its partition plus the number of
+  reports in the partitions before it, the same numbering from one small
+  count per partition of the local-checkpointed table;
+- location and first comment come out of a single ``groupBy`` and
+  ``cluster_info`` is broadcast into it; the organization is the
+  ``max(struct(count, organization))`` of the per-organization counts, a
+  second aggregation instead of a window (``F.mode`` would need Spark 3.4).
+
+``assign_cluster_ids``/``cluster_metadata`` do the same on pandas DataFrames.
+"""
+
+import numpy as np
+import pandas as pd
+
+METADATA_COLUMNS = ["cluster_id", "cluster_desc", "lat", "lon", "organization"]
+
+
+def _is_noise(cluster, text_cluster):
+    return (cluster.astype(str) == "-1") | text_cluster.isna()
+
+
+def _join_ids(cluster, text_cluster):
+    # concat_ws('_', cluster, text_cluster.cast("int")): a missing text_cluster is left out
+    present = text_cluster.notna()
+    suffix = pd.Series("", index=text_cluster.index, dtype=object)
+    suffix[present] = "_" + text_cluster[present].astype(np.int64).astype(str)
+    return cluster.astype(str) + suffix
+
+
+def assign_cluster_ids(df):
+    """``df`` with ``cluster``/``text_cluster`` replaced by ``cluster_id``."""
+    noise = _is_noise(df["cluster"], df["text_cluster"]).to_numpy()
+    position = pd.Series(np.arange(1, len(df) + 1), index=df.index).astype(str)
+    cluster = df["cluster"].astype(str).where(~noise, "noise_" + position)
+    cluster_id = _join_ids(cluster, df["text_cluster"])
+    return df.drop(columns=["cluster", "text_cluster"]).assign(cluster_id=cluster_id)
+
+
+def cluster_metadata(df, cluster_info):
+    """One row per ``cluster_id`` of ``df`` (the output of ``assign_cluster_ids``)."""
+    info = pd.DataFrame(
+        {
+            "cluster_id": _join_ids(cluster_info["cluster_id"], cluster_info["text_cluster"]),
+            "cluster_desc": cluster_info["cluster_desc"],
+        }
+    ).drop_duplicates("cluster_id")
+
+    grouped = df.groupby("cluster_id", sort=False)
+    metadata = grouped.agg(
+        lat=("latitude", "mean"),
+        lon=("longitude", "mean"),
+        first_comment=("comment", "first"),
+    )
+    counts = df.groupby(["cluster_id", "organization"], sort=False).size()
+    organization = (
+        counts.sort_values(ascending=False, kind="stable")
+        .reset_index()
+        .drop_duplicates("cluster_id")
+        .set_index("cluster_id")["organization"]
+    )
+    metadata["organization"] = organization.reindex(metadata.index)
+
+    metadata = metadata.reset_index().merge(info, on="cluster_id", how="left")
+    noise = metadata["cluster_id"].str.startswith("noise_")
+    metadata["cluster_desc"] = metadata["cluster_desc"].where(
+        metadata["cluster_desc"].notna() | ~noise, metadata["first_comment"]
+    )
+    return metadata[METADATA_COLUMNS]
+
+
+# ------------------------- SPARK -----------------------------
+
+
+def assign_cluster_ids_spark(df):
+    """``assign_cluster_ids`` for a Spark DataFrame, without a global window.
+
+    ``monotonically_increasing_id`` is the partition index in the upper bits
+    and the position in the partition in the lower 33, so adding the number
+    of rows of the earlier partitions gives the row number. The counts take
+    one extra job over ``df``, so ``df`` is local-checkpointed first: both
+    jobs then read the same materialized partitions, even when recomputing
+    ``df`` would shuffle or split its rows differently.
+    """
+    from pyspark.sql import functions as F
+
+    df = df.localCheckpoint()
+    partition = F.spark_partition_id()
+    counts = dict(df.groupBy(partition.alias("partition")).count().collect())
+    offsets = [0] * (max(counts, default=-1) + 1)
+    total = 0
+    for index in range(len(offsets)):
+        offsets[index] = total
+        total += counts.get(index, 0)
+
+    position = F.monotonically_increasing_id() - F.shiftleft(partition.cast("long"), 33)
+    offset = F.element_at(F.array(*[F.lit(o) for o in offsets] or [F.lit(0)]), partition + 1)
+    row_number = position + offset + 1
+
+    noise = (F.col("cluster") == "-1") | F.col("text_cluster").isNull()
+    cluster = F.when(noise, F.concat(F.lit("noise_"), row_number)).otherwise(F.col("cluster"))
+    return df.withColumn(
+        "cluster_id", F.concat_ws("_", cluster, F.col("text_cluster").cast("int"))
+    ).drop("cluster", "text_cluster")
+
+
+def cluster_metadata_spark(df, cluster_info):
+    """``cluster_metadata`` for Spark DataFrames, one aggregation and a broadcast join."""
+    from pyspark.sql import functions as F
+
+    info = cluster_info.select(
+        F.concat_ws("_", F.col("cluster_id"), F.col("text_cluster").cast("int")).alias("cluster_id"),
+        "cluster_desc",
+    )
+    metadata = df.groupBy("cluster_id").agg(
+        F.mean("latitude").alias("lat"),
+        F.mean("longitude").alias("lon"),
+        F.first("comment", ignorenulls=True).alias("first_comment"),
+    )
+    # most frequent organization: structs compare field by field, count first
+    organization = (
+        df.where(F.col("organization").isNotNull())
+        .groupBy("cluster_id", "organization")
+        .count()
+        .groupBy("cluster_id")
+        .agg(F.max(F.struct("count", "organization")).alias("top"))
+        .select("cluster_id", F.col("top.organization").alias("organization"))
+    )
+    noise_desc = F.when(F.col("cluster_id").startswith("noise_"), F.col("first_comment"))
+    return (
+        metadata.join(organization, on="cluster_id", how="left")
+        .join(F.broadcast(info), on="cluster_id", how="left")
+        .withColumn("cluster_desc", F.coalesce(F.col("cluster_desc"), noise_desc))
+        .select(*METADATA_COLUMNS)
+    )
@@ -0,0 +1,168 @@
+"""Run pipeline stages with a content-addressed output cache.
+
+A ``Stage`` is a function writing its output into a directory, the names of
+the stages it reads, the parameters that change its output and the external
+files it reads. Its key hashes all of that together with the source of the
+stage function and of the modules it lists, and the keys of its inputs:
+
+- the output lives in ``<work_dir>/<stage>/<key>/`` and is only published
+  (renamed from a ``.tmp`` directory, ``_stage.json`` inside) once the stage
+  finished, so an existing directory is a valid cached result and the stage
+  is skipped;
+- changing a parameter (e.g. DBSCAN ``eps``), the code or an input file
+  changes the key of that stage and of everything downstream of it, and
+  nothing else is rerun;
+- stages whose inputs are ready run concurrently in a thread pool (the heavy
+  stages spend their time in NumPy, Arrow or their own process pools), and
+  the time of every stage is logged and saved in ``<work_dir>/last_run.json``.
+
+External files are fingerprinted by path, size and modification time, not by
+content, so a raw dump of several GB isn't read just to compute a key.
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+log = logging.getLogger("pipeline")
+
+STAGE_FILE = "_stage.json"
+
+
+class Stage:
+    def __init__(self, name, run, inputs=(), params=None, modules=(), files=()):
+        self.name = name
+        self.run = run  # run(out_dir, inputs={name: dir}, **params)
+        self.inputs = list(inputs)
+        self.params = dict(params or {})
+        self.modules = list(modules)  # modules whose code the output depends on
+        self.files = [file for file in files if file]
+
+    def code_version(self):
+        digest = hashlib.sha256(inspect.getsource(self.run).encode())
+        for module in self.modules:
+            digest.update(inspect.getsource(module).encode())
+        return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    path = os.path.abspath(path)
+    if os.path.isdir(path):
+        entries = sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+        )
+    else:
+        entries = [path]
+    return [(entry, os.path.getsize(entry), os.stat(entry).st_mtime_ns) for entry in entries]
+
+
+def stage_key(stage, input_keys):
+    description = {
+        "stage": stage.name,
+        "code": stage.code_version(),
+        "params": stage.params,
+        "inputs": {name: input_keys[name] for name in stage.inputs},
+        "files": [file_fingerprint(file) for file in stage.files],
+    }
+    encoded = json.dumps(description, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def _resolve(stages, targets):
+    # the target stages and everything they read, in dependency order
+    by_name = {stage.name: stage for stage in stages}
+    order, seen = [], set()
+
+    def visit(name, path=()):
+        if name in path:
+            raise ValueError(f"stage cycle through {name}")
+        if name in seen:
+            return
+        if name not in by_name:
+            raise KeyError(f"unknown stage {name}")
+        for dependency in by_name[name].inputs:
+            visit(dependency, path + (name,))
+        seen.add(name)
+        order.append(by_name[name])
+
+    for name in targets or by_name:
+        visit(name)
+    return order
+
+
+def _run_stage(stage, out_dir, inputs):
+    tmp_dir = out_dir + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    start = time.perf_counter()
+    stage.run(tmp_dir, inputs, **stage.params)
+    seconds = time.perf_counter() - start
+    with open(os.path.join(tmp_dir, STAGE_FILE), "w") as f:
+        json.dump(
+            {"stage": stage.name, "params": stage.params, "inputs": inputs, "seconds": seconds, "finished": time.time()},
+            f,
+            indent=2,
+            default=str,
+        )
+    os.rename(tmp_dir, out_dir)
+    return seconds
+
+
+def run_pipeline(stages, work_dir, targets=None, force=(), max_workers=None):
+    """Run ``targets`` (default: all stages) and what they need; returns ``{stage: info}``.
+
+    Stages named in ``force`` run even when their output is cached.
+    """
+    order = _resolve(stages, targets)
+    keys, paths, results = {}, {}, {}
+    for stage in order:
+        keys[stage.name] = stage_key(stage, keys)
+        paths[stage.name] = os.path.join(work_dir, stage.name, keys[stage.name])
+
+    remaining = {stage.name: stage for stage in order}
+    running = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(order) or 1) as pool:
+        while remaining or running:
+            for name, stage in list(remaining.items()):
+                if any(dependency not in results for dependency in stage.inputs):
+                    continue
+                del remaining[name]
+                out_dir = paths[name]
+                if name not in force and os.path.exists(os.path.join(out_dir, STAGE_FILE)):
+                    results[name] = {"key": keys[name], "path": out_dir, "seconds": 0.0, "cached": True}
+                    log.info("%-14s cached  %s", name, out_dir)
+                    continue
+                if os.path.exists(out_dir):
+                    shutil.rmtree(out_dir)
+                inputs = {dependency: paths[dependency] for dependency in stage.inputs}
+                log.info("%-14s started", name)
+                running[pool.submit(_run_stage, stage, out_dir, inputs)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception:
+                    log.exception("%-14s failed", name)
+                    for other in running:
+                        other.cancel()
+                    raise
+                results[name] = {"key": keys[name], "path": paths[name], "seconds": seconds, "cached": False}
+                log.info("%-14s done in %.1fs", name, seconds)
+
+    summary = {"seconds": time.perf_counter() - start, "stages": results}
+    os.makedirs(work_dir, exist_ok=True)
+    with open(os.path.join(work_dir, "last_run.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    log.info("pipeline done in %.1fs", summary["seconds"])
+    return results
@@ -0,0 +1,345 @@
+"""Zone points from OpenStreetMap tags (``api_for_zone_module.ipynb``).
+
+An OSM element is a point of the first zone in ``ZONES`` order for which a
+tag key equals one of the zone's keywords or a tag value (lowercased)
+contains one. The notebook downloads the whole Bangkok bbox as one JSON
+document and checks every tag against every keyword of every zone. Here:
+
+- the bbox is split into tiles and Overpass returns only the tagged elements
+  of each (``if: count_tags() > 0``), with their bounding boxes;
+- an element can come back from several tiles (ways and relations crossing
+  tile borders, nodes on them). One that fits in a single tile is yielded
+  without being remembered; one whose bounding box spans several tiles is
+  yielded the first time and its ``(type, id)`` is kept only until the last
+  of those tiles has been fetched. So every element the whole-bbox query
+  returned is kept once, and what is remembered is the border crossers of
+  about a row of tiles (plus the rare element spanning much of the city),
+  not every element seen so far;
+- each tile's response is parsed as a stream with ``ijson`` when it is
+  installed and points are written as they come. Without ``ijson``,
+  ``_parse_elements`` falls back to ``json.load`` of a whole tile, so peak
+  memory is that of the largest tile's response rather than of the city;
+- ``ZoneMatcher`` turns keys into zone bitmasks with one dict lookup and
+  values with an Aho-Corasick automaton over all keywords, caching the mask
+  of every distinct value.
+
+A local Overpass JSON extract (or ``.osm.pbf`` with ``osmium``) can be used
+instead of the API, and ``local_fetch`` serves tiles from such an extract as a
+stand-in for Overpass:
+
+    python -m pipeline.osm_zones --out zone_points.csv
+    python -m pipeline.osm_zones --json bangkok.json --out zone_points.csv
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import math
+import os
+import time
+from collections import deque
+
+from pipeline.zones import BANGKOK_BBOX, ZONES
+
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+TILE_SIZE = 0.1  # degrees
+
+
+# ------------------------- MATCHING -----------------------------
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher; ``search`` ORs the values of all matches."""
+
+    def __init__(self, patterns):
+        # patterns: {substring: int bitmask}
+        self.goto = [{}]
+        self.output = [0]
+        for pattern, value in patterns.items():
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.output.append(0)
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.output[node] |= value
+
+        # breadth-first failure links; outputs include those of the suffixes
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] |= self.output[self.fail[child]]
+
+    def search(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        found = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            found |= output[node]
+        return found
+
+
+class ZoneMatcher:
+    def __init__(self, zones=ZONES):
+        self.zones = list(zones)
+        key_masks = {}
+        for bit, keywords in enumerate(zones.values()):
+            for keyword in keywords:
+                key_masks[keyword] = key_masks.get(keyword, 0) | 1 << bit
+        self.key_masks = key_masks  # exact tag key -> zones
+        self.automaton = AhoCorasick(key_masks)  # substring of a value -> zones
+        self._value_masks = {}
+
+    def _value_mask(self, value):
+        mask = self._value_masks.get(value)
+        if mask is None:
+            mask = self._value_masks[value] = self.automaton.search(str(value).lower())
+        return mask
+
+    def zone(self, tags):
+        """Zone of an element's tags, None when no zone matches."""
+        mask = 0
+        for key, value in tags.items():
+            mask |= self.key_masks.get(key.lower(), 0) | self._value_mask(value)
+        if not mask:
+            return None
+        # the lowest bit is the first zone in ZONES order
+        return self.zones[(mask & -mask).bit_length() - 1]
+
+
+def element_location(element):
+    """Node location, else ``out center``'s center, else the center of ``out bb``'s bounds."""
+    lat = element.get("lat") or element.get("center", {}).get("lat")
+    lon = element.get("lon") or element.get("center", {}).get("lon")
+    bounds = element.get("bounds")
+    if (lat is None or lon is None) and bounds is not None:
+        # Overpass' center is the center of the bounding box too
+        lat = (bounds["minlat"] + bounds["maxlat"]) / 2
+        lon = (bounds["minlon"] + bounds["maxlon"]) / 2
+    return lat, lon
+
+
+def extract_zone_points(elements, matcher=None):
+    """Yield ``(lat, lon, zone)`` of the elements that belong to a zone."""
+    matcher = matcher or ZoneMatcher()
+    for element in elements:
+        lat, lon = element_location(element)
+        if lat is None or lon is None:
+            continue
+        zone = matcher.zone(element.get("tags", {}))
+        if zone is not None:
+            yield float(lat), float(lon), zone
+
+
+# ------------------------- SOURCES -----------------------------
+
+
+def _grid(bbox, tile_size):
+    south, west, north, east = bbox
+    # edges from integer indices: summing tile_size drifts and leaves slivers
+    n_rows = max(math.ceil((north - south) / tile_size - 1e-9), 1)
+    n_cols = max(math.ceil((east - west) / tile_size - 1e-9), 1)
+    return n_rows, n_cols
+
+
+def tiles(bbox=BANGKOK_BBOX, tile_size=TILE_SIZE):
+    """Yield ``(south, west, north, east)`` tiles covering ``bbox``, row by row from the south."""
+    south, west, north, east = bbox
+    n_rows, n_cols = _grid(bbox, tile_size)
+    for i in range(n_rows):
+        tile_north = north if i == n_rows - 1 else south + (i + 1) * tile_size
+        for j in range(n_cols):
+            tile_east = east if j == n_cols - 1 else west + (j + 1) * tile_size
+            yield (south + i * tile_size, west + j * tile_size, tile_north, tile_east)
+
+
+def _parse_elements(stream):
+    """Elements of an Overpass JSON document, streamed with ijson if available."""
+    try:
+        import ijson
+    except ImportError:
+        yield from json.load(stream).get("elements", [])
+        return
+    yield from ijson.items(stream, "elements.item", use_float=True)
+
+
+def fetch_overpass(tile, url=OVERPASS_URL, pause=1.0):
+    """Stream the tagged nodes, ways and relations of one tile, with bounding boxes, from Overpass."""
+    import requests
+
+    south, west, north, east = tile
+    query = f"""
+    [out:json][timeout:90];
+    (
+      node({south},{west},{north},{east})(if: count_tags() > 0);
+      way({south},{west},{north},{east})(if: count_tags() > 0);
+      relation({south},{west},{north},{east})(if: count_tags() > 0);
+    );
+    out bb tags;
+    """
+    time.sleep(pause)
+    with requests.post(url, data=query, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        yield from _parse_elements(response.raw)
+
+
+def read_json_extract(path):
+    """Elements of a local Overpass JSON extract (``out center tags`` or ``out bb tags``)."""
+    with open(path, "rb") as f:
+        yield from _parse_elements(f)
+
+
+def read_pbf_extract(path):
+    """Tagged nodes and ways of a local ``.osm.pbf`` (needs ``osmium``).
+
+    Ways get their bounding box and its center like Overpass' ``out bb center``;
+    relations are skipped, their geometry isn't in the file's node locations.
+    """
+    import osmium
+
+    for obj in osmium.FileProcessor(path).with_locations():
+        if not len(obj.tags):
+            continue
+        tags = {tag.k: tag.v for tag in obj.tags}
+        if obj.is_node() and obj.location.valid():
+            yield {"type": "node", "id": obj.id, "lat": obj.location.lat, "lon": obj.location.lon, "tags": tags}
+        elif obj.is_way():
+            locations = [node.location for node in obj.nodes if node.location.valid()]
+            if locations:
+                lats = [location.lat for location in locations]
+                lons = [location.lon for location in locations]
+                bounds = {"minlat": min(lats), "minlon": min(lons), "maxlat": max(lats), "maxlon": max(lons)}
+                center = {"lat": (bounds["minlat"] + bounds["maxlat"]) / 2, "lon": (bounds["minlon"] + bounds["maxlon"]) / 2}
+                yield {"type": "way", "id": obj.id, "bounds": bounds, "center": center, "tags": tags}
+
+
+def element_bounds(element):
+    """``(south, west, north, east)`` of an element, its location if it has no bounds."""
+    bounds = element.get("bounds")
+    if bounds is not None:
+        return bounds["minlat"], bounds["minlon"], bounds["maxlat"], bounds["maxlon"]
+    lat, lon = element_location(element)
+    if lat is None or lon is None:
+        return None
+    return lat, lon, lat, lon
+
+
+def local_fetch(path):
+    """A ``fetch`` answering tile queries from a local JSON extract, like Overpass.
+
+    Elements whose bounds (``out bb``, or else their location) intersect the
+    closed tile are returned, so ways crossing tile borders and elements on
+    them come back from every tile they touch, as they do from the API.
+    """
+
+    def fetch(tile):
+        south, west, north, east = tile
+        for element in read_json_extract(path):
+            bounds = element_bounds(element)
+            if (
+                bounds is not None
+                and bounds[0] <= north
+                and bounds[2] >= south
+                and bounds[1] <= east
+                and bounds[3] >= west
+            ):
+                yield element
+
+    return fetch
+
+
+def _tile_span(bounds, bbox, tile_size, n_rows, n_cols):
+    """Row-major indexes of the first and last tiles a bounding box can touch."""
+    south, west, _, _ = bbox
+
+    def index(low, high, origin, n):
+        # closed tiles: a box ending on an edge touches the tiles on both sides
+        first = math.floor((low - origin) / tile_size - 1e-9)
+        last = math.floor((high - origin) / tile_size + 1e-9)
+        return min(max(first, 0), n - 1), min(max(last, 0), n - 1)
+
+    first_row, last_row = index(bounds[0], bounds[2], south, n_rows)
+    first_col, last_col = index(bounds[1], bounds[3], west, n_cols)
+    return first_row * n_cols + first_col, last_row * n_cols + last_col
+
+
+def iter_tiled_elements(bbox=BANGKOK_BBOX, tile_size=TILE_SIZE, fetch=fetch_overpass):
+    """Elements of ``bbox`` fetched tile by tile, each one exactly once.
+
+    An element can only come back from the tiles its bounding box touches. If
+    that is one tile it is yielded as is. Otherwise it is yielded the first
+    time and remembered in ``pending`` until the last tile it touches has
+    been fetched, tiles coming row by row.
+    """
+    n_rows, n_cols = _grid(bbox, tile_size)
+    pending = {}  # (type, id) -> last tile that can return it
+    expiry = []  # heap of (last tile, (type, id))
+    for tile_index, tile in enumerate(tiles(bbox, tile_size)):
+        while expiry and expiry[0][0] < tile_index:
+            del pending[heapq.heappop(expiry)[1]]
+        for element in fetch(tile):
+            bounds = element_bounds(element)
+            if bounds is None:
+                continue  # no location, not a zone point
+            first, last = _tile_span(bounds, bbox, tile_size, n_rows, n_cols)
+            if first == last or element.get("id") is None:
+                yield element
+                continue
+            key = (element.get("type"), element["id"])
+            if key in pending:
+                continue
+            last = max(last, tile_index)
+            pending[key] = last
+            heapq.heappush(expiry, (last, key))
+            yield element
+
+
+# ------------------------- OUTPUT -----------------------------
+
+
+def write_zone_points(points, path, flush_every=10000):
+    """Write ``(lat, lon, zone)`` rows to a CSV as they come; returns the count."""
+    tmp_path = path + ".tmp"
+    count = 0
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["lat", "lon", "zone"])
+        for count, point in enumerate(points, 1):
+            writer.writerow(point)
+            if count % flush_every == 0:
+                f.flush()
+    os.replace(tmp_path, path)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract zone points from OSM")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--json", help="local Overpass JSON extract instead of the API")
+    source.add_argument("--pbf", help="local .osm.pbf extract instead of the API")
+    parser.add_argument("--tile-size", type=float, default=TILE_SIZE)
+    parser.add_argument("--out", default="zone_points.csv")
+    args = parser.parse_args()
+
+    if args.json:
+        elements = read_json_extract(args.json)
+    elif args.pbf:
+        elements = read_pbf_extract(args.pbf)
+    else:
+        elements = iter_tiled_elements(tile_size=args.tile_size)
+    count = write_zone_points(extract_zone_points(elements), args.out)
+    print(f"{count} zone points -> {args.out}")
@@ -0,0 +1,334 @@
+"""How many times the problem of each cluster occurred (``num_times``).
+
+A report starts a new occurrence when it was filed after the last activity of
+the report that started the current occurrence; reports filed before that are
+follow-ups of the same problem (see ``count_problems`` in
+``notebooks/Algo_Computing.ipynb``). ``status`` is the state of the latest
+report in (timestamp, last_activity) order.
+
+``count_problems`` recomputes everything from a full report history with the
+columnar ``merge_occurrences`` kernel. ``RecurrenceState`` keeps only the
+per-cluster end of the current occurrence, count and latest state, so new
+report batches are applied in O(batch) with the same kernel.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = ["cluster_id", "timestamp", "last_activity", "state"]
+
+
+def prepare_reports(df):
+    """Parse timestamps, drop noise clusters and sort like the batch algorithm.
+
+    Timestamps become int64 nanoseconds since the epoch (UTC) in
+    ``timestamp_ts``/``last_activity_ts``. Rows without both timestamps can't
+    be ordered and are dropped.
+    """
+    df = df[REQUIRED_COLUMNS].copy()
+    df["cluster_id"] = df["cluster_id"].astype(str)
+    df = df[~df["cluster_id"].str.contains("noise")]
+
+    for column in ["timestamp", "last_activity"]:
+        parsed = pd.to_datetime(df[column], utc=True, format="ISO8601", errors="coerce")
+        df[column + "_ts"] = parsed.astype("datetime64[ns, UTC]")
+    df = df.dropna(subset=["timestamp_ts", "last_activity_ts"])
+    for column in ["timestamp_ts", "last_activity_ts"]:
+        df[column] = df[column].astype("int64")
+
+    return df.sort_values(
+        ["cluster_id", "timestamp_ts", "last_activity_ts"], kind="stable"
+    ).reset_index(drop=True)
+
+
+# ------------------------- KERNEL -----------------------------
+
+
+def count_problems_rows(rows):
+    """The notebook's per-cluster loop over ``(timestamp, last_activity)`` pairs."""
+    rows = sorted(rows)  # Sort again to make sure
+    count = 0
+    current_end = None
+
+    for timestamp, last_activity in rows:
+        if current_end is None or timestamp > current_end:
+            count += 1
+            current_end = last_activity
+        # else: overlapping, same problem
+
+    return count
+
+
+def merge_occurrences(groups, timestamps, last_activities, loop_below=16):
+    """Count occurrences for every group of rows without a per-row Python loop.
+
+    The rows must be sorted by (group, timestamp, last_activity). The row that
+    starts the occurrence after start ``i`` is the first later row of the
+    group with ``timestamp > last_activity[i]``. All groups step from one
+    occurrence start to the next together, each step being a vectorized
+    binary search over the groups' rows, so the work is proportional to the
+    number of occurrences rather than the number of reports. Once only a few
+    groups are left (very long histories), they finish with the plain loop.
+
+    Returns ``(first, count, last_start)`` per group: the first row, the number
+    of occurrences and the row that started the latest occurrence.
+    """
+    groups = np.asarray(groups)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    last_activities = np.asarray(last_activities, dtype=np.int64)
+    n = len(groups)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    first = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    end = np.r_[first[1:], n]
+    count = np.ones(len(first), dtype=np.int64)
+    last_start = first.copy()
+
+    active = np.arange(len(first))
+    while len(active) > loop_below:
+        target = last_activities[last_start[active]]
+        lo = last_start[active] + 1
+        hi = end[active]
+        searching = lo < hi
+        while searching.any():
+            mid = (lo + hi) // 2
+            later = timestamps[np.minimum(mid, n - 1)] > target
+            hi = np.where(searching & later, mid, hi)
+            lo = np.where(searching & ~later, mid + 1, lo)
+            searching = lo < hi
+        found = lo < end[active]
+        active = active[found]
+        last_start[active] = lo[found]
+        count[active] += 1
+
+    for group in active:
+        current_end = last_activities[last_start[group]]
+        start = last_start[group] + 1
+        for offset, timestamp in enumerate(timestamps[start : end[group]].tolist()):
+            if timestamp > current_end:
+                count[group] += 1
+                last_start[group] = start + offset
+                current_end = last_activities[start + offset]
+
+    return first, count, last_start
+
+
+def count_problems(df):
+    """Batch ``num_times``/``status`` per cluster over a whole report history."""
+    reports = prepare_reports(df)
+    codes, _ = pd.factorize(reports["cluster_id"])
+    first, count, _ = merge_occurrences(
+        codes, reports["timestamp_ts"].to_numpy(), reports["last_activity_ts"].to_numpy()
+    )
+    last = np.r_[first[1:], len(reports)] - 1
+    return pd.DataFrame(
+        {
+            "cluster_id": reports["cluster_id"].to_numpy()[first],
+            "num_times": count.astype(np.int32),
+            "status": reports["state"].to_numpy()[last],
+        }
+    )
+
+
+# ------------------------- SPARK -----------------------------
+
+RESULT_SCHEMA = "cluster_id string, num_times int, status string"
+
+
+def _spark_reports(df):
+    from pyspark.sql import functions as F
+
+    return (
+        df.filter(~F.col("cluster_id").contains("noise"))
+        .withColumn("timestamp_ts", F.col("timestamp").cast("timestamp"))
+        .withColumn("last_activity_ts", F.col("last_activity").cast("timestamp"))
+        .dropna(subset=["timestamp_ts", "last_activity_ts"])
+        .select("cluster_id", "timestamp_ts", "last_activity_ts", "state")
+    )
+
+
+def count_problems_rdd(df):
+    """The notebook's RDD ``groupBy`` implementation, kept as the benchmark baseline."""
+    from pyspark.sql import Row
+
+    def count_cluster(rows):
+        rows = sorted(rows, key=lambda r: (r.timestamp_ts, r.last_activity_ts))
+        count = count_problems_rows((r.timestamp_ts, r.last_activity_ts) for r in rows)
+        return Row(cluster_id=str(rows[0].cluster_id), num_times=count, status=rows[-1].state)
+
+    reports = _spark_reports(df)
+    grouped_rdd = reports.rdd.groupBy(lambda row: row.cluster_id)
+    result_rdd = grouped_rdd.map(lambda kv: count_cluster(kv[1]))
+    return reports.sparkSession.createDataFrame(result_rdd, schema=RESULT_SCHEMA)
+
+
+def count_problems_spark(df, n_buckets=None):
+    """``count_problems`` for a Spark DataFrame of reports.
+
+    Clusters are hashed into buckets and every bucket is handed to
+    ``merge_occurrences`` as one Arrow batch through ``applyInPandas``, so
+    rows are never turned into Python ``Row`` objects.
+    """
+    from pyspark.sql import functions as F
+
+    reports = _spark_reports(df)
+    if n_buckets is None:
+        n_buckets = reports.sparkSession.sparkContext.defaultParallelism * 4
+
+    def count_bucket(pdf):
+        pdf = pdf.assign(
+            timestamp_ts=pdf["timestamp_ts"].astype("datetime64[ns]").astype("int64"),
+            last_activity_ts=pdf["last_activity_ts"].astype("datetime64[ns]").astype("int64"),
+        ).sort_values(["cluster_id", "timestamp_ts", "last_activity_ts"], kind="stable")
+        codes, _ = pd.factorize(pdf["cluster_id"])
+        first, count, _ = merge_occurrences(
+            codes, pdf["timestamp_ts"].to_numpy(), pdf["last_activity_ts"].to_numpy()
+        )
+        last = np.r_[first[1:], len(pdf)] - 1
+        return pd.DataFrame(
+            {
+                "cluster_id": pdf["cluster_id"].to_numpy()[first],
+                "num_times": count.astype(np.int32),
+                "status": pdf["state"].to_numpy()[last],
+            }
+        )
+
+    bucket = F.pmod(F.hash("cluster_id"), F.lit(n_buckets))
+    return (
+        reports.withColumn("bucket", bucket)
+        .groupBy("bucket")
+        .applyInPandas(count_bucket, schema=RESULT_SCHEMA)
+    )
+
+
+# ------------------------- INCREMENTAL -----------------------------
+
+
+class RecurrenceState:
+    """Per-cluster recurrence state that new report batches are applied to.
+
+    For every cluster it keeps the end of the current occurrence, the number
+    of occurrences so far, the latest state and the (timestamp, last_activity)
+    of the latest report, which is what the next report is compared with.
+    """
+
+    COLUMNS = ["current_end", "num_times", "status", "last_timestamp", "last_activity"]
+
+    def __init__(self, clusters=None):
+        # cluster_id -> [current_end, num_times, status, last_timestamp, last_activity]
+        self.clusters = clusters if clusters is not None else {}
+
+    def apply(self, batch):
+        """Apply a batch of new reports; return the clusters that need a rebuild.
+
+        A cluster can only be extended incrementally with reports that sort
+        after everything already applied to it. If a batch holds an older
+        report for a cluster (late arrival or backfill), that cluster's rows
+        in the batch are skipped and its id is returned, so the caller can
+        recompute it from history with ``rebuild``.
+        """
+        reports = prepare_reports(batch)
+        if reports.empty:
+            return set()
+        cluster_ids = reports["cluster_id"].to_numpy()
+        timestamps = reports["timestamp_ts"].to_numpy()
+        last_activities = reports["last_activity_ts"].to_numpy()
+        states = reports["state"].to_numpy()
+
+        first = np.flatnonzero(np.r_[True, cluster_ids[1:] != cluster_ids[:-1]])
+        stale = set()
+        seeds = []  # (cluster_id, last_timestamp, current_end, status) of known clusters
+        for i in first:
+            entry = self.clusters.get(cluster_ids[i])
+            if entry is None:
+                continue
+            # rows are sorted, so the first row of a cluster is its oldest
+            if (timestamps[i], last_activities[i]) < (entry[3], entry[4]):
+                stale.add(cluster_ids[i])
+            else:
+                seeds.append((cluster_ids[i], entry[3], entry[0], entry[2]))
+
+        keep = ~np.isin(cluster_ids, list(stale)) if stale else slice(None)
+        # A known cluster continues from a synthetic row that starts its current
+        # occurrence: filed at its latest timestamp, active until current_end.
+        seed_ids, seed_ts, seed_end, seed_states = (
+            map(np.asarray, zip(*seeds)) if seeds else ([], [], [], [])
+        )
+        all_ids = np.r_[np.asarray(seed_ids, dtype=object), cluster_ids[keep].astype(object)]
+        all_ts = np.r_[np.asarray(seed_ts, dtype=np.int64), timestamps[keep]]
+        all_la = np.r_[np.asarray(seed_end, dtype=np.int64), last_activities[keep]]
+        all_states = np.r_[np.asarray(seed_states, dtype=object), states[keep].astype(object)]
+        is_batch = np.arange(len(all_ids)) >= len(seeds)
+        if len(all_ids) == 0:
+            return stale
+
+        codes, _ = pd.factorize(all_ids, sort=True)
+        order = np.lexsort((all_la, all_ts, is_batch, codes))
+        first, count, last_start = merge_occurrences(codes[order], all_ts[order], all_la[order])
+        last = np.r_[first[1:], len(order)] - 1
+
+        for f, c, s, l in zip(first, count, last_start, last):
+            cluster_id = all_ids[order[f]]
+            # a seeded cluster already counted its current occurrence once
+            previous = 0 if is_batch[order[f]] else self.clusters[cluster_id][1] - 1
+            self.clusters[cluster_id] = [
+                int(all_la[order[s]]),
+                int(previous + c),
+                all_states[order[l]],
+                int(all_ts[order[l]]),
+                int(all_la[order[l]]),
+            ]
+        return stale
+
+    def rebuild(self, history, cluster_ids=None):
+        """Recompute clusters (all of ``history`` by default) from their full history."""
+        if cluster_ids is not None:
+            history = history[history["cluster_id"].astype(str).isin(set(cluster_ids))]
+        for cluster_id in set(prepare_reports(history)["cluster_id"]):
+            self.clusters.pop(cluster_id, None)
+        stale = self.apply(history)
+        assert not stale  # nothing was left to be out of order with
+
+    def results(self):
+        """Current ``num_times``/``status`` per cluster, like ``count_problems``."""
+        frame = self.to_frame()
+        return frame[["cluster_id", "num_times", "status"]].sort_values(
+            "cluster_id", kind="stable"
+        ).reset_index(drop=True)
+
+    def to_frame(self):
+        frame = pd.DataFrame.from_dict(self.clusters, orient="index", columns=self.COLUMNS)
+        frame.index.name = "cluster_id"
+        frame = frame.reset_index()
+        frame["num_times"] = frame["num_times"].astype(np.int32)
+        for column in ["current_end", "last_timestamp", "last_activity"]:
+            frame[column] = frame[column].astype(np.int64)
+        return frame
+
+    def save(self, path):
+        # Write-then-rename so an interrupted save never leaves half a state
+        tmp_path = path + ".tmp"
+        self.to_frame().to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        frame = pd.read_parquet(path)
+        clusters = {
+            cluster_id: [int(end), int(count), status, int(ts), int(la)]
+            for cluster_id, end, count, status, ts, la in zip(
+                frame["cluster_id"],
+                frame["current_end"],
+                frame["num_times"],
+                frame["status"],
+                frame["last_timestamp"],
+                frame["last_activity"],
+            )
+        }
+        return cls(clusters)
@@ -0,0 +1,195 @@
+"""15 m location clustering of reports (DBSCAN on haversine distance).
+
+``dbscan`` is the single-process run from ``notebooks/traffy-cluster.ipynb``.
+``partitioned_dbscan`` gives exactly the same labels but splits the city into
+a grid of tiles that are clustered in a process pool:
+
+1. every tile counts eps-neighbours of the points it owns, using the points in
+   an eps-wide halo around it, which fixes the core points globally;
+2. every tile links its core points (owned and halo) into local components and
+   lists the components next to each of its owned border points;
+3. local components sharing a core point are merged across tiles, and every
+   border point joins the neighbouring cluster with the smallest core index,
+   which is the cluster scikit-learn's DBSCAN would have reached it from first.
+
+Clusters are numbered by their smallest core index, as scikit-learn does.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371
+EPS = 0.015 / EARTH_RADIUS_KM  # ประมาณ 15 เมตร
+MIN_SAMPLES = 3
+
+
+def dbscan(coords, eps=EPS, min_samples=MIN_SAMPLES):
+    """Labels for ``coords`` (n x 2 latitude/longitude in degrees)."""
+    coords_rad = np.radians(coords)
+    db = DBSCAN(eps=eps, min_samples=min_samples, algorithm="ball_tree", metric="haversine")
+    return db.fit_predict(coords_rad)
+
+
+# ------------------------- TILES -----------------------------
+
+
+def _tiles(coords, eps, tile_size):
+    """Yield ``(owned, members)`` global indices per non-empty tile.
+
+    ``members`` are the owned points followed by the halo points, i.e. every
+    point within eps of the tile (a rectangle one halo wider on each side).
+    """
+    # 1% on top of the exact bounds covers rounding in the haversine distance
+    halo_lat = np.degrees(eps) * 1.01
+    max_lat = np.radians(min(np.abs(coords[:, 0]).max() + tile_size + halo_lat, 89.0))
+    halo_long = halo_lat / np.cos(max_lat)
+    if halo_lat > tile_size or halo_long > tile_size:
+        raise ValueError("tile_size must be larger than the eps halo")
+
+    origin = coords.min(axis=0)
+    cell = np.floor((coords - origin) / tile_size).astype(np.int64)
+    width = int(cell[:, 1].max()) + 1
+    keys = cell[:, 0] * width + cell[:, 1]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    tile_keys, starts = np.unique(sorted_keys, return_index=True)
+    ends = np.r_[starts[1:], len(order)]
+    position = dict(zip(tile_keys.tolist(), range(len(tile_keys))))
+
+    for key, start, end in zip(tile_keys.tolist(), starts, ends):
+        row, col = divmod(key, width)
+        owned = order[start:end]
+        south = origin[0] + row * tile_size - halo_lat
+        north = origin[0] + (row + 1) * tile_size + halo_lat
+        west = origin[1] + col * tile_size - halo_long
+        east = origin[1] + (col + 1) * tile_size + halo_long
+
+        halo = []
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                if (d_row or d_col) and 0 <= col + d_col < width:
+                    i = position.get(key + d_row * width + d_col)
+                    if i is None:
+                        continue
+                    near = order[starts[i] : ends[i]]
+                    lat, long = coords[near, 0], coords[near, 1]
+                    inside = (lat >= south) & (lat <= north) & (long >= west) & (long <= east)
+                    halo.append(near[inside])
+        yield owned, np.concatenate([owned] + halo)
+
+
+def _count_neighbours(task):
+    points_rad, n_owned, eps = task
+    tree = BallTree(points_rad, metric="haversine")
+    return tree.query_radius(points_rad[:n_owned], eps, count_only=True)
+
+
+def _link_tile(task):
+    points_rad, n_owned, is_core, eps = task
+    core = np.flatnonzero(is_core)
+    if len(core) == 0:
+        return core, core, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    tree = BallTree(points_rad[core], metric="haversine")
+    neighbours = tree.query_radius(points_rad[core], eps)
+    sources = np.repeat(np.arange(len(core)), [len(nb) for nb in neighbours])
+    graph = coo_matrix(
+        (np.ones(len(sources), dtype=np.int8), (sources, np.concatenate(neighbours))),
+        shape=(len(core), len(core)),
+    )
+    _, components = connected_components(graph, directed=False)
+
+    border = np.flatnonzero(~is_core[:n_owned])
+    if len(border):
+        near = tree.query_radius(points_rad[border], eps)
+        border_points = np.repeat(border, [len(nb) for nb in near])
+        border_components = components[np.concatenate(near).astype(np.int64)]
+    else:
+        border_points = border_components = np.empty(0, dtype=np.int64)
+    return core, components, border_points, border_components
+
+
+# ------------------------- MERGE -----------------------------
+
+
+def partitioned_dbscan(coords, eps=EPS, min_samples=MIN_SAMPLES, tile_size=0.02, n_jobs=None):
+    """``dbscan`` labels computed tile by tile in a process pool.
+
+    ``tile_size`` is in degrees (0.02 is roughly 2 km around Bangkok) and must
+    be larger than the eps halo.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    n = len(coords)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    coords_rad = np.radians(coords)
+    tiles = list(_tiles(coords, eps, tile_size))
+    n_jobs = n_jobs or os.cpu_count()
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        counts = pool.map(
+            _count_neighbours,
+            ((coords_rad[members], len(owned), eps) for owned, members in tiles),
+            chunksize=4,
+        )
+        is_core = np.zeros(n, dtype=bool)
+        for (owned, _), count in zip(tiles, counts):
+            is_core[owned] = count >= min_samples
+
+        links = list(
+            pool.map(
+                _link_tile,
+                ((coords_rad[members], len(owned), is_core[members], eps) for owned, members in tiles),
+                chunksize=4,
+            )
+        )
+
+    # Local components become nodes of one graph; a core point seen by several
+    # tiles links the components it belongs to in each of them.
+    core_points, core_nodes, border_points, border_nodes = [], [], [], []
+    offset = 0
+    for (_, members), (core, components, border, border_components) in zip(tiles, links):
+        core_points.append(members[core])
+        core_nodes.append(components + offset)
+        border_points.append(members[border])
+        border_nodes.append(border_components + offset)
+        offset += int(components.max()) + 1 if len(components) else 0
+
+    labels = np.full(n, -1, dtype=np.int64)
+    core_points = np.concatenate(core_points)
+    if len(core_points) == 0:
+        return labels
+    core_nodes = np.concatenate(core_nodes)
+    order = np.argsort(core_points, kind="stable")
+    core_points, core_nodes = core_points[order], core_nodes[order]
+    same = np.flatnonzero(core_points[1:] == core_points[:-1])
+    graph = coo_matrix(
+        (np.ones(len(same), dtype=np.int8), (core_nodes[same], core_nodes[same + 1])),
+        shape=(offset, offset),
+    )
+    _, node_cluster = connected_components(graph, directed=False)
+
+    # Number clusters by their smallest core point, like scikit-learn
+    cluster_of_core = node_cluster[core_nodes]
+    seed = np.full(node_cluster.max() + 1, n, dtype=np.int64)
+    np.minimum.at(seed, cluster_of_core, core_points)
+    rank = np.empty(len(seed), dtype=np.int64)
+    rank[np.argsort(seed, kind="stable")] = np.arange(len(seed))
+
+    labels[core_points] = rank[cluster_of_core]
+
+    border_points = np.concatenate(border_points)
+    if len(border_points):
+        border_labels = rank[node_cluster[np.concatenate(border_nodes)]]
+        # the cluster with the smallest seed reaches the border point first
+        best = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(best, border_points, border_labels)
+        reached = np.unique(border_points)
+        labels[reached] = best[reached]
+    return labels
@@ -0,0 +1,194 @@
+"""The notebook pipeline as ``orchestrator`` stages.
+
+    ingest ─ spatial ─ features ─ text_clusters ─ cluster_ids ─┬─ metadata ───┐
+                                                                └─ recurrence ─┼─ dashboard
+    zone_points ─ zone_raster ─────────────────────────────────────────────────┘
+
+``ingest`` to ``text_clusters`` are ``DataPreparation(spark)`` and
+``traffy-cluster``, ``cluster_ids``/``metadata`` are ``processing-traffy``,
+``recurrence`` is ``Algo_Computing``, the zone stages are
+``api_for_zone_module`` and ``dashboard`` is ``dataprep_for_visualization``.
+Table outputs are ``pipeline.storage`` stages; ``dashboard`` holds the two
+tables the Streamlit app reads, exported to CSV by ``python -m pipeline
+--export``.
+
+``traffy-cluster`` reads the raw dump, so from ``spatial`` on ``comment`` is
+the text as written (``raw_comment`` of ``ingest``) and the cleaned one is
+kept as ``clean_comment``. It drops reports without a comment or
+coordinates; here they have also passed ``ingest``'s drop of reports
+missing an organization, timestamp, state or last activity
+(``DataPreparation``), which ``metadata`` and ``recurrence`` need anyway.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline import (
+    featurize,
+    ingest,
+    metadata,
+    osm_zones,
+    recurrence,
+    spatial_cluster,
+    storage,
+    text_clean,
+    text_cluster,
+    zones,
+)
+from pipeline.orchestrator import Stage
+
+
+def _table(path, name="table", **kwargs):
+    return storage.read_stage(os.path.join(path, name), **kwargs)
+
+
+def _write(df, path, name="table", **kwargs):
+    storage.write_stage(df, os.path.join(path, name), **kwargs)
+
+
+def build_stages(
+    raw,
+    zone_points=None,
+    osm_json=None,
+    eps=spatial_cluster.EPS,
+    min_samples=spatial_cluster.MIN_SAMPLES,
+    model_name=featurize.MODEL_NAME,
+    distance_threshold=text_cluster.DISTANCE_THRESHOLD,
+    zone_cell_size=zones.CELL_SIZE,
+    embedding_cache=None,
+    n_jobs=None,
+):
+    """The stages for the raw dump ``raw``.
+
+    Zone points come from ``zone_points`` (CSV), else from the OSM JSON
+    extract ``osm_json``, else from Overpass. ``n_jobs`` and the embedding
+    cache directory only change how fast stages run, so they aren't part of
+    any key.
+    """
+
+    def run_ingest(out_dir, inputs):
+        ingest.ingest(raw, os.path.join(out_dir, "table"), n_jobs=n_jobs)
+
+    def run_spatial(out_dir, inputs, eps, min_samples):
+        df = _table(inputs["ingest"]).rename(columns={"comment": "clean_comment", "raw_comment": "comment"})
+        df = df.dropna(subset=["comment", "latitude", "longitude"]).reset_index(drop=True)
+        coords = df[["latitude", "longitude"]].to_numpy()
+        df["cluster"] = spatial_cluster.partitioned_dbscan(coords, eps, min_samples, n_jobs=n_jobs)
+        df["row"] = np.arange(len(df), dtype=np.int64)
+        _write(df, out_dir)
+
+    def run_features(out_dir, inputs, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        from pipeline.embedding_cache import EmbeddingCache
+
+        df = _table(inputs["spatial"], columns=["row", "comment", "type", "cluster"]).set_index("row")
+        cache = EmbeddingCache(embedding_cache, model_name) if embedding_cache else None
+        featurize.featurize(
+            df[df["cluster"] > -1],
+            SentenceTransformer(model_name),
+            out_dir,
+            n_jobs=n_jobs,
+            cache=cache,
+            model_name=model_name,
+        )
+
+    def run_text_clusters(out_dir, inputs, distance_threshold):
+        df = _table(inputs["spatial"]).set_index("row")
+        features = featurize.Features.load(inputs["features"])
+        df["text_cluster"], cluster_info = text_cluster.text_subclusters(
+            df, features, distance_threshold=distance_threshold
+        )
+        _write(df.reset_index(drop=True), out_dir)
+        _write(cluster_info, out_dir, "cluster_info")
+
+    def run_cluster_ids(out_dir, inputs):
+        _write(metadata.assign_cluster_ids(_table(inputs["text_clusters"])), out_dir)
+
+    def run_metadata(out_dir, inputs):
+        df = _table(inputs["cluster_ids"], columns=["cluster_id", "comment", "latitude", "longitude", "organization"])
+        cluster_info = _table(inputs["text_clusters"], "cluster_info")
+        _write(metadata.cluster_metadata(df, cluster_info), out_dir)
+
+    def run_recurrence(out_dir, inputs):
+        df = _table(inputs["cluster_ids"], columns=recurrence.REQUIRED_COLUMNS)
+        _write(recurrence.count_problems(df), out_dir)
+
+    def run_zone_points(out_dir, inputs):
+        if osm_json:
+            elements = osm_zones.read_json_extract(osm_json)
+        else:
+            elements = osm_zones.iter_tiled_elements()
+        osm_zones.write_zone_points(
+            osm_zones.extract_zone_points(elements), os.path.join(out_dir, "zone_points.csv")
+        )
+
+    def run_zone_raster(out_dir, inputs, cell_size):
+        if zone_points:
+            points = pd.read_csv(zone_points)
+        else:
+            points = pd.read_csv(os.path.join(inputs["zone_points"], "zone_points.csv"))
+        raster = zones.ZoneRaster.from_points(points["lat"], points["lon"], points["zone"], cell_size=cell_size)
+        raster.save(os.path.join(out_dir, "zone_raster.npz"))
+
+    def run_dashboard(out_dir, inputs):
+        # TABLE 2: piti (num_times, status) x bright (metadata) + zone
+        counts = _table(inputs["recurrence"])
+        clusters = _table(inputs["metadata"])
+        clusters = clusters[~clusters["cluster_id"].str.startswith("noise")].rename(columns={"lon": "long"})
+        cluster_data = counts.merge(clusters, on="cluster_id", how="inner")
+        raster = zones.ZoneRaster.load(os.path.join(inputs["zone_raster"], "zone_raster.npz"))
+        cluster_data["zone"] = raster.predict(cluster_data["lat"].to_numpy(), cluster_data["long"].to_numpy())
+        _write(cluster_data, out_dir, "cluster_data")
+
+        # TABLE 1: example comments of every non-noise cluster
+        comments = _table(inputs["cluster_ids"], columns=["cluster_id", "comment"])
+        comments = comments[~comments["cluster_id"].str.startswith("noise")]
+        _write(comments.rename(columns={"cluster_id": "cluster"}), out_dir, "example_comment")
+
+    stages = [
+        Stage("ingest", run_ingest, modules=[ingest, text_clean, storage], files=[raw]),
+        Stage("spatial", run_spatial, ["ingest"], {"eps": eps, "min_samples": min_samples}, [spatial_cluster, storage]),
+        Stage("features", run_features, ["spatial"], {"model_name": model_name}, [featurize, text_clean, storage]),
+        Stage(
+            "text_clusters",
+            run_text_clusters,
+            ["spatial", "features"],
+            {"distance_threshold": distance_threshold},
+            [text_cluster, featurize, storage],
+        ),
+        Stage("cluster_ids", run_cluster_ids, ["text_clusters"], modules=[metadata, storage]),
+        Stage("metadata", run_metadata, ["cluster_ids", "text_clusters"], modules=[metadata, storage]),
+        Stage("recurrence", run_recurrence, ["cluster_ids"], modules=[recurrence, storage]),
+        Stage(
+            "zone_raster",
+            run_zone_raster,
+            [] if zone_points else ["zone_points"],
+            {"cell_size": zone_cell_size},
+            [zones, storage],
+            files=[zone_points],
+        ),
+        Stage(
+            "dashboard",
+            run_dashboard,
+            ["metadata", "recurrence", "zone_raster", "cluster_ids"],
+            modules=[zones, storage],
+        ),
+    ]
+    if not zone_points:
+        stages.append(Stage("zone_points", run_zone_points, modules=[osm_zones, zones, storage], files=[osm_json]))
+    return stages
+
+
+DASHBOARD_TABLES = ["cluster_data", "example_comment"]
+
+
+def export_dashboard(dashboard_dir, out_dir):
+    """Write the dashboard's ``cluster_data.csv`` and ``example_comment.csv`` to ``out_dir``."""
+    os.makedirs(out_dir, exist_ok=True)
+    return {
+        name: storage.export_csv(os.path.join(dashboard_dir, name), os.path.join(out_dir, name + ".csv"))
+        for name in DASHBOARD_TABLES
+    }
@@ -0,0 +1,309 @@
+"""Typed, partitioned Parquet exchanged between pipeline stages.
+
+The notebooks end every stage with ``.coalesce(1).write.csv(...)``, which
+funnels the write through one task, and the next stage reads the CSV back
+with ``inferSchema=True``, one more full pass that can still guess a type
+wrong. A stage output here is a directory of Parquet files instead:
+
+- written by pyarrow's writer threads or every Spark task in parallel (streams
+  of batches file after file in bounded memory),
+  optionally hive-partitioned on a few low-cardinality columns;
+- ``_manifest.json`` records the schema, files and row counts and is written
+  last into a temporary directory that then replaces the old output, so
+  readers never see half a stage;
+- ``read_stage`` takes the schema from the manifest and only reads the
+  requested columns, skipping partitions and row groups that the filter
+  rules out.
+
+The single CSV files the dashboard reads are produced by ``export_csv``, on
+demand, streaming record batches into one file:
+
+    python -m pipeline.storage export out/cluster_data cluster_data.csv --rename lon=long
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import time
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+MANIFEST = "_manifest.json"
+ROWS_PER_GROUP = 128 * 1024  # row groups small enough for the statistics to prune
+ROWS_PER_FILE = 4 * 1024 * 1024  # files of a streamed stage
+
+
+def _encode_schema(schema):
+    return base64.b64encode(schema.serialize().to_pybytes()).decode("ascii")
+
+
+def _decode_schema(text):
+    return pa.ipc.read_schema(pa.py_buffer(base64.b64decode(text)))
+
+
+def _to_arrow(data, schema):
+    # pandas DataFrame, Arrow table/batches or an iterable of batches (streamed)
+    if hasattr(data, "to_parquet"):
+        return pa.Table.from_pandas(data, schema=schema, preserve_index=False)
+    return data
+
+
+def _partitioning(schema, partition_cols):
+    if not partition_cols:
+        return None
+    return ds.partitioning(pa.schema([schema.field(name) for name in partition_cols]), flavor="hive")
+
+
+def _publish(tmp_path, path):
+    # Swap the finished directory in; the old output is removed only afterwards
+    old_path = path + ".old"
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+
+def _write_manifest(root, schema, partition_cols, files, info):
+    manifest = {
+        "schema": _encode_schema(schema),
+        "columns": {field.name: str(field.type) for field in schema},
+        "partition_cols": list(partition_cols),
+        "rows": sum(rows for _, rows in files),
+        "files": [{"path": name, "rows": rows} for name, rows in sorted(files)],
+        "created": time.time(),
+        "info": info or {},
+    }
+    with open(os.path.join(root, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def _write_stream(batches, root, schema, rows_per_group):
+    # Unpartitioned streams are written from the calling thread, one file
+    # after another. The dataset writer pulls a Python iterator from its own
+    # threads, and memory then keeps growing with the length of the stream.
+    os.makedirs(root)
+    files = []
+    writer = None
+    buffered, buffered_rows, file_rows = [], 0, 0
+
+    def flush():
+        nonlocal buffered, buffered_rows, file_rows
+        if buffered_rows:
+            writer.write_table(pa.Table.from_batches(buffered, schema), row_group_size=rows_per_group)
+            file_rows += buffered_rows
+        buffered, buffered_rows = [], 0
+
+    try:
+        for batch in batches:
+            if writer is None or file_rows >= ROWS_PER_FILE:
+                if writer is not None:
+                    writer.close()
+                    files[-1] = (files[-1][0], file_rows)
+                name = f"part-{len(files):05d}.parquet"
+                writer = pq.ParquetWriter(os.path.join(root, name), schema)
+                files.append((name, 0))
+                file_rows = 0
+            buffered.append(batch)
+            buffered_rows += batch.num_rows
+            if buffered_rows >= rows_per_group:
+                flush()
+        if writer is not None:
+            flush()
+            files[-1] = (files[-1][0], file_rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return files
+
+
+def write_stage(data, path, partition_cols=(), schema=None, info=None, rows_per_group=ROWS_PER_GROUP):
+    """Write a stage output to the directory ``path`` and return its manifest.
+
+    ``data`` is a pandas DataFrame, an Arrow table, or an iterable of record
+    batches (then ``schema`` is required), which is written as it comes, in
+    bounded memory unless it has to be split into partitions.
+    ``info`` is stored in the manifest as is (parameters, timings, ...).
+    """
+    data = _to_arrow(data, schema)
+    if schema is None:
+        schema = data.schema
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+
+    files = []
+
+    def visit(written):
+        rows = written.metadata.num_rows if written.metadata is not None else 0
+        files.append((os.path.relpath(written.path, tmp_path), rows))
+
+    if partition_cols or isinstance(data, (pa.Table, pa.RecordBatch)):
+        ds.write_dataset(
+            data,
+            tmp_path,
+            schema=schema,
+            format="parquet",
+            partitioning=_partitioning(schema, partition_cols),
+            basename_template="part-{i}.parquet",
+            max_rows_per_group=rows_per_group,
+            min_rows_per_group=min(rows_per_group, 16 * 1024),
+            file_visitor=visit,
+            use_threads=True,
+        )
+    else:
+        files = _write_stream(data, tmp_path, schema, rows_per_group)
+    if not files:
+        # an empty stage still has a schema
+        os.makedirs(tmp_path, exist_ok=True)
+        pq.write_table(schema.empty_table(), os.path.join(tmp_path, "part-0.parquet"))
+        files.append(("part-0.parquet", 0))
+    manifest = _write_manifest(tmp_path, schema, partition_cols, files, info)
+    _publish(tmp_path, path)
+    return manifest
+
+
+def read_manifest(path):
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"no finished stage output in {path}")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest["schema"] = _decode_schema(manifest["schema"])
+    return manifest
+
+
+def _filter_expression(filters):
+    # pyarrow expressions pass through; [(column, op, value), ...] like pd.read_parquet
+    if filters is None or isinstance(filters, ds.Expression):
+        return filters
+    return pq.filters_to_expression(filters)
+
+
+def open_stage(path):
+    """The stage output at ``path`` as a ``pyarrow.dataset.Dataset``."""
+    manifest = read_manifest(path)
+    schema = manifest["schema"]
+    return ds.dataset(
+        [os.path.join(path, entry["path"]) for entry in manifest["files"]],
+        schema=schema,
+        format="parquet",
+        partitioning=_partitioning(schema, manifest["partition_cols"]),
+        partition_base_dir=path,
+    )
+
+
+def read_stage(path, columns=None, filters=None, as_table=False):
+    """Read ``columns`` of the rows matching ``filters`` from a stage output."""
+    table = open_stage(path).to_table(columns=columns, filter=_filter_expression(filters))
+    return table if as_table else table.to_pandas()
+
+
+def iter_stage(path, columns=None, filters=None, batch_size=ROWS_PER_GROUP):
+    """Record batches of a stage output, for consumers that stream."""
+    scanner = open_stage(path).scanner(
+        columns=columns, filter=_filter_expression(filters), batch_size=batch_size
+    )
+    yield from scanner.to_batches()
+
+
+# ------------------------- SPARK -----------------------------
+
+
+def write_stage_spark(df, path, partition_cols=(), info=None):
+    """``write_stage`` for a Spark DataFrame: one file per task, no ``coalesce``.
+
+    The manifest is built from the Parquet footers, so ``path`` has to be on
+    a filesystem this process can list (local or mounted).
+    """
+    tmp_path = path + ".tmp"
+    df.write.mode("overwrite").partitionBy(*partition_cols).parquet(tmp_path)
+
+    dataset = ds.dataset(tmp_path, format="parquet", partitioning="hive")
+    files = [
+        (os.path.relpath(fragment.path, tmp_path), fragment.metadata.num_rows)
+        for fragment in dataset.get_fragments()
+    ]
+    # the partition columns come from the directory names, type them like Spark did
+    schema = pa.schema(
+        [field for field in dataset.schema if field.name not in partition_cols]
+        + [dataset.schema.field(name) for name in partition_cols]
+    )
+    manifest = _write_manifest(tmp_path, schema, partition_cols, files, info)
+    _publish(tmp_path, path)
+    return manifest
+
+
+def read_stage_spark(spark, path, columns=None, condition=None):
+    """A stage output as a Spark DataFrame; Parquet carries the schema, nothing is inferred."""
+    read_manifest(path)
+    df = spark.read.parquet(path)
+    if condition is not None:
+        df = df.filter(condition)
+    if columns is not None:
+        df = df.select(*columns)
+    return df
+
+
+# ------------------------- EXPORT -----------------------------
+
+
+def export_csv(path, out_path, columns=None, filters=None, rename=None):
+    """Stream a stage output into the single CSV file ``out_path``; returns the row count.
+
+    ``rename`` maps stage column names to CSV header names (the dashboard's
+    ``cluster_data.csv`` calls the longitude ``long``).
+    """
+    rename = rename or {}
+    tmp_path = out_path + ".tmp"
+    count = 0
+    writer = None
+    try:
+        for batch in iter_stage(path, columns=columns, filters=filters):
+            batch = batch.rename_columns([rename.get(name, name) for name in batch.schema.names])
+            if writer is None:
+                writer = pacsv.CSVWriter(tmp_path, batch.schema)
+            writer.write_batch(batch)
+            count += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # nothing matched: header only
+        schema = open_stage(path).schema
+        names = columns or schema.names
+        empty = pa.schema([schema.field(name).with_name(rename.get(name, name)) for name in names])
+        pacsv.write_csv(empty.empty_table(), tmp_path)
+    os.replace(tmp_path, out_path)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export pipeline stage outputs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="print a stage's manifest")
+    show.add_argument("stage")
+    export = commands.add_parser("export", help="export a stage to one CSV file")
+    export.add_argument("stage")
+    export.add_argument("out")
+    export.add_argument("--columns", help="comma-separated columns to export")
+    export.add_argument("--rename", action="append", default=[], help="old=new header name")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        manifest = read_manifest(args.stage)
+        manifest["schema"] = manifest["schema"].to_string()
+        print(json.dumps(manifest, indent=2, ensure_ascii=False))
+    else:
+        rename = dict(item.split("=", 1) for item in args.rename)
+        columns = args.columns.split(",") if args.columns else None
+        count = export_csv(args.stage, args.out, columns=columns, rename=rename)
+        print(f"{count} rows -> {args.out}")
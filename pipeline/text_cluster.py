@@ -0,0 +1,361 @@
+"""Text sub-clustering inside every spatial cluster (``traffy-cluster.ipynb``).
+
+For every DBSCAN cluster, the comment embeddings, ``type`` embeddings and a
+TF-IDF of the NER features are concatenated, and an average-linkage
+agglomerative clustering on cosine distance (threshold 0.5) splits the
+cluster into text sub-clusters. The closest comment to each sub-cluster's
+embedding centroid becomes its ``cluster_desc``.
+
+The features come precomputed from ``pipeline.featurize``; only the TF-IDF,
+whose vocabulary is per cluster, is fitted inside the loop.
+
+The dense distance matrix is O(n^2) in the size of the spatial cluster, so
+clusters above ``memory_limit`` (big intersections with tens of thousands of
+reports) are clustered from similarities computed block by block: exactly
+where the pairs within the threshold split them into small enough groups,
+on a nearest-neighbour graph otherwise, see ``_cluster_graph``.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+DISTANCE_THRESHOLD = 0.5
+MEMORY_LIMIT = 2 * 1024**3  # bytes per spatial cluster before switching to the graph mode
+N_NEIGHBORS = 15  # graph edges per row of components too big for the dense path
+# bytes per pair of a block in the graph mode: the float32 similarities, the
+# TF-IDF part added to them, the int64 neighbour ranks and, in the worst case
+# of every pair within the threshold, the edges connected_components copies
+BLOCK_BYTES_PER_PAIR = 32
+# bytes per pair of clusters in _finish_linkage: its float64 TF-IDF and
+# distance matrices, the outer product of the sizes and numpy's temporaries
+FINISH_BYTES_PER_PAIR = 48
+
+
+def get_representative_text(texts, embeddings):
+    centroid = np.mean(embeddings, axis=0)
+    sims = cosine_similarity([centroid], embeddings)[0]
+    return texts[np.argmax(sims)]
+
+
+def dense_bytes(n_rows):
+    # similarity, 1 - similarity, the copy the clustering validates and its
+    # condensed distances: about four n x n float64 matrices
+    return 4 * 8 * n_rows * n_rows
+
+
+def cluster_texts(
+    embeddings,
+    type_embeddings,
+    ner_features,
+    distance_threshold=DISTANCE_THRESHOLD,
+    memory_limit=MEMORY_LIMIT,
+):
+    """Sub-cluster labels of one spatial cluster, None if the TF-IDF vocabulary is empty.
+
+    Clusters whose dense distance matrix fits in ``memory_limit`` bytes are
+    clustered exactly like the notebook; bigger ones go through ``_cluster_graph``.
+    """
+    vectorizer = TfidfVectorizer()
+    try:
+        ner_tfidf = vectorizer.fit_transform(ner_features)
+    except ValueError:
+        return None  # ข้ามกรณี vocabulary ว่าง
+
+    dense = np.concatenate([embeddings, type_embeddings], axis=1)
+    if dense_bytes(len(dense)) <= memory_limit:
+        return _cluster_dense(dense, ner_tfidf, distance_threshold)
+    return _cluster_graph(dense, ner_tfidf, distance_threshold, memory_limit)
+
+
+def _cluster_dense(dense, ner_tfidf, distance_threshold):
+    if len(dense) == 1:
+        return np.zeros(1, dtype=np.int64)
+    combined_features = np.concatenate([dense, ner_tfidf.toarray()], axis=1)
+    similarity_matrix = cosine_similarity(combined_features).astype(np.float64)
+    distance_matrix = 1 - similarity_matrix
+
+    clustering_model = AgglomerativeClustering(
+        metric='precomputed',
+        linkage='average',
+        distance_threshold=distance_threshold,
+        n_clusters=None,
+    )
+    return clustering_model.fit_predict(distance_matrix)
+
+
+# ------------------------- GRAPH MODE -----------------------------
+
+
+def _unit_rows(dense, sparse):
+    # Cosine similarity of [dense, sparse] rows without densifying the TF-IDF,
+    # in float32 to halve the blocks (_scan's slack covers the rounding)
+    sparse_norms = np.asarray(sparse.multiply(sparse).sum(axis=1)).ravel()
+    norms = np.sqrt(np.einsum("ij,ij->i", dense, dense, dtype=np.float64) + sparse_norms)
+    scale = (1 / np.maximum(norms, 1e-12)).astype(np.float32)
+    unit_dense = np.asarray(dense, dtype=np.float32) * scale[:, None]
+    return unit_dense, csr_matrix(sparse.multiply(scale[:, None]), dtype=np.float32)
+
+
+def _scan(dense, sparse, distance_threshold, n_neighbors, memory_limit):
+    """One blockwise pass over all pairs of unit rows.
+
+    Returns the smallest row of every row's component in the graph joining
+    every pair within ``distance_threshold``, and the ``n_neighbors`` most
+    similar rows of every row among those pairs (``-1`` pads short lists)
+    with their similarities. A block of rows, and everything derived from it
+    (TF-IDF part, neighbour ranks, threshold mask, edges), stays within
+    ``memory_limit``.
+
+    The pass is quadratic in time on purpose: the components have to be
+    exact for the dense path to reproduce the notebook, and a tree index
+    (BallTree, NearestNeighbors) doesn't prune in the 768 embedding
+    dimensions, where its radius and kNN queries ran ~30x slower than these
+    matrix products, besides leaving out the TF-IDF.
+    """
+    n = len(dense)
+    k = min(n_neighbors, n - 1)
+    min_similarity = 1 - distance_threshold - 1e-4  # keeps pairs that round across the threshold
+    chunk = max(1, memory_limit // (BLOCK_BYTES_PER_PAIR * n))
+    sparse_t = sparse.T.tocsr()
+    every_row = np.arange(n, dtype=np.int32)
+
+    rep = every_row.copy()
+    neighbors = np.full((n, k), -1, dtype=np.int32)
+    similarities = np.zeros((n, k), dtype=np.float32)
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        block = dense[start:end] @ dense.T
+        block += (sparse[start:end] @ sparse_t).toarray()
+        block[np.arange(end - start), np.arange(start, end)] = -np.inf  # not its own neighbour
+
+        top = np.argpartition(block, n - k, axis=1)[:, n - k :]
+        top_similarity = np.take_along_axis(block, top, axis=1)
+        close = top_similarity >= min_similarity
+        neighbors[start:end] = np.where(close, top, -1)
+        similarities[start:end] = np.where(close, top_similarity, 0)
+        del top
+
+        # the block's edges as an n x n CSR matrix (only its rows have entries)
+        mask = block >= min_similarity
+        del block
+        counts = mask.sum(axis=1)
+        cols = np.broadcast_to(every_row, mask.shape)[mask]
+        del mask
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indptr[start + 1 : end + 1] = np.cumsum(counts)
+        indptr[end + 1 :] = indptr[end]
+        graph = csr_matrix((np.ones(len(cols)), cols, indptr), shape=(n, n))
+        del cols
+        _, block_components = connected_components(graph, directed=False)
+        del graph
+
+        # merge with the components of the earlier blocks
+        first = np.full(block_components.max() + 1, n, dtype=np.int32)
+        np.minimum.at(first, block_components, every_row)
+        links = coo_matrix(
+            (np.ones(2 * n), (np.r_[every_row, every_row], np.r_[rep, first[block_components]])), shape=(n, n)
+        )
+        _, components = connected_components(links, directed=False)
+        first = np.full(components.max() + 1, n, dtype=np.int32)
+        np.minimum.at(first, components, every_row)
+        rep = first[components]
+    return rep, neighbors, similarities
+
+
+def _cluster_knn(dense, neighbors, similarities, distance_threshold, memory_limit):
+    """Average linkage of one component on its nearest-neighbour graph.
+
+    Only clusters joined by an edge of the graph are candidates for a merge,
+    so the work grows with the ``n x n_neighbors`` edges, not with all pairs.
+    A candidate's distance still averages the embedding part over all its
+    pairs of points, ``1 - sum(A) . sum(B) / (|A| |B|)`` from per-cluster sums
+    of the unit rows, and adds the TF-IDF part of the pairs joined by an edge
+    (the others count as 0), so it never underestimates the exact distance.
+
+    Neighbours only link rows of the same topic, so the clusters left when no
+    edge is below the threshold are merged once more over all their pairs
+    (``_finish_linkage``) if their distance matrix fits in ``memory_limit``.
+    ``dense`` holds the unit rows and is summed in place.
+    """
+    n = len(dense)
+    sums = dense  # row x becomes the sum of cluster x
+    size = np.ones(n)
+    parent = np.arange(n)
+    version = np.zeros(n, dtype=np.int64)  # bumped on every merge, -1 once absorbed
+
+    # TF-IDF similarity summed over the edges between two clusters
+    rows, slots = np.nonzero(neighbors >= 0)
+    cols = neighbors[rows, slots]
+    tfidf = np.empty(len(rows))
+    for i in range(0, len(rows), 4096):
+        part = slice(i, i + 4096)
+        embedding = np.einsum("ij,ij->i", dense[rows[part]], dense[cols[part]])
+        tfidf[part] = similarities[rows[part], slots[part]] - embedding
+    edges = [{} for _ in range(n)]
+    for a, b, value in zip(rows.tolist(), cols.tolist(), tfidf.tolist()):
+        edges[a][b] = edges[b][a] = max(value, 0.0)
+    del rows, slots, cols, tfidf
+
+    # one entry per cluster: its nearest neighbour when it was last changed
+    heap = []
+
+    def push_nearest(x):
+        if not edges[x]:
+            return
+        others = np.fromiter(edges[x], dtype=np.int64, count=len(edges[x]))
+        tfidf = np.fromiter(edges[x].values(), dtype=np.float64, count=len(others))
+        similarity = (sums[others] @ sums[x] + tfidf) / (size[others] * size[x])
+        best = int(np.argmax(similarity))
+        if 1 - similarity[best] < distance_threshold:
+            w = int(others[best])
+            heapq.heappush(heap, (1 - float(similarity[best]), x, w, version[x], version[w]))
+
+    for x in range(n):
+        push_nearest(x)
+    while heap:
+        _, x, y, version_x, version_y = heapq.heappop(heap)
+        if version[x] != version_x:
+            continue  # x has merged since and has a newer entry
+        if version[y] != version_y:
+            push_nearest(x)  # its neighbour has merged since
+            continue
+        if len(edges[x]) < len(edges[y]):
+            x, y = y, x  # fold the smaller edge list into the bigger one
+
+        sums[x] += sums[y]
+        size[x] += size[y]
+        parent[y] = x
+        version[x] += 1
+        version[y] = -1
+        del edges[x][y]
+        for w, value in edges[y].items():
+            if w != x:
+                edges[x][w] = edges[w][x] = edges[x].get(w, 0.0) + value
+                del edges[w][y]
+        edges[y] = None
+        push_nearest(x)
+
+    alive = np.flatnonzero(version >= 0)
+    if 1 < len(alive) and FINISH_BYTES_PER_PAIR * len(alive) ** 2 <= memory_limit:
+        _finish_linkage(alive, sums, size, edges, parent, distance_threshold)
+
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            break
+        parent = grandparent
+    _, labels = np.unique(parent, return_inverse=True)
+    return labels
+
+
+def _finish_linkage(alive, sums, size, edges, parent, distance_threshold):
+    """Average linkage of the clusters ``alive`` over all their pairs, into ``parent``."""
+    m = len(alive)
+    position = {cluster: i for i, cluster in enumerate(alive.tolist())}
+    tfidf = np.zeros((m, m))
+    for i, cluster in enumerate(alive.tolist()):
+        for w, value in edges[cluster].items():
+            tfidf[i, position[w]] = value
+    sums = sums[alive].astype(np.float64)
+    size = size[alive].copy()
+    active = np.ones(m, dtype=bool)
+    distance = sums @ sums.T
+    distance += tfidf
+    distance /= np.outer(size, size)
+    np.subtract(1, distance, out=distance)
+    np.fill_diagonal(distance, np.inf)
+    while True:
+        x, y = divmod(int(np.argmin(distance)), m)
+        if distance[x, y] >= distance_threshold:
+            break
+        sums[x] += sums[y]
+        size[x] += size[y]
+        tfidf[x] += tfidf[y]
+        tfidf[:, x] = tfidf[x]
+        active[y] = False
+        parent[alive[y]] = alive[x]
+
+        row = 1 - (sums @ sums[x] + tfidf[x]) / (size * size[x])
+        row[~active] = np.inf
+        row[x] = np.inf
+        distance[x] = distance[:, x] = row
+        distance[y] = distance[:, y] = np.inf
+
+
+def _cluster_graph(dense, ner_tfidf, distance_threshold, memory_limit, n_neighbors=N_NEIGHBORS):
+    """Sub-clusters of a spatial cluster too big for the dense distance matrix.
+
+    ``_scan`` goes over all pairs block by block with the TF-IDF kept sparse.
+    An average-linkage merge below the threshold always joins two clusters
+    with a pair of points below it, so every sub-cluster lies inside one
+    component of the threshold graph. Components that fit in ``memory_limit``
+    are clustered on their dense matrix, with the dense path's partition
+    (label numbers may differ); bigger ones on their nearest-neighbour graph
+    with ``_cluster_knn``.
+    """
+    ner_tfidf = ner_tfidf.tocsr()
+    unit, sparse = _unit_rows(dense, ner_tfidf)
+    rep, neighbors, similarities = _scan(unit, sparse, distance_threshold, n_neighbors, memory_limit)
+
+    labels = np.empty(len(dense), dtype=np.int64)
+    position = np.empty(len(dense), dtype=np.int64)
+    next_label = 0
+    order = np.argsort(rep, kind="stable")
+    starts = np.flatnonzero(np.r_[True, rep[order][1:] != rep[order][:-1]])
+    for rows in np.split(order, starts[1:]):
+        if dense_bytes(len(rows)) <= memory_limit:
+            component_labels = _cluster_dense(dense[rows], ner_tfidf[rows], distance_threshold)
+        else:
+            position[rows] = np.arange(len(rows))
+            local = np.where(neighbors[rows] >= 0, position[neighbors[rows]], -1)
+            # one component is all rows in order, and unit isn't needed after it
+            rows_unit = unit if len(rows) == len(unit) else unit[rows]
+            component_labels = _cluster_knn(
+                rows_unit, local, similarities[rows], distance_threshold, memory_limit
+            )
+        labels[rows] = component_labels + next_label
+        next_label += int(component_labels.max()) + 1
+    return labels
+
+
+def text_subclusters(df, features, distance_threshold=DISTANCE_THRESHOLD, memory_limit=MEMORY_LIMIT):
+    """``text_cluster`` per row of ``df`` and the ``cluster_info`` table.
+
+    ``df`` has the DBSCAN ``cluster`` and the ``comment`` of every report and
+    ``features`` is the ``Features`` of (at least) its clustered rows. Rows
+    of noise clusters, and of clusters skipped for an empty vocabulary, keep a
+    missing ``text_cluster`` like in the notebook.
+    """
+    text_cluster = pd.Series(np.nan, index=df.index, name="text_cluster")
+    cluster_list = []
+
+    df_with_clustering = df[df["cluster"] > -1]
+    for target_cluster, target_df in df_with_clustering.groupby("cluster", sort=False):
+        texts = target_df["comment"].astype(str).tolist()
+        embeddings, type_embeddings, ner_features = features.take(target_df.index)
+        labels = cluster_texts(
+            embeddings, type_embeddings, ner_features, distance_threshold, memory_limit=memory_limit
+        )
+        if labels is None:
+            continue
+        text_cluster[target_df.index] = labels
+
+        for sub_label in np.unique(labels):
+            sub_indices = np.flatnonzero(labels == sub_label)
+            rep = get_representative_text([texts[i] for i in sub_indices], embeddings[sub_indices])
+            cluster_list.append(
+                {
+                    "cluster_id": target_cluster,
+                    "text_cluster": sub_label,
+                    "cluster_desc": rep,
+                }
+            )
+
+    return text_cluster, pd.DataFrame(cluster_list, columns=["cluster_id", "text_cluster", "cluster_desc"])
@@ -0,0 +1,207 @@
+"""Zone of a location: 1-nearest OSM zone point, looked up in a raster.
+
+``api_for_zone_module.ipynb`` fits a ``KNeighborsClassifier(n_neighbors=1)`` on
+the tagged OSM points and ``dataprep_for_visualization.ipynb`` ships the pickle
+to every Spark executor to run a tree query per row. ``ZoneRaster``
+precomputes that answer once over a fine grid of ``BANGKOK_BBOX``:
+
+- every cell stores the zone code (uint8) of the nearest point to its center,
+  or ``AMBIGUOUS`` when the nearest point of another zone is less than a cell
+  diagonal further away, so that some point of the cell could get a
+  different answer;
+- a lookup is array indexing, and only ambiguous cells and points outside the
+  box fall back to the exact nearest-point query.
+
+The answer is the classifier's (up to exact distance ties). Build and save it
+once, then load it in Spark (``zone_udf``) or in the dashboard
+(``streamlit_app/zone_lookup.py`` reads the same file):
+
+    python -m pipeline.zones --points zone_points.csv --out zone_raster.npz
+
+``zone_points.csv`` holds the points the classifier was fitted on (the
+notebook writes it next to ``knn.pkl``).
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Define your zone keywords
+ZONES = {
+    "โซนโรงเรียน/การศึกษา": ["school", "university", "college", "kindergarten", "education", "academy", "educational_institution"],
+    "โซนตลาด/พาณิชย์": ["marketplace", "market", "bazaar", "wet_market", "fresh_market", "trading_area"],
+    "โซนท่องเที่ยว/ศิลปวัฒนธรรม": ["museum", "monument", "tourism", "attraction", "temple", "viewpoint", "historic", "cultural", "artwork"],
+    "โซนที่พักอาศัย": ["residential", "apartment", "house", "condominium", "flat", "residence", "housing"],
+    "โซนสำนักงาน/หน่วยงานรัฐ": ["office", "public", "government", "townhall", "civic", "embassy", "courthouse"],
+    "โซนอุตสาหกรรม/โรงงาน": ["industrial", "factory", "manufacture", "plant", "warehouse"],
+    "โซนก่อสร้าง": ["construction", "building_site", "development"],
+    "โซนถนน/คมนาคม": ["highway", "road", "street", "transport", "bus_station", "railway", "junction", "subway_entrance", "parking"],
+    "โซนแหล่งน้ำ/คลอง": ["canal", "waterway", "river", "stream", "reservoir", "pond", "lake"],
+    "โซนห้าง/คอมมูนิตี้มอลล์": ["mall", "shopping_centre", "supermarket", "store", "retail", "department_store", "shopping", "commercial"],
+    "โซนศาสนา/สงบ": ["place_of_worship", "temple", "church", "mosque", "shrine", "spiritual", "religious"],
+    "โซนสาธารณสุข": ["hospital", "clinic", "healthcare", "pharmacy", "medical", "emergency"],
+    "โซนพื้นที่สีเขียว/สวนสาธารณะ": ["park", "garden", "greenfield", "forest", "recreation_ground", "nature_reserve"],
+    "โซนชุมชนแออัด/ชุมชนดั้งเดิม": ["slum", "village", "community", "settlement", "camp", "squatter"],
+    "โซนสถานบันเทิง/ร้านอาหาร": ["bar", "pub", "restaurant", "entertainment", "nightclub", "karaoke", "cafe", "food_court"],
+}
+
+# Bangkok bounding box: (approx.) North, South, East, West
+BANGKOK_BBOX = (13.0, 100.3, 14.2, 100.98)  # (S, W, N, E)
+
+CELL_SIZE = 0.0005  # degrees, about 55 m
+AMBIGUOUS = 255
+N_CANDIDATES = 16  # nearest points checked for another zone per cell
+
+
+class ZoneRaster:
+    def __init__(self, raster, points, point_codes, zones, bbox=BANGKOK_BBOX, cell_size=CELL_SIZE):
+        self.raster = raster  # (rows from south, columns from west) uint8 codes
+        self.points = points  # (lat, lon) of the zone points, for the fallback
+        self.point_codes = point_codes
+        self.zones = np.asarray(zones, dtype=object)
+        self.bbox = tuple(bbox)
+        self.cell_size = cell_size
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+
+            self._tree = cKDTree(self.points)
+        return self._tree
+
+    @classmethod
+    def from_points(cls, lat, lon, zone, bbox=BANGKOK_BBOX, cell_size=CELL_SIZE, chunk_rows=64):
+        """Rasterize the 1-NN zone of the points ``(lat, lon, zone)``."""
+        points = np.column_stack([lat, lon]).astype(np.float64)
+        # known zones keep their ZONES order, anything else follows
+        names = list(ZONES) + sorted(set(zone) - set(ZONES))
+        if len(names) >= AMBIGUOUS:
+            raise ValueError("too many zones for a uint8 raster")
+        point_codes = pd.Categorical(zone, categories=names).codes.astype(np.uint8)
+        raster = cls(None, points, point_codes, names, bbox, cell_size)
+
+        south, west, north, east = bbox
+        n_rows = int(np.ceil((north - south) / cell_size))
+        n_cols = int(np.ceil((east - west) / cell_size))
+        center_lon = west + (np.arange(n_cols) + 0.5) * cell_size
+        diagonal = cell_size * np.sqrt(2)
+        k = min(N_CANDIDATES, len(points))
+
+        cells = np.empty((n_rows, n_cols), dtype=np.uint8)
+        for start in range(0, n_rows, chunk_rows):
+            rows = np.arange(start, min(start + chunk_rows, n_rows))
+            center_lat = south + (rows + 0.5) * cell_size
+            centers = np.column_stack(
+                [np.repeat(center_lat, n_cols), np.tile(center_lon, len(rows))]
+            )
+            distance, nearest = raster.tree.query(centers, k=k, workers=-1)
+            distance, nearest = distance.reshape(len(centers), k), nearest.reshape(len(centers), k)
+            codes = point_codes[nearest]
+            other = codes != codes[:, :1]
+            # distance to the nearest point of another zone, or a lower bound of it
+            if k < len(points):
+                bound = distance[:, -1]
+            else:
+                bound = np.full(len(centers), np.inf)
+            other_distance = np.where(
+                other.any(axis=1), distance[np.arange(len(centers)), other.argmax(axis=1)], bound
+            )
+            safe = other_distance - distance[:, 0] > diagonal
+            cells[rows] = np.where(safe, codes[:, 0], AMBIGUOUS).reshape(len(rows), n_cols)
+        raster.raster = cells
+        return raster
+
+    @property
+    def ambiguous_fraction(self):
+        return float(np.mean(self.raster == AMBIGUOUS))
+
+    def lookup(self, lat, lon):
+        """Zone codes of the locations (indexes into ``zones``)."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        south, west, _, _ = self.bbox
+        row = np.floor((lat - south) / self.cell_size)
+        col = np.floor((lon - west) / self.cell_size)
+        inside = (row >= 0) & (row < self.raster.shape[0]) & (col >= 0) & (col < self.raster.shape[1])
+
+        codes = np.full(lat.shape, AMBIGUOUS, dtype=np.uint8)
+        codes[inside] = self.raster[row[inside].astype(np.intp), col[inside].astype(np.intp)]
+        exact = codes == AMBIGUOUS
+        if exact.any():
+            _, nearest = self.tree.query(np.column_stack([lat[exact], lon[exact]]), k=1)
+            codes[exact] = self.point_codes[nearest]
+        return codes
+
+    def predict(self, lat, lon):
+        """Zone names of the locations, like ``knn.predict``."""
+        return self.zones[self.lookup(lat, lon)]
+
+    def save(self, path):
+        # Write-then-rename so an interrupted save never leaves half a raster
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            raster=self.raster,
+            points=self.points,
+            point_codes=self.point_codes,
+            zones=np.asarray(self.zones, dtype=str),
+            bbox=np.asarray(self.bbox, dtype=np.float64),
+            cell_size=np.float64(self.cell_size),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["raster"],
+                data["points"],
+                data["point_codes"],
+                data["zones"].tolist(),
+                tuple(data["bbox"].tolist()),
+                float(data["cell_size"]),
+            )
+
+
+# ------------------------- SPARK -----------------------------
+
+_loaded = {}  # path -> ZoneRaster, loaded once per executor process
+
+
+def load_cached(path):
+    if path not in _loaded:
+        _loaded[path] = ZoneRaster.load(path)
+    return _loaded[path]
+
+
+def zone_udf(path):
+    """Spark ``pandas_udf`` (lat, long) -> zone reading the raster at ``path``.
+
+    Only the path is shipped with the UDF; each executor loads the raster once
+    (``path`` must be readable there, e.g. added with ``SparkContext.addFile``
+    and resolved with ``SparkFiles.get``).
+    """
+    from pyspark.sql.functions import pandas_udf
+
+    @pandas_udf("string")
+    def predict_zone(lat, lon):
+        return pd.Series(load_cached(path).predict(lat.to_numpy(), lon.to_numpy()))
+
+    return predict_zone
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the zone lookup raster")
+    parser.add_argument("--points", required=True, help="CSV with lat, lon, zone columns")
+    parser.add_argument("--out", default="zone_raster.npz")
+    parser.add_argument("--cell-size", type=float, default=CELL_SIZE)
+    args = parser.parse_args()
+
+    points = pd.read_csv(args.points)
+    raster = ZoneRaster.from_points(points["lat"], points["lon"], points["zone"], cell_size=args.cell_size)
+    raster.save(args.out)
+    print(f"{raster.raster.shape} cells, {raster.ambiguous_fraction:.1%} ambiguous -> {args.out}")
@@ -0,0 +1,383 @@
+"""Headless HTTP query API over the dashboard tables.
+
+Programmatic consumers (e.g. a district office pulling its top problems)
+used to scrape the Streamlit UI, a full page render per request. This server
+answers the same questions straight from the memory-mapped store, with the
+dashboard's own ``FilterIndex`` and ``Rollup``:
+
+    python api.py --data-dir . --port 8502
+
+    GET /clusters/<cluster_id>             one cluster (+ its comment count)
+    GET /clusters?zone=&organization=&status=&min_num_times=&bbox=south,west,north,east
+                 &limit=100&offset=0       clusters by num_times, paginated (limit <= 500)
+    GET /top/zones?n=5&organization=&status=
+    GET /top/organizations?n=5&zone=&status=
+    GET /filters                           zones, organizations and statuses
+    GET /version                           dataset version and row count
+
+Responses are JSON, or an Arrow IPC stream for ``/clusters`` with
+``format=arrow`` (or ``Accept: application/vnd.apache.arrow.stream``). Each
+carries an ``ETag`` of the dataset version (``data_store.dataset_version``),
+the format and the request's path and query, so clients revalidate with
+``If-None-Match`` and get ``304`` until the data changes; only a URL that was
+answered with ``200`` has such a tag, so errors are never revalidated. The
+store is checked for a new version at most once a second. Unexpected errors
+are logged and answered with a JSON ``500``.
+Clusters are ranked once per dataset, so a page of a filtered list is an
+intersection of postings, a sort of small integers and a ``take``; its JSON
+is formatted column by column from the arrays (categories encoded once, NaN
+as ``null``) rather than through a dict per row.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json.encoder import encode_basestring
+from urllib.parse import parse_qs, quote, urlencode, urlsplit, unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from data_store import CLUSTER_STORE, dataset_version, load_comments, read_table, to_pandas
+from filters import FilterIndex, intersect
+from rollup import Rollup
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500  # a page of 500 rows formats in ~2 ms
+DEFAULT_TOP = 5
+RELOAD_SECONDS = 1.0  # how often the store files are checked for a new version
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+log = logging.getLogger("api")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class NotFound(LookupError):
+    pass
+
+
+# ------------------------- DATASET -----------------------------
+
+
+def _json_strings(values):
+    return [encode_basestring(value) if value is not None else "null" for value in values]
+
+
+def _column_encoder(table, df, name):
+    """``encode(rows)``: the JSON text of column ``name`` at the rows."""
+    series = df[name]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # code -1 (missing) picks the "null" at the end
+        categories = _json_strings(series.cat.categories.tolist()) + ["null"]
+        codes = series.cat.codes.to_numpy()
+        return lambda rows: [categories[code] for code in codes[rows].tolist()]
+    if series.dtype.kind == "b":
+        values = series.to_numpy()
+        return lambda rows: ["true" if value else "false" for value in values[rows].tolist()]
+    if series.dtype.kind in "iu":
+        values = series.to_numpy()
+        return lambda rows: list(map(str, values[rows].tolist()))
+    if series.dtype.kind == "f":
+        values = series.to_numpy(dtype=np.float64)
+
+        def encode(rows):
+            page = values[rows]
+            text = [repr(value) for value in page.tolist()]
+            for i in np.flatnonzero(~np.isfinite(page)).tolist():
+                text[i] = "null"  # NaN and Infinity aren't JSON
+            return text
+
+        return encode
+    column = table.column(name)
+    return lambda rows: _json_strings(column.take(pa.array(rows, type=pa.int32())).to_pylist())
+
+
+class Dataset:
+    """One version of the cluster table with everything the queries need."""
+
+    def __init__(self, data_dir="."):
+        self.version = dataset_version(data_dir)
+        self.table = read_table(os.path.join(data_dir, CLUSTER_STORE))
+        df = to_pandas(self.table)  # same buffers as the table
+        self.n_rows = len(df)
+        self.filter_index = FilterIndex(df)
+        self.rollup = Rollup(df)
+        self.comments = load_comments(data_dir)
+        self.position = {cluster: i for i, cluster in enumerate(self.table.column("cluster_id").to_pylist())}
+
+        # rank of every row by num_times (largest first, ties in table order)
+        num_times = df["num_times"].to_numpy()
+        self.order = np.argsort(-num_times, kind="stable").astype(np.int32)
+        self.rank = np.empty_like(self.order)
+        self.rank[self.order] = np.arange(self.n_rows, dtype=np.int32)
+
+        # rows sorted by latitude, for bounding boxes
+        self.lat = df["lat"].to_numpy(dtype=np.float64)
+        self.long = df["long"].to_numpy(dtype=np.float64)
+        self.by_lat = np.argsort(self.lat, kind="stable").astype(np.int32)
+        self.sorted_lat = self.lat[self.by_lat]
+
+        # '{"cluster_id":%s,"num_times":%s,...}' and the encoder of every column
+        names = self.table.column_names
+        self._record = "{" + ",".join(f"{encode_basestring(name)}:%s" for name in names) + "}"
+        self._encoders = [_column_encoder(self.table, df, name) for name in names]
+
+    def in_bbox(self, south, west, north, east):
+        """Sorted rows with ``south <= lat <= north`` and ``west <= long <= east``."""
+        lo = np.searchsorted(self.sorted_lat, south, side="left")
+        hi = np.searchsorted(self.sorted_lat, north, side="right")
+        rows = self.by_lat[lo:hi]
+        rows = rows[(self.long[rows] >= west) & (self.long[rows] <= east)]
+        return np.sort(rows)
+
+    def select(self, zone=None, organization=None, status=None, min_num_times=None, bbox=None):
+        """Row positions matching the filters, ranked by num_times; ``None`` filters nothing."""
+        rows = self.filter_index.select(zone, organization, status, min_num_times)
+        if bbox is not None:
+            box = self.in_bbox(*bbox)
+            rows = box if rows is None else intersect(rows, box)
+        if rows is None:
+            return self.order
+        return self.order[np.sort(self.rank[rows])]
+
+    def records_json(self, rows):
+        """JSON array of the rows as objects."""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = [encode(rows) for encode in self._encoders]
+        record = self._record
+        return "[" + ",".join([record % values for values in zip(*columns)]) + "]"
+
+    def records(self, rows):
+        return json.loads(self.records_json(rows))
+
+
+# ------------------------- QUERIES -----------------------------
+
+
+def _one(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _int(params, name, default, low=0, high=None):
+    value = _one(params, name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+    if value < low or (high is not None and value > high):
+        raise BadRequest(f"{name} must be between {low} and {high}" if high else f"{name} must be >= {low}")
+    return value
+
+
+def _bbox(params):
+    value = _one(params, "bbox")
+    if value is None:
+        return None
+    try:
+        south, west, north, east = (float(part) for part in value.split(","))
+    except ValueError:
+        raise BadRequest("bbox must be south,west,north,east") from None
+    if south > north or west > east:
+        raise BadRequest("bbox must be south,west,north,east")
+    return south, west, north, east
+
+
+class QueryAPI:
+    """The queries behind the HTTP routes, on the current ``Dataset``."""
+
+    def __init__(self, data_dir="."):
+        self.data_dir = data_dir
+        self.dataset = Dataset(data_dir)
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+
+    def current(self):
+        """The dataset, reloaded if the store files changed (checked once a second)."""
+        if time.monotonic() - self._checked >= RELOAD_SECONDS:
+            with self._lock:
+                if time.monotonic() - self._checked >= RELOAD_SECONDS:
+                    if dataset_version(self.data_dir) != self.dataset.version:
+                        self.dataset = Dataset(self.data_dir)
+                    self._checked = time.monotonic()
+        return self.dataset
+
+    def cluster(self, dataset, cluster_id):
+        row = dataset.position.get(cluster_id)
+        if row is None:
+            raise NotFound(f"no cluster {cluster_id!r}")
+        record = dataset.records([row])[0]
+        record["comment_count"] = dataset.comments.count(cluster_id)
+        return record
+
+    def clusters(self, dataset, params):
+        """``(rows of the page, total matches, offset, limit)``."""
+        rows = dataset.select(
+            zone=_one(params, "zone"),
+            organization=_one(params, "organization"),
+            status=_one(params, "status"),
+            min_num_times=_int(params, "min_num_times", None),
+            bbox=_bbox(params),
+        )
+        limit = _int(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT)
+        offset = _int(params, "offset", 0)
+        return rows[offset : offset + limit], len(rows), offset, limit
+
+    def top(self, dataset, kind, params):
+        n = _int(params, "n", DEFAULT_TOP, 1, MAX_LIMIT)
+        status = _one(params, "status")
+        if kind == "zones":
+            series = dataset.rollup.top_zones(n, organization=_one(params, "organization"), status=status)
+        elif kind == "organizations":
+            series = dataset.rollup.top_organizations(n, zone=_one(params, "zone"), status=status)
+        else:
+            raise NotFound(f"no top list of {kind!r}")
+        name = series.index.name
+        return [{name: label, "num_times": int(value)} for label, value in series.items()]
+
+    def filters(self, dataset):
+        return {
+            "zones": sorted(dataset.filter_index.zones),
+            "organizations": dataset.filter_index.organization_names,
+            "statuses": sorted(dataset.filter_index.statuses),
+        }
+
+
+# ------------------------- HTTP -----------------------------
+
+
+def _arrow_bytes(table):
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    # headers and body are two writes; with Nagle the body waits ~40 ms for
+    # the client's delayed ACK of the headers
+    disable_nagle_algorithm = True
+    api = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass  # one line per request is too much at this rate
+
+    def _send(self, status, body=b"", content_type="application/json; charset=utf-8", headers=()):
+        if status == 200 and self._match_any:
+            # If-None-Match: * and the URL has a representation
+            status, body = 304, b""
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Server-Timing", f"app;dur={(time.perf_counter() - self._start) * 1000:.3f}")
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _json(self, status, payload, headers=()):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers=headers)
+
+    def _if_none_match(self):
+        # If-None-Match may list several tags, or "*"
+        return [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        self._start = time.perf_counter()
+        self._match_any = False
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        arrow = _one(params, "format") == "arrow" or ARROW_STREAM in self.headers.get("Accept", "")
+
+        routed = parts in (["clusters"], ["filters"], ["version"]) or (
+            len(parts) == 2 and parts[0] in ("clusters", "top")
+        )
+        if not routed:
+            return self._json(404, {"error": f"no route {url.path}"})
+
+        dataset = self.api.current()
+        # the tag names the URL too, so only a URL answered with 200 can match
+        etag = f'"{dataset.version}-{"arrow" if arrow else "json"}-{zlib.crc32(self.path.encode()):08x}"'
+        cache_headers = [("ETag", etag), ("Cache-Control", "no-cache"), ("Vary", "Accept")]
+        tags = self._if_none_match()
+        if etag in tags:
+            return self._send(304, headers=cache_headers)
+        # "*" matches any representation: known only once the request succeeds
+        self._match_any = "*" in tags
+
+        try:
+            if parts == ["clusters"]:
+                return self._clusters(dataset, url, params, arrow, cache_headers)
+            if len(parts) == 2 and parts[0] == "clusters":
+                return self._json(200, self.api.cluster(dataset, parts[1]), cache_headers)
+            if len(parts) == 2 and parts[0] == "top":
+                return self._json(200, self.api.top(dataset, parts[1], params), cache_headers)
+            if parts == ["filters"]:
+                return self._json(200, self.api.filters(dataset), cache_headers)
+            return self._json(200, {"version": dataset.version, "rows": dataset.n_rows}, cache_headers)
+        except BadRequest as e:
+            self._json(400, {"error": str(e)})
+        except NotFound as e:
+            self._json(404, {"error": str(e)})
+        except ConnectionError:
+            raise  # the client went away, nothing to answer
+        except Exception:
+            log.exception("GET %s failed", self.path)
+            self._json(500, {"error": "internal error"})
+
+    def _clusters(self, dataset, url, params, arrow, headers):
+        rows, total, offset, limit = self.api.clusters(dataset, params)
+        next_url = None
+        if offset + limit < total:
+            query = {name: values[-1] for name, values in params.items()}
+            query["offset"] = offset + limit
+            next_url = f"{url.path}?{urlencode(query, quote_via=quote)}"
+        headers = headers + [("X-Total-Count", str(total))]
+        if arrow:
+            if next_url:
+                headers.append(("Link", f'<{next_url}>; rel="next"'))
+            table = dataset.table.take(pa.array(rows, type=pa.int32()))
+            return self._send(200, _arrow_bytes(table), ARROW_STREAM, headers)
+        page = {"version": dataset.version, "total": total, "offset": offset, "limit": limit, "next": next_url}
+        # the items are already JSON; splice them in as the last key
+        body = json.dumps(page, ensure_ascii=False)[:-1] + ', "items": ' + dataset.records_json(rows) + "}"
+        self._send(200, body.encode("utf-8"), headers=headers)
+
+
+def make_server(data_dir=".", host="127.0.0.1", port=8502):
+    """A ``ThreadingHTTPServer`` answering queries on the store in ``data_dir``."""
+    handler = type("APIHandler", (Handler,), {"api": QueryAPI(data_dir)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the dashboard data as a JSON / Arrow query API")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    server = make_server(args.data_dir, args.host, args.port)
+    print(f"serving {os.path.abspath(args.data_dir)} on http://{args.host}:{server.server_port}", flush=True)
+    server.serve_forever()
@@ -0,0 +1,66 @@
+"""Map colors of zones and statuses, precomputed as uint8 columns.
+
+The map used to build a Python ``[r, g, b]`` list per row on every rerun.
+The colors only depend on a cluster's zone and status, so they are computed
+once per dataset with a vectorized palette lookup (``zone_r``, ``zone_g``,
+``zone_b``, ``status_r``, ...) and the pydeck layers read them with an
+accessor expression such as ``"[zone_r, zone_g, zone_b]"``.
+"""
+
+import numpy as np
+import pandas as pd
+
+ZONE_PALETTE = [
+    [255, 0, 0],  # Red
+    [0, 255, 0],  # Green
+    [0, 0, 255],  # Blue
+    [255, 165, 0],  # Orange
+    [128, 0, 128],  # Purple
+    [255, 192, 203],  # Pink
+    [165, 42, 42],  # Brown
+    [0, 255, 255],  # Cyan
+    [255, 255, 0],  # Yellow
+    [70, 130, 180],  # Steel Blue
+    [50, 205, 50],  # Lime Green
+    [255, 0, 255],  # Magenta
+    [210, 105, 30],  # Chocolate
+    [128, 128, 0],  # Olive
+    [0, 128, 128],  # Teal
+]
+
+STATUS_COLORS = {
+    "เสร็จสิ้น": [0, 200, 83],  # green
+    "กำลังดำเนินการ": [255, 193, 7],  # yellow
+    "รอรับเรื่อง": [244, 67, 54],  # red
+}
+
+DEFAULT_COLOR = [0, 0, 0]  # values without a color, e.g. another status
+
+
+def create_zone_colors(zones):
+    return {zone: ZONE_PALETTE[i % len(ZONE_PALETTE)] for i, zone in enumerate(zones)}
+
+
+def rgb_columns(values, colors):
+    """``(r, g, b)`` uint8 arrays of ``values`` looked up in ``colors``."""
+    names = list(colors)
+    palette = np.array([colors[name] for name in names] + [DEFAULT_COLOR], dtype=np.uint8)
+    codes = pd.Categorical(values, categories=names).codes  # -1 picks DEFAULT_COLOR
+    rgb = palette[codes]
+    return rgb[:, 0], rgb[:, 1], rgb[:, 2]
+
+
+def add_color_columns(df, zone_colors=None):
+    """``df`` with ``zone_r/g/b`` and ``status_r/g/b`` columns added."""
+    if zone_colors is None:
+        zone_colors = create_zone_colors(sorted(df["zone"].unique()))
+    columns = {}
+    for prefix, colors in [("zone", zone_colors), ("status", STATUS_COLORS)]:
+        r, g, b = rgb_columns(df[prefix], colors)
+        columns.update({f"{prefix}_r": r, f"{prefix}_g": g, f"{prefix}_b": b})
+    return df.assign(**columns)
+
+
+def color_accessor(prefix):
+    # pydeck evaluates the string per row in the browser
+    return f"[{prefix}_r, {prefix}_g, {prefix}_b]"
@@ -0,0 +1,248 @@
+"""Typed, memory-mapped columnar store for the dashboard tables.
+
+The pipeline exports ``cluster_data.csv`` and ``example_comment.csv``. Parsing
+them on every cold start is slow and leaves every column as a Python object,
+so this module converts them once into uncompressed Arrow IPC files that can be
+memory-mapped without copying:
+
+    python data_store.py            # build the store next to the CSV files
+
+``load_store`` falls back to building the store on first use, so running the
+app straight after downloading the CSV files keeps working.
+
+Comments are stored sorted by cluster, with a small ``(cluster, start, end)``
+index in natural cluster order; ``CommentStore`` reads only the rows it
+samples from the memory-mapped file.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.ipc as ipc
+
+CLUSTER_CSV = "cluster_data.csv"
+COMMENT_CSV = "example_comment.csv"
+CLUSTER_STORE = "cluster_data.arrow"
+COMMENT_STORE = "example_comment.arrow"
+COMMENT_INDEX = "example_comment_index.arrow"
+
+# Low-cardinality columns are dictionary encoded (pandas categoricals) and the
+# coordinates only need float32 precision (~1 m around Bangkok).
+CLUSTER_SCHEMA = pa.schema(
+    [
+        ("cluster_id", pa.string()),
+        ("num_times", pa.int32()),
+        ("status", pa.dictionary(pa.int8(), pa.string())),
+        ("cluster_desc", pa.string()),
+        ("lat", pa.float32()),
+        ("long", pa.float32()),
+        ("organization", pa.dictionary(pa.int32(), pa.string())),
+        ("zone", pa.dictionary(pa.int8(), pa.string())),
+    ]
+)
+
+COMMENT_SCHEMA = pa.schema(
+    [
+        ("cluster", pa.string()),
+        ("comment", pa.string()),
+    ]
+)
+
+
+# ------------------------- BUILD -----------------------------
+
+
+def _read_csv(path, schema):
+    # Read everything as plain strings/numbers first, dictionary encoding is
+    # done afterwards so the dictionaries are shared by all record batches.
+    column_types = {
+        field.name: (
+            field.type.value_type
+            if pa.types.is_dictionary(field.type)
+            else field.type
+        )
+        for field in schema
+    }
+    table = pacsv.read_csv(
+        path,
+        convert_options=pacsv.ConvertOptions(
+            column_types=column_types, include_columns=schema.names
+        ),
+    )
+    columns = []
+    for field in schema:
+        column = table.column(field.name)
+        if pa.types.is_dictionary(field.type):
+            column = pc.dictionary_encode(column.combine_chunks()).cast(field.type)
+        columns.append(column)
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def write_table(table, path):
+    # Uncompressed IPC file format, which is what makes zero-copy mmap possible.
+    # one tmp file per writer: sessions starting together may all build the store
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def _cluster_sort_keys(clusters):
+    # "<spatial>_<text>" ids sort numerically on both parts, e.g. 2_1 < 10_0
+    parts = pc.split_pattern(clusters, "_")
+    major = pc.cast(pc.list_element(parts, 0), pa.int64()).to_numpy()
+    minor = pc.cast(pc.list_element(parts, 1), pa.int64()).to_numpy()
+    return major, minor
+
+
+def sort_comments(table):
+    """Sort comments by cluster and build the ``cluster -> [start, end)`` index."""
+    major, minor = _cluster_sort_keys(table.column("cluster"))
+    order = np.lexsort((minor, major))
+    table = table.take(pa.array(order))
+    major, minor = major[order], minor[order]
+
+    starts = np.flatnonzero(
+        np.r_[True, (major[1:] != major[:-1]) | (minor[1:] != minor[:-1])]
+    )
+    ends = np.r_[starts[1:], len(order)]
+    index = pa.table(
+        {
+            "cluster": table.column("cluster").take(pa.array(starts)),
+            "start": pa.array(starts, type=pa.int64()),
+            "end": pa.array(ends, type=pa.int64()),
+        }
+    )
+    return table.select(["comment"]), index
+
+
+def build_store(data_dir="."):
+    cluster_table = _read_csv(os.path.join(data_dir, CLUSTER_CSV), CLUSTER_SCHEMA)
+    write_table(cluster_table, os.path.join(data_dir, CLUSTER_STORE))
+
+    comment_table = _read_csv(os.path.join(data_dir, COMMENT_CSV), COMMENT_SCHEMA)
+    comment_table, comment_index = sort_comments(comment_table)
+    write_table(comment_table, os.path.join(data_dir, COMMENT_STORE))
+    write_table(comment_index, os.path.join(data_dir, COMMENT_INDEX))
+
+
+def _is_stale(store_path, csv_path):
+    if not os.path.exists(store_path):
+        return True
+    if not os.path.exists(csv_path):
+        return False
+    return os.path.getmtime(store_path) < os.path.getmtime(csv_path)
+
+
+def ensure_store(data_dir="."):
+    pairs = [
+        (CLUSTER_STORE, CLUSTER_CSV),
+        (COMMENT_STORE, COMMENT_CSV),
+        (COMMENT_INDEX, COMMENT_CSV),
+    ]
+    if any(
+        _is_stale(os.path.join(data_dir, store), os.path.join(data_dir, csv))
+        for store, csv in pairs
+    ):
+        build_store(data_dir)
+
+
+def dataset_version(data_dir="."):
+    """Short id of the current store files, used as a cache key downstream."""
+    ensure_store(data_dir)
+    digest = hashlib.sha1()
+    for name in [CLUSTER_STORE, COMMENT_STORE, COMMENT_INDEX]:
+        stat = os.stat(os.path.join(data_dir, name))
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+# ------------------------- LOAD -----------------------------
+
+
+def read_table(path):
+    # The memory map stays alive as long as any buffer of the table uses it.
+    source = pa.memory_map(path, "r")
+    return ipc.open_file(source).read_all()
+
+
+def _types_mapper(arrow_type):
+    # Keep strings inside the Arrow buffers instead of materializing one
+    # Python object per row; dictionaries become categoricals as usual.
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def to_pandas(table):
+    return table.to_pandas(split_blocks=True, types_mapper=_types_mapper)
+
+
+class CommentStore:
+    def __init__(self, comments, index):
+        self._comments = comments  # memory-mapped, pages are read on access
+        self.clusters = index.column("cluster").to_pylist()  # natural order
+        self._starts = index.column("start").to_numpy()
+        self._ends = index.column("end").to_numpy()
+        self._position = {cluster: i for i, cluster in enumerate(self.clusters)}
+
+    def __len__(self):
+        return len(self._comments)
+
+    def _range(self, cluster):
+        i = self._position.get(cluster)
+        if i is None:
+            return 0, 0
+        return int(self._starts[i]), int(self._ends[i])
+
+    def count(self, cluster):
+        start, end = self._range(cluster)
+        return end - start
+
+    def sample(self, cluster, n, rng=random):
+        """Up to ``n`` random comments of ``cluster``, reading only those rows."""
+        start, end = self._range(cluster)
+        rows = rng.sample(range(start, end), min(n, end - start))
+        return self._comments.take(pa.array(rows, type=pa.int64())).to_pylist()
+
+
+def load_clusters(data_dir="."):
+    ensure_store(data_dir)
+    return to_pandas(read_table(os.path.join(data_dir, CLUSTER_STORE)))
+
+
+def load_comments(data_dir="."):
+    ensure_store(data_dir)
+    comments = read_table(os.path.join(data_dir, COMMENT_STORE)).column("comment")
+    index = read_table(os.path.join(data_dir, COMMENT_INDEX))
+    return CommentStore(comments, index)
+
+
+def load_store(data_dir="."):
+    return load_clusters(data_dir), load_comments(data_dir)
+
+
+def load_csv(data_dir="."):
+    # The original loader, kept for benchmarking against the store.
+    df = pd.read_csv(os.path.join(data_dir, CLUSTER_CSV))
+    df["cluster_id"] = df["cluster_id"].astype(str)
+
+    report_df = pd.read_csv(os.path.join(data_dir, COMMENT_CSV))
+    report_df["cluster"] = report_df["cluster"].astype(str)
+    return df, report_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the dashboard data store")
+    parser.add_argument("--data-dir", default=".")
+    args = parser.parse_args()
+    build_store(args.data_dir)
@@ -0,0 +1,144 @@
+"""Inverted index over the cluster table for the sidebar filters.
+
+Every zone, status and individual organization maps to a sorted array of row
+positions, built once per dataset. Combining filters is an intersection of
+those arrays, so a widget change no longer rescans (or regex-matches) the
+whole table.
+
+``ViewCache`` keeps the selected row positions, shared by every session: a
+popular selection is intersected (and ranked) once, not once per user. It
+holds positions rather than tables, so a full cache is a few MB, and pages
+take only the rows they show.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def split_organizations(orgs):
+    # Same splitting as the organization list in the sidebar
+    if not isinstance(orgs, str):
+        return []
+    return list(dict.fromkeys(org.strip() for org in orgs.split(",")))
+
+
+def _postings(values):
+    # value -> sorted int32 row positions, in a single stable sort
+    codes, uniques = pd.factorize(values, sort=True)
+    order = np.argsort(codes, kind="stable").astype(np.int32)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    # rows with missing values (code -1) sort first, skip them
+    start = int(np.count_nonzero(codes < 0))
+    postings = {}
+    for value, count in zip(uniques, counts):
+        postings[value] = order[start : start + count]
+        start += count
+    return postings
+
+
+def intersect(a, b):
+    # Both arrays are sorted and unique: probe the larger one with the smaller
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return a
+    idx = np.searchsorted(b, a)
+    idx[idx == len(b)] = 0
+    return a[b[idx] == a]
+
+
+class FilterIndex:
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.num_times = df["num_times"].to_numpy()
+        # every row by num_times, largest first (ties in table order)
+        self.order = np.argsort(-self.num_times, kind="stable").astype(np.int32)
+        self.zones = _postings(df["zone"])
+        self.statuses = _postings(df["status"])
+
+        # Each distinct organization string is a comma-joined list of agencies;
+        # an agency's rows are the union of the rows of every list containing it.
+        by_agency = {}
+        for orgs, rows in _postings(df["organization"]).items():
+            for org in split_organizations(orgs):
+                by_agency.setdefault(org, []).append(rows)
+        self.organizations = {
+            org: np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+            for org, parts in by_agency.items()
+        }
+
+    @property
+    def organization_names(self):
+        return sorted(self.organizations)
+
+    def select(self, zone=None, organization=None, status=None, min_num_times=None):
+        """Return the sorted row positions matching every given filter.
+
+        ``None`` means no filter; if no filter is given at all ``None`` is
+        returned so callers can use the full table without indexing it.
+        """
+        empty = np.empty(0, dtype=np.int32)
+        postings = []
+        if zone is not None:
+            postings.append(self.zones.get(zone, empty))
+        if organization is not None:
+            postings.append(self.organizations.get(organization, empty))
+        if status is not None:
+            postings.append(self.statuses.get(status, empty))
+
+        rows = None
+        for part in sorted(postings, key=len):
+            rows = part if rows is None else intersect(rows, part)
+
+        if min_num_times is not None:
+            if rows is None:
+                rows = np.flatnonzero(self.num_times >= min_num_times).astype(np.int32)
+            else:
+                rows = rows[self.num_times[rows] >= min_num_times]
+        return rows
+
+    def ranked(self, rows):
+        """``rows`` (``None`` = all) ordered by num_times, largest first."""
+        if rows is None:
+            return self.order
+        return rows[np.argsort(-self.num_times[rows], kind="stable")]
+
+    def take(self, df, rows):
+        # The full table is returned as is; otherwise only the selected rows
+        return df if rows is None else df.iloc[rows]
+
+
+class ViewCache:
+    """Row positions keyed by selection, the least recently used evicted first.
+
+    Shared across sessions, so callers must not modify the arrays.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._views)
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._views:
+                self._views.move_to_end(key)
+                self.hits += 1
+                return self._views[key]
+        # built outside the lock; two sessions asking at once both build it
+        view = build()
+        with self._lock:
+            self.misses += 1
+            self._views[key] = view
+            self._views.move_to_end(key)
+            while len(self._views) > self.maxsize:
+                self._views.popitem(last=False)
+        return view
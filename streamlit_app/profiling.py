@@ -0,0 +1,287 @@
+"""Opt-in per-rerun instrumentation of the dashboard.
+
+Enabled with ``TRAFFY_PROFILE=1`` in the environment (every session) or
+``?profile=1`` in the URL (one session). Each rerun then records:
+
+* the wall time of every named ``section`` (loading, filtering, binning,
+  rollups, figure building, ...);
+* the JSON size and serialization time of what is sent to
+  ``st.pydeck_chart`` / ``st.plotly_chart`` (through ``pydeck_chart`` and
+  ``plotly_chart``, which serialize the figure once more to measure it);
+* hits and misses of the ``st.cache_data`` / ``st.cache_resource`` functions
+  decorated with ``counted``: the function body only runs on a miss.
+
+``finish`` shows the numbers in a sidebar panel, appends one JSON line per
+rerun to ``profile.jsonl`` and rewrites ``profile.prom``, the process totals
+in the Prometheus text format (for node_exporter's textfile collector), both
+in ``TRAFFY_PROFILE_DIR`` (default: the working directory). When profiling
+is off the helpers only cost an attribute lookup.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+ENV_VAR = "TRAFFY_PROFILE"
+QUERY_PARAM = "profile"
+LOG_FILE = "profile.jsonl"
+PROM_FILE = "profile.prom"
+
+# The rerun being profiled in this script thread, None when profiling is off
+_local = threading.local()
+
+# Totals over every session of this server process, for the Prometheus file
+_totals_lock = threading.Lock()
+_totals = {"reruns": 0, "sections": {}, "payloads": {}, "cache": {}}
+
+
+def _truthy(value):
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def enabled():
+    if _truthy(os.environ.get(ENV_VAR, "")):
+        return True
+    try:
+        return _truthy(st.query_params.get(QUERY_PARAM, ""))
+    except Exception:  # outside of a running app
+        return False
+
+
+class Profiler:
+    def __init__(self):
+        self.started = time.time()
+        self.sections = {}  # name -> seconds (summed if a section repeats)
+        self.payloads = {}  # chart name -> {"bytes", "serialize_seconds"}
+        self.cache = {}  # function name -> {"hits", "misses"}
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] = self.sections.get(name, 0.0) + time.perf_counter() - start
+
+    def payload(self, name, n_bytes, seconds):
+        self.payloads[name] = {"bytes": n_bytes, "serialize_seconds": seconds}
+
+    def _cache_counts(self, name):
+        return self.cache.setdefault(name, {"hits": 0, "misses": 0})
+
+    def record(self):
+        return {
+            "time": self.started,
+            "total_seconds": time.time() - self.started,
+            "sections": self.sections,
+            "payloads": self.payloads,
+            "cache": self.cache,
+        }
+
+
+def start():
+    """Start profiling this rerun if enabled; returns the profiler or None."""
+    _local.profiler = Profiler() if enabled() else None
+    return _local.profiler
+
+
+def current():
+    return getattr(_local, "profiler", None)
+
+
+@contextmanager
+def section(name):
+    profiler = current()
+    if profiler is None:
+        yield
+        return
+    with profiler.section(name):
+        yield
+
+
+def counted(cache_decorator, **cache_kwargs):
+    """``cache_decorator`` (``st.cache_data``, ...) that also counts hits and misses.
+
+    The cached body runs only on a miss, so misses are counted inside it and
+    hits are the calls that didn't get there.
+    """
+
+    def decorator(func):
+        name = func.__name__
+
+        # wraps keeps the name and source Streamlit derives the cache key from
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            profiler = current()
+            if profiler is not None:
+                profiler._cache_counts(name)["misses"] += 1
+            return func(*args, **kwargs)
+
+        cached = cache_decorator(**cache_kwargs)(body)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            profiler = current()
+            if profiler is None:
+                return cached(*args, **kwargs)
+            counts = profiler._cache_counts(name)
+            misses = counts["misses"]
+            with profiler.section(name):
+                result = cached(*args, **kwargs)
+            if counts["misses"] == misses:
+                counts["hits"] += 1
+            return result
+
+        call.clear = cached.clear
+        return call
+
+    return decorator
+
+
+# ------------------------- CHARTS -----------------------------
+
+
+def _measure(name, to_json):
+    profiler = current()
+    if profiler is None:
+        return
+    start = time.perf_counter()
+    n_bytes = len(to_json().encode("utf-8"))
+    profiler.payload(name, n_bytes, time.perf_counter() - start)
+
+
+def pydeck_chart(deck, name="pydeck", **kwargs):
+    _measure(name, deck.to_json)
+    with section(name):
+        return st.pydeck_chart(deck, **kwargs)
+
+
+def plotly_chart(fig, name="plotly", **kwargs):
+    _measure(name, fig.to_json)
+    with section(name):
+        return st.plotly_chart(fig, **kwargs)
+
+
+# ------------------------- OUTPUT -----------------------------
+
+
+def _add_totals(record):
+    with _totals_lock:
+        _totals["reruns"] += 1
+        for name, seconds in record["sections"].items():
+            total = _totals["sections"].setdefault(name, {"seconds": 0.0, "count": 0})
+            total["seconds"] += seconds
+            total["count"] += 1
+        for name, payload in record["payloads"].items():
+            total = _totals["payloads"].setdefault(name, {"bytes": 0, "count": 0})
+            total["bytes"] += payload["bytes"]
+            total["count"] += 1
+        for name, counts in record["cache"].items():
+            total = _totals["cache"].setdefault(name, {"hits": 0, "misses": 0})
+            total["hits"] += counts["hits"]
+            total["misses"] += counts["misses"]
+        return json.loads(json.dumps(_totals))
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(totals):
+    lines = [
+        "# HELP traffy_reruns_total Profiled dashboard reruns.",
+        "# TYPE traffy_reruns_total counter",
+        f"traffy_reruns_total {totals['reruns']}",
+        "# HELP traffy_section_seconds Time spent in each dashboard section.",
+        "# TYPE traffy_section_seconds summary",
+    ]
+    for name, total in sorted(totals["sections"].items()):
+        lines.append(f'traffy_section_seconds_sum{{section="{_label(name)}"}} {total["seconds"]:.6f}')
+        lines.append(f'traffy_section_seconds_count{{section="{_label(name)}"}} {total["count"]}')
+    lines += [
+        "# HELP traffy_payload_bytes JSON sent to the browser per chart.",
+        "# TYPE traffy_payload_bytes summary",
+    ]
+    for name, total in sorted(totals["payloads"].items()):
+        lines.append(f'traffy_payload_bytes_sum{{chart="{_label(name)}"}} {total["bytes"]}')
+        lines.append(f'traffy_payload_bytes_count{{chart="{_label(name)}"}} {total["count"]}')
+    lines += [
+        "# HELP traffy_cache_requests_total Calls of cached functions by result.",
+        "# TYPE traffy_cache_requests_total counter",
+    ]
+    for name, counts in sorted(totals["cache"].items()):
+        for result, key in (("hit", "hits"), ("miss", "misses")):
+            lines.append(
+                f'traffy_cache_requests_total{{function="{_label(name)}",result="{result}"}} {counts[key]}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def write(record, out_dir=None):
+    """Append ``record`` to the JSONL log and rewrite the Prometheus totals."""
+    out_dir = out_dir or os.environ.get("TRAFFY_PROFILE_DIR", ".")
+    os.makedirs(out_dir, exist_ok=True)
+    totals = _add_totals(record)
+    with open(os.path.join(out_dir, LOG_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    # replaced atomically so the collector never reads half a file
+    prom_path = os.path.join(out_dir, PROM_FILE)
+    tmp_path = f"{prom_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(totals))
+    os.replace(tmp_path, prom_path)
+
+
+def render(record):
+    with st.sidebar.expander("⏱️ Profiling", expanded=True):
+        st.write(f"**Rerun:** {record['total_seconds'] * 1000:,.1f} ms")
+        sections = sorted(record["sections"].items(), key=lambda item: -item[1])
+        st.dataframe(
+            {"section": [name for name, _ in sections], "ms": [round(s * 1000, 2) for _, s in sections]},
+            hide_index=True,
+        )
+        if record["payloads"]:
+            st.dataframe(
+                {
+                    "chart": list(record["payloads"]),
+                    "KB": [round(p["bytes"] / 1024, 1) for p in record["payloads"].values()],
+                    "json ms": [round(p["serialize_seconds"] * 1000, 2) for p in record["payloads"].values()],
+                },
+                hide_index=True,
+            )
+        if record["cache"]:
+            st.dataframe(
+                {
+                    "function": list(record["cache"]),
+                    "hits": [c["hits"] for c in record["cache"].values()],
+                    "misses": [c["misses"] for c in record["cache"].values()],
+                },
+                hide_index=True,
+            )
+
+
+def finish():
+    """End the profiled rerun: files and sidebar panel. No-op when profiling is off.
+
+    Called from a ``finally`` around the page, so a rerun cut short by an
+    exception, ``st.stop()`` or a newer rerun is written too, with the
+    exception's name under ``"interrupted"`` and no panel.
+    """
+    profiler = current()
+    if profiler is None:
+        return None
+    _local.profiler = None
+    record = profiler.record()
+    interrupted = sys.exc_info()[1]
+    if interrupted is not None:
+        record["interrupted"] = type(interrupted).__name__
+    write(record)
+    if interrupted is None:
+        render(record)
+    return record
@@ -0,0 +1,105 @@
+"""Materialized num_times rollup by zone x status x organization.
+
+The graphs page only ever needs num_times summed over some of these
+dimensions, so the sums are computed once per dataset version into two small
+dense arrays and every chart or callout becomes a slice of them:
+
+* ``by_zone_status[zone, status]`` - one entry per cluster, used whenever no
+  organization is involved, so clusters with several agencies count once.
+* ``by_org[zone, status, organization]`` - every cluster counted for each
+  agency it lists, an agency listed twice counting twice (the same as the old
+  split/explode/groupby), for the per-organization totals.
+* ``by_org_once`` - the same with repeated agencies counted once, for zone
+  totals restricted to an organization, which select clusters like the
+  organization filter does. It is ``by_org`` itself when no cluster repeats
+  an agency.
+"""
+
+import numpy as np
+import pandas as pd
+
+from filters import split_organizations
+
+
+class Rollup:
+    def __init__(self, df):
+        zone_codes, self.zones = pd.factorize(df["zone"], sort=True)
+        status_codes, self.statuses = pd.factorize(df["status"], sort=True)
+        combo_codes, combos = pd.factorize(df["organization"], sort=True)
+        self.zones = list(self.zones)
+        self.statuses = list(self.statuses)
+
+        n_zones, n_statuses, n_combos = len(self.zones), len(self.statuses), len(combos)
+        num_times = df["num_times"].to_numpy(dtype=np.float64)
+        valid = (zone_codes >= 0) & (status_codes >= 0)
+
+        cell = zone_codes * n_statuses + status_codes
+        self.by_zone_status = (
+            np.bincount(cell[valid], weights=num_times[valid], minlength=n_zones * n_statuses)
+            .reshape(n_zones, n_statuses)
+            .astype(np.int64)
+        )
+
+        # zone x status totals per distinct organization string ...
+        valid &= combo_codes >= 0
+        by_combo = np.bincount(
+            cell[valid] * n_combos + combo_codes[valid],
+            weights=num_times[valid],
+            minlength=n_zones * n_statuses * n_combos,
+        ).reshape(n_zones * n_statuses, n_combos)
+
+        # ... then added to every agency that string lists
+        agency_index = {}
+        pairs, pairs_once = [], []
+        for combo, orgs in enumerate(combos):
+            listed = [org.strip() for org in orgs.split(",")]
+            pairs.extend((combo, agency_index.setdefault(org, len(agency_index))) for org in listed)
+            pairs_once.extend((combo, agency_index[org]) for org in split_organizations(orgs))
+        self.organizations = list(agency_index)
+
+        self.by_org = self._add_pairs(by_combo, pairs, n_zones, n_statuses)
+        if len(pairs_once) == len(pairs):
+            self.by_org_once = self.by_org
+        else:
+            self.by_org_once = self._add_pairs(by_combo, pairs_once, n_zones, n_statuses)
+
+        self._zone_pos = {zone: i for i, zone in enumerate(self.zones)}
+        self._status_pos = {status: i for i, status in enumerate(self.statuses)}
+        self._org_pos = agency_index
+
+    def _add_pairs(self, by_combo, pairs, n_zones, n_statuses):
+        pair_combo, pair_org = np.array(pairs, dtype=np.intp).reshape(-1, 2).T
+        by_org = np.zeros((len(self.organizations), n_zones * n_statuses))
+        np.add.at(by_org, pair_org, by_combo.T[pair_combo])
+        return by_org.T.reshape(n_zones, n_statuses, -1).astype(np.int64)
+
+    def _pick(self, positions, key):
+        # None keeps the whole axis, an unknown key selects nothing
+        if key is None:
+            return slice(None)
+        return [positions[key]] if key in positions else []
+
+    def zone_totals(self, organization=None, status=None):
+        s = self._pick(self._status_pos, status)
+        if organization is None:
+            totals = self.by_zone_status[:, s].sum(axis=1)
+        else:
+            o = self._pick(self._org_pos, organization)
+            totals = self.by_org_once[:, s][:, :, o].sum(axis=(1, 2))
+        return self._ranked(totals, self.zones, "zone")
+
+    def organization_totals(self, zone=None, status=None):
+        z = self._pick(self._zone_pos, zone)
+        s = self._pick(self._status_pos, status)
+        totals = self.by_org[z][:, s].sum(axis=(0, 1))
+        return self._ranked(totals, self.organizations, "organization")
+
+    def _ranked(self, totals, labels, name):
+        series = pd.Series(totals, index=pd.Index(labels, name=name), name="num_times")
+        return series[series > 0].sort_values(ascending=False)
+
+    def top_zones(self, n, organization=None, status=None):
+        return self.zone_totals(organization, status).head(n)
+
+    def top_organizations(self, n, zone=None, status=None):
+        return self.organization_totals(zone, status).head(n)
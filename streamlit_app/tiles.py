@@ -0,0 +1,136 @@
+"""Zoom-aware level-of-detail aggregation for the pydeck map.
+
+Each cluster is placed once on a quadtree of Web Mercator tiles at the finest
+level used by the map (``MAX_LEVEL``). A coarser level is a right shift of the
+same integer coordinates, so binning for any zoom is a single ``np.unique``
+over the rows in view. Below ``POINT_ZOOM`` the map receives one row per bin
+instead of one row per cluster.
+"""
+
+import numpy as np
+import pandas as pd
+
+TILE_SIZE = 256  # pixels per map tile
+BIN_OFFSET = 3  # a bin is 1/8 of a map tile, i.e. 32 pixels on screen
+POINT_ZOOM = 15  # from this zoom on, individual clusters are drawn
+MAX_LEVEL = POINT_ZOOM + BIN_OFFSET
+
+# Assumed map size in pixels, with a margin so small pans stay populated
+VIEW_WIDTH = 1280
+VIEW_HEIGHT = 900
+VIEW_MARGIN = 1.5
+
+EARTH_CIRCUMFERENCE = 40075016.686  # meters
+
+
+def mercator(lat, long, level):
+    """Fractional tile coordinates of ``lat``/``long`` at quadtree ``level``."""
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511)
+    long = np.asarray(long, dtype=np.float64)
+    scale = 2.0**level
+    x = (long + 180.0) / 360.0 * scale
+    lat_rad = np.radians(lat)
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * scale
+    return x, y
+
+
+def meters_per_pixel(lat, zoom):
+    return EARTH_CIRCUMFERENCE * np.cos(np.radians(lat)) / (TILE_SIZE * 2.0**zoom)
+
+
+def bin_level(zoom):
+    return min(int(zoom) + BIN_OFFSET, MAX_LEVEL)
+
+
+def bin_radius(lat, zoom):
+    """Column radius in meters that keeps neighbouring bins from overlapping."""
+    return 0.4 * meters_per_pixel(lat, zoom) * TILE_SIZE / 2**BIN_OFFSET
+
+
+class TileIndex:
+    def __init__(self, df):
+        x, y = mercator(df["lat"].to_numpy(), df["long"].to_numpy(), MAX_LEVEL)
+        self.x = x.astype(np.int32)
+        self.y = y.astype(np.int32)
+        self.lat = df["lat"].to_numpy(dtype=np.float64)
+        self.long = df["long"].to_numpy(dtype=np.float64)
+        self.num_times = df["num_times"].to_numpy(dtype=np.int64)
+
+        zone = pd.Categorical(df["zone"])
+        status = pd.Categorical(df["status"])
+        self.zone_codes, self.zone_names = zone.codes, zone.categories
+        self.status_codes, self.status_names = status.codes, status.categories
+
+    def in_view(self, rows, lat, long, zoom):
+        """Subset of ``rows`` (``None`` = all) inside the map view around lat/long."""
+        cx, cy = mercator(lat, long, MAX_LEVEL)
+        # pixels at `zoom` -> tile units at MAX_LEVEL
+        scale = 2.0 ** (MAX_LEVEL - zoom) / TILE_SIZE * VIEW_MARGIN
+        half_w = VIEW_WIDTH / 2 * scale
+        half_h = VIEW_HEIGHT / 2 * scale
+
+        x = self.x if rows is None else self.x[rows]
+        y = self.y if rows is None else self.y[rows]
+        inside = (np.abs(x - cx) <= half_w) & (np.abs(y - cy) <= half_h)
+        if rows is None:
+            return np.flatnonzero(inside).astype(np.int32)
+        return rows[inside]
+
+    def _dominant(self, bins, n_bins, codes, names, weights):
+        # Category with the largest summed num_times in each bin
+        n_codes = max(len(names), 1)
+        valid = codes >= 0
+        totals = np.bincount(
+            bins[valid] * n_codes + codes[valid],
+            weights=weights[valid],
+            minlength=n_bins * n_codes,
+        ).reshape(n_bins, n_codes)
+        return np.asarray(names)[totals.argmax(axis=1)] if len(names) else None
+
+    def aggregate(self, rows, zoom):
+        """One row per quadtree bin at ``zoom`` with summed num_times.
+
+        The position is the num_times-weighted centroid of the clusters in the
+        bin, and zone/status are the ones contributing most of its num_times.
+        """
+        if rows is None:
+            rows = np.arange(len(self.x), dtype=np.int32)
+        shift = MAX_LEVEL - bin_level(zoom)
+        keys = (self.x[rows].astype(np.int64) >> shift) << 32 | (
+            self.y[rows].astype(np.int64) >> shift
+        )
+        _, bins = np.unique(keys, return_inverse=True)
+        bins = bins.ravel()
+        n_bins = int(bins.max()) + 1 if len(bins) else 0
+
+        weights = self.num_times[rows].astype(np.float64)
+        num_times = np.bincount(bins, weights=weights, minlength=n_bins)
+        # clusters with num_times == 0 still need a position
+        centroid_weights = np.where(weights > 0, weights, 1.0)
+        total_weights = np.bincount(bins, weights=centroid_weights, minlength=n_bins)
+
+        # Marker sizes relative to the largest bin in view
+        share = num_times / num_times.max() if n_bins and num_times.max() > 0 else num_times
+
+        return pd.DataFrame(
+            {
+                "lat": np.bincount(
+                    bins, weights=self.lat[rows] * centroid_weights, minlength=n_bins
+                )
+                / total_weights,
+                "long": np.bincount(
+                    bins, weights=self.long[rows] * centroid_weights, minlength=n_bins
+                )
+                / total_weights,
+                "num_times": num_times.astype(np.int64),
+                "cluster_count": np.bincount(bins, minlength=n_bins),
+                "zone": self._dominant(
+                    bins, n_bins, self.zone_codes[rows], self.zone_names, weights
+                ),
+                "status": self._dominant(
+                    bins, n_bins, self.status_codes[rows], self.status_names, weights
+                ),
+                "radius": 4 + 12 * np.sqrt(share),  # pixels
+                "elevation": 3000 * share,  # meters
+            }
+        )
@@ -0,0 +1,60 @@
+"""Zone of ad-hoc points from the raster ``pipeline.zones`` builds.
+
+The dashboard only reads ``zone_raster.npz``; building it needs the zone
+points and the pipeline (``python -m pipeline.zones``). ``ZoneLookup`` is the
+read side of ``pipeline.zones.ZoneRaster`` without its dependencies: a cell of
+the raster holds the zone code of the nearest zone point, and ambiguous cells
+and points outside the box fall back to the exact nearest-point query.
+"""
+
+import numpy as np
+
+AMBIGUOUS = 255  # the raster's code for cells that need the exact query
+
+
+class ZoneLookup:
+    def __init__(self, raster, points, point_codes, zones, bbox, cell_size):
+        self.raster = raster
+        self.points = points
+        self.point_codes = point_codes
+        self.zones = np.asarray(zones, dtype=object)
+        self.bbox = tuple(bbox)
+        self.cell_size = cell_size
+        self._tree = None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["raster"],
+                data["points"],
+                data["point_codes"],
+                data["zones"].tolist(),
+                tuple(data["bbox"].tolist()),
+                float(data["cell_size"]),
+            )
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+
+            self._tree = cKDTree(self.points)
+        return self._tree
+
+    def predict(self, lat, lon):
+        """Zone names of the locations, like ``knn.predict``."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        south, west, _, _ = self.bbox
+        row = np.floor((lat - south) / self.cell_size)
+        col = np.floor((lon - west) / self.cell_size)
+        inside = (row >= 0) & (row < self.raster.shape[0]) & (col >= 0) & (col < self.raster.shape[1])
+
+        codes = np.full(lat.shape, AMBIGUOUS, dtype=np.uint8)
+        codes[inside] = self.raster[row[inside].astype(np.intp), col[inside].astype(np.intp)]
+        exact = codes == AMBIGUOUS
+        if exact.any():
+            _, nearest = self.tree.query(np.column_stack([lat[exact], lon[exact]]), k=1)
+            codes[exact] = self.point_codes[nearest]
+        return self.zones[codes]
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# pipeline is a package at the repository root; the dashboard modules import
+# each other as top-level modules from streamlit_app/
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "streamlit_app"))
@@ -0,0 +1,110 @@
+import http.client
+import json
+import threading
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import api
+import data_store
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("data")
+    pd.DataFrame(
+        {
+            "cluster_id": ["0_0", "0_1", "1_0", "noise_1", "2_0"],
+            "num_times": [3, 7, 1, 7, 2],
+            "status": ["เสร็จสิ้น", "รอรับเรื่อง", "เสร็จสิ้น", "กำลังดำเนินการ", "เสร็จสิ้น"],
+            "cluster_desc": ["ถนนชำรุด", "ไฟดับ", "น้ำท่วม", 'มี "ขยะ"', "ทางเท้า"],
+            "lat": [13.75, 13.76, np.nan, 13.80, 13.74],
+            "long": [100.50, 100.51, 100.52, 100.60, 100.49],
+            "organization": ["เขตบางกะปิ", "การไฟฟ้านครหลวง,เขตบางกะปิ", "สำนักการระบายน้ำ กทม.", "เขตบางกะปิ", "เขตบางกะปิ"],
+            "zone": ["โซนถนน/คมนาคม", "โซนที่พักอาศัย", "โซนแหล่งน้ำ/คลอง", "โซนถนน/คมนาคม", "โซนถนน/คมนาคม"],
+        }
+    ).to_csv(data_dir / "cluster_data.csv", index=False)
+    pd.DataFrame({"cluster": ["0_0", "0_0", "0_1"], "comment": ["a", "b", "c"]}).to_csv(
+        data_dir / "example_comment.csv", index=False
+    )
+    data_store.ensure_store(str(data_dir))
+    server = api.make_server(str(data_dir), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def get(server, path, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    connection.request("GET", path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    payload = json.loads(body) if response.getheader("Content-Type", "").startswith("application/json") else body
+    return response.status, dict(response.getheaders()), payload
+
+
+def test_clusters_ranked_and_paginated(server):
+    status, headers, page = get(server, "/clusters?limit=2")
+    assert status == 200 and headers["X-Total-Count"] == "5"
+    # ties keep table order
+    assert [item["cluster_id"] for item in page["items"]] == ["0_1", "noise_1"]
+    assert page["next"] == "/clusters?limit=2&offset=2"
+    _, _, page = get(server, page["next"])
+    assert [item["cluster_id"] for item in page["items"]] == ["0_0", "2_0"]
+    assert page["items"][0]["cluster_desc"] == "ถนนชำรุด"
+
+
+def test_filters_and_nulls(server):
+    _, _, page = get(server, "/clusters?" + urlencode({"organization": "เขตบางกะปิ", "min_num_times": 3}))
+    assert [item["cluster_id"] for item in page["items"]] == ["0_1", "noise_1", "0_0"]
+    _, _, cluster = get(server, "/clusters/1_0")
+    assert cluster["lat"] is None and cluster["comment_count"] == 0
+    assert get(server, "/clusters/noise_1")[2]["cluster_desc"] == 'มี "ขยะ"'
+    assert get(server, "/clusters/0_0")[2]["comment_count"] == 2
+    _, _, top = get(server, "/top/organizations?n=1")
+    assert top == [{"organization": "เขตบางกะปิ", "num_times": 19}]
+
+
+@pytest.mark.parametrize(
+    "path, status",
+    [
+        ("/clusters?limit=501", 400),
+        ("/clusters?limit=0", 400),
+        ("/clusters?offset=x", 400),
+        ("/clusters?bbox=1,2,3", 400),
+        ("/clusters/9_9", 404),
+        ("/top/districts", 404),
+        ("/nothing/here/at/all", 404),
+    ],
+)
+def test_errors(server, path, status):
+    code, _, payload = get(server, path)
+    assert code == status and "error" in payload
+
+
+def test_etag_names_the_url(server):
+    _, headers, _ = get(server, "/top/zones")
+    etag = headers["ETag"]
+    assert get(server, "/top/zones", {"If-None-Match": etag})[0] == 304
+    # another URL, an invalid one included, isn't answered from that tag
+    assert get(server, "/top/organizations", {"If-None-Match": etag})[0] == 200
+    assert get(server, "/top/districts", {"If-None-Match": etag})[0] == 404
+    assert get(server, "/top/districts", {"If-None-Match": "*"})[0] == 404
+    assert get(server, "/filters", {"If-None-Match": "*"})[0] == 304
+    _, arrow_headers, _ = get(server, "/top/zones", {"Accept": api.ARROW_STREAM})
+    assert arrow_headers["ETag"] != etag
+
+
+def test_unexpected_error_is_a_json_500(server, monkeypatch):
+    def broken(dataset):
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(server.RequestHandlerClass.api, "filters", broken)
+    status, _, payload = get(server, "/filters")
+    assert status == 500 and payload == {"error": "internal error"}
+    # and the server keeps answering
+    assert get(server, "/version")[0] == 200
@@ -0,0 +1,78 @@
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+from pipeline.assign import ClusterAssigner
+from pipeline.spatial_cluster import EPS, MIN_SAMPLES, dbscan
+
+DIM = 8
+
+
+def synthetic_reports(seed):
+    rng = np.random.default_rng(seed)
+    spots = np.c_[rng.uniform(13.70, 13.71, 10), rng.uniform(100.50, 100.51, 10)]
+    coords = np.r_[
+        spots[rng.integers(0, 10, 300)] + rng.normal(0, 0.0001, (300, 2)),
+        np.c_[rng.uniform(13.70, 13.71, 100), rng.uniform(100.50, 100.51, 100)],
+    ]
+    labels = dbscan(coords)
+    # two text sub-clusters per location cluster, far apart in embedding space
+    text = rng.integers(0, 2, len(coords))
+    embeddings = np.eye(DIM, dtype=np.float32)[text] + rng.normal(0, 0.05, (len(coords), DIM))
+    noise = iter(range(len(coords)))
+    cluster_ids = [f"{l}_{t}" if l >= 0 else f"noise_{next(noise)}" for l, t in zip(labels, text)]
+    return coords, labels, text, embeddings, cluster_ids
+
+
+def refit(coords):
+    model = DBSCAN(eps=EPS, min_samples=MIN_SAMPLES, metric="haversine", algorithm="ball_tree")
+    model.fit(np.radians(coords))
+    core = np.zeros(len(coords), dtype=bool)
+    core[model.core_sample_indices_] = True
+    return model.labels_, core
+
+
+def test_spatial_clusters_match_refit():
+    coords, labels, _, embeddings, cluster_ids = synthetic_reports(0)
+    assigner = ClusterAssigner.fit(coords, cluster_ids, embeddings)
+    rng = np.random.default_rng(1)
+    new = np.r_[
+        coords[rng.integers(0, len(coords), 150)] + rng.normal(0, 0.0001, (150, 2)),
+        np.c_[rng.uniform(13.70, 13.71, 50), rng.uniform(100.50, 100.51, 50)],
+    ]
+    _, core = refit(coords)
+    compared = set()
+    for point in new:
+        new_labels, new_core = refit(np.r_[coords, [point]])
+        # only where the new report leaves the old labels and core points
+        # alone and isn't a core point itself: the assigner keeps the fitted
+        # core points, it doesn't grow or merge clusters
+        if not (np.array_equal(new_labels[:-1], labels) and np.array_equal(new_core[:-1], core)) or new_core[-1]:
+            continue
+        assert assigner.spatial_clusters(point)[0] == new_labels[-1]
+        compared.add(int(new_labels[-1] >= 0))
+    assert compared == {0, 1}
+
+
+def test_assign_text_cluster():
+    coords, labels, text, embeddings, cluster_ids = synthetic_reports(0)
+    assigner = ClusterAssigner.fit(coords, cluster_ids, embeddings)
+    clustered = np.flatnonzero(labels >= 0)[:20]
+    basis = np.eye(DIM, dtype=np.float32)
+    for i in clustered:
+        assert assigner.assign(*coords[i], basis[text[i]]) == cluster_ids[i]
+    # an unrelated comment at the same place doesn't join either sub-cluster
+    first_noise = assigner.next_noise
+    assert assigner.assign(*coords[clustered[0]], basis[DIM - 1]) == f"noise_{first_noise}"
+
+
+def test_all_noise(tmp_path):
+    # 30 reports 100 m apart: DBSCAN finds no core point
+    coords = np.c_[13.70 + 0.001 * np.arange(30), np.full(30, 100.50)]
+    assert (dbscan(coords) == -1).all()
+    cluster_ids = [f"noise_{i}" for i in range(1, 31)]
+    assigner = ClusterAssigner.fit(coords, cluster_ids, np.ones((30, DIM)))
+    assert assigner.assign_batch(coords[:2], np.ones((2, DIM))) == ["noise_31", "noise_32"]
+
+    assigner.save(str(tmp_path / "assigner.npz"))
+    loaded = ClusterAssigner.load(str(tmp_path / "assigner.npz"))
+    assert loaded.assign(13.75, 100.55, np.ones(DIM)) == "noise_33"
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+
+from pipeline.embedding_cache import KEY_SIZE, EmbeddingCache
+
+
+class HashModel:
+    # a deterministic stand-in for the SentenceTransformer, counting what it encodes
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.encoded.extend(texts)
+        return np.array(
+            [np.random.default_rng(list(text.encode()) or [0]).normal(size=self.dim) for text in texts],
+            dtype=np.float32,
+        )
+
+
+TEXTS = ["ไฟดับ", "ถนนชำรุด", "ไฟดับ", "ขยะเยอะ", "", "ถนนชำรุด ", "ถนนชำรุด"]
+
+
+def test_cache_returns_what_the_model_returns(tmp_path):
+    model = HashModel()
+    expected = HashModel().encode(TEXTS)
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    np.testing.assert_array_equal(cache.encode(model, TEXTS), expected)
+    # every distinct text is encoded once, the trailing space is a different text
+    assert sorted(model.encoded) == sorted(set(TEXTS))
+    assert cache.stats()["misses"] == 5 and cache.stats()["hits"] == 2
+
+
+def test_hits_survive_reopening(tmp_path):
+    EmbeddingCache(str(tmp_path), "model-a").encode(HashModel(), TEXTS)
+
+    model = HashModel()
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    embeddings = cache.encode(model, TEXTS + ["น้ำท่วม"])
+    assert model.encoded == ["น้ำท่วม"]
+    np.testing.assert_array_equal(embeddings, HashModel().encode(TEXTS + ["น้ำท่วม"]))
+    assert cache.stats()["hit_rate"] == len(TEXTS) / (len(TEXTS) + 1)
+    assert len(cache) == 6
+
+
+def test_another_model_misses(tmp_path):
+    EmbeddingCache(str(tmp_path / "a"), "model-a").encode(HashModel(), TEXTS)
+    model = HashModel()
+    EmbeddingCache(str(tmp_path / "a"), "model-b").encode(model, TEXTS)
+    assert sorted(model.encoded) == sorted(set(TEXTS))
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    cache.encode(HashModel(), TEXTS)
+    n = len(cache)
+    # an append that died after part of its vectors, before its keys
+    with open(os.path.join(str(tmp_path), "vectors.f32"), "ab") as f:
+        f.write(np.ones(cache.dim + 3, dtype=np.float32).tobytes())
+    with open(os.path.join(str(tmp_path), "keys.bin"), "ab") as f:
+        f.write(b"\1" * (KEY_SIZE // 2))
+
+    model = HashModel()
+    reopened = EmbeddingCache(str(tmp_path), "model-a")
+    assert len(reopened) == n
+    assert os.path.getsize(os.path.join(str(tmp_path), "keys.bin")) == n * KEY_SIZE
+    assert os.path.getsize(os.path.join(str(tmp_path), "vectors.f32")) == n * cache.dim * 4
+    np.testing.assert_array_equal(reopened.encode(model, TEXTS + ["น้ำท่วม"]), HashModel().encode(TEXTS + ["น้ำท่วม"]))
+    assert model.encoded == ["น้ำท่วม"]
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import featurize
+from pipeline.embedding_cache import EmbeddingCache
+from pipeline.featurize import Features, extract_named_entities
+from pipeline.text_clean import clean_sentences
+
+PLACES = {"สีลม", "บางรัก", "ลาดพร้าว"}
+WORDS = ["ไฟ", "ดับ", "ถนน", "หลุม", "ขยะ", "ซอย", "หน้า", "บ้าน"] + sorted(PLACES)
+TYPES = ["{ถนน}", "{ไฟฟ้า,'ความสะอาด'}", "{}", None, "{ น้ำท่วม ,ถนน}"]
+
+
+class HashModel:
+    # a deterministic stand-in for the SentenceTransformer
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        return np.array(
+            [np.random.default_rng(list(str(text).encode()) or [0]).normal(size=8) for text in texts],
+            dtype=np.float32,
+        )
+
+
+class PlaceNER:
+    # a stand-in for thainer, tagging the known place names
+    def tag(self, text):
+        return [(word, "B-LOCATION" if word in PLACES else "O") for word in text.split(" ")]
+
+
+@pytest.fixture
+def place_ner(monkeypatch):
+    # the pool's workers are forked, so they start with the patched module
+    def init_ner():
+        featurize._ner = PlaceNER()
+
+    monkeypatch.setattr(featurize, "_init_ner", init_ner)
+    monkeypatch.setattr(featurize, "_ner", None)
+
+
+def synthetic_reports(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "comment": ["".join(rng.choice(WORDS, rng.integers(1, 6))) + " ครับ" for _ in range(n_rows)],
+            "type": [TYPES[i] for i in rng.integers(0, len(TYPES), n_rows)],
+            "cluster": rng.integers(0, 12, n_rows),
+        },
+        index=rng.permutation(np.arange(10, 10 + 3 * n_rows, 3)),
+    )
+
+
+def notebook_features(target_df, model, ner):
+    # the loop body of traffy-cluster.ipynb for one spatial cluster
+    texts = target_df["comment"].values.tolist()
+    type_cleaned = target_df["type"].map(
+        lambda e: " ".join([s.strip().strip("'") for s in str(e)[1:-1].split(',')] if pd.notnull(e) else [])
+    ).values.tolist()
+    embeddings = model.encode(texts, show_progress_bar=False)
+    clean_texts = clean_sentences(texts, True)
+    type_embedding = model.encode(type_cleaned, show_progress_bar=False)
+    ner_features = [extract_named_entities(text, ner) for text in clean_texts]
+    return embeddings, type_embedding, ner_features
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_features_match_the_per_cluster_loop(tmp_path, place_ner, use_cache):
+    df = synthetic_reports(300)
+    cache = EmbeddingCache(str(tmp_path / "cache"), "hash") if use_cache else None
+    stats = featurize.featurize(
+        df, HashModel(), str(tmp_path / "features"), batch_size=64, ner_chunk_size=16, n_jobs=2, cache=cache
+    )
+    assert stats["comments"] == len(df) and stats["types"] == 4  # "{}" and None both clean to ""
+
+    features = Features.load(str(tmp_path / "features"))
+    for _, target_df in df.groupby("cluster"):
+        embeddings, type_embeddings, ner = features.take(target_df.index)
+        expected_embeddings, expected_types, expected_ner = notebook_features(target_df, HashModel(), PlaceNER())
+        np.testing.assert_array_equal(embeddings, expected_embeddings)
+        np.testing.assert_array_equal(type_embeddings, expected_types)
+        assert ner == expected_ner
+    assert any(set(text.split(" ")) <= PLACES for text in features.ner)  # some rows have entities
+
+
+def test_unfinished_or_missing_rows_fail(tmp_path, place_ner):
+    df = synthetic_reports(20)
+    out_dir = str(tmp_path / "features")
+    featurize.featurize(df, HashModel(), out_dir, n_jobs=1)
+    features = Features.load(out_dir)
+    with pytest.raises(KeyError):
+        features.take([df.index.max() + 1])
+
+    (tmp_path / "features" / "meta.json").unlink()
+    with pytest.raises(FileNotFoundError):
+        Features.load(out_dir)
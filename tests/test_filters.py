@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filters import FilterIndex, ViewCache, split_organizations
+from rollup import Rollup
+
+ZONES = ["โซนถนน/คมนาคม", "โซนที่พักอาศัย", "โซนตลาด/พาณิชย์", "โซนแหล่งน้ำ/คลอง"]
+STATUSES = ["เสร็จสิ้น", "กำลังดำเนินการ", "รอรับเรื่อง"]
+AGENCIES = ["สำนักการโยธา กทม.", "การไฟฟ้านครหลวง", "เขตบางกะปิ", "สำนักการระบายน้ำ กทม."]
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(0)
+    n = 3000
+    organizations = [
+        ",".join(rng.choice(AGENCIES, rng.integers(1, 4), replace=False)) for _ in range(n)
+    ]
+    # a few with stray spaces and a repeated agency, as in the export
+    organizations[:20] = [" สำนักการโยธา กทม. , เขตบางกะปิ,สำนักการโยธา กทม."] * 20
+    return pd.DataFrame(
+        {
+            "cluster_id": [f"{i}_0" for i in range(n)],
+            "num_times": rng.integers(1, 30, n),
+            "status": rng.choice(STATUSES, n),
+            "organization": organizations,
+            "zone": rng.choice(ZONES, n),
+        }
+    )
+
+
+def old_filter(df, zone="-", org="-", status="-", min_num_times=None):
+    # the dashboard's filters before the index (df.copy() and column scans)
+    filtered = df.copy()
+    if zone != "-":
+        filtered = filtered[filtered["zone"] == zone]
+    if org != "-":
+        filtered = filtered[filtered["organization"].str.contains(org, regex=False)]
+    if status != "-":
+        filtered = filtered[filtered["status"] == status]
+    if min_num_times is not None:
+        filtered = filtered[filtered["num_times"] >= min_num_times]
+    return filtered
+
+
+@pytest.mark.parametrize("zone", ["-", ZONES[0], "ไม่มีโซนนี้"])
+@pytest.mark.parametrize("org", ["-", AGENCIES[0], AGENCIES[2]])
+@pytest.mark.parametrize("status", ["-", STATUSES[1]])
+@pytest.mark.parametrize("min_num_times", [None, 10])
+def test_select_matches_old_filters(df, zone, org, status, min_num_times):
+    index = FilterIndex(df)
+    rows = index.select(
+        zone=None if zone == "-" else zone,
+        organization=None if org == "-" else org,
+        status=None if status == "-" else status,
+        min_num_times=min_num_times,
+    )
+    pd.testing.assert_frame_equal(index.take(df, rows), old_filter(df, zone, org, status, min_num_times))
+
+
+def test_organizations_match_exactly():
+    # str.contains matched an agency inside a longer name; the index doesn't
+    df = pd.DataFrame(
+        {
+            "num_times": [1, 2],
+            "status": ["เสร็จสิ้น"] * 2,
+            "organization": ["เขตบางกะปิ", "สำนักงานเขตบางกะปิ"],
+            "zone": ["โซนที่พักอาศัย"] * 2,
+        }
+    )
+    np.testing.assert_array_equal(FilterIndex(df).select(organization="เขตบางกะปิ"), [0])
+
+
+def old_zone_totals(df):
+    return df.groupby("zone")["num_times"].sum().sort_values(ascending=False)
+
+
+def old_organization_totals(df):
+    exploded = df.assign(organization=df["organization"].str.split(",")).explode("organization")
+    exploded["organization"] = exploded["organization"].str.strip()
+    return exploded.groupby("organization")["num_times"].sum().sort_values(ascending=False)
+
+
+def assert_same_totals(actual, expected):
+    # same totals; ties may come in another order
+    pd.testing.assert_series_equal(
+        actual.sort_index(), expected.sort_index(), check_names=False, check_dtype=False, check_index_type=False
+    )
+    np.testing.assert_array_equal(actual.to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize("status", [None, STATUSES[0]])
+def test_rollup_matches_groupby(df, status):
+    rollup = Rollup(df)
+    selected = df if status is None else df[df["status"] == status]
+    assert_same_totals(rollup.zone_totals(status=status), old_zone_totals(selected))
+    assert_same_totals(rollup.organization_totals(status=status), old_organization_totals(selected))
+    for zone in ZONES:
+        assert_same_totals(
+            rollup.organization_totals(zone=zone, status=status),
+            old_organization_totals(selected[selected["zone"] == zone]),
+        )
+    for org in AGENCIES:
+        has_org = selected["organization"].map(lambda orgs: org in split_organizations(orgs))
+        assert_same_totals(rollup.zone_totals(organization=org, status=status), old_zone_totals(selected[has_org]))
+    assert rollup.top_zones(2).index.tolist() == old_zone_totals(df).head(2).index.tolist()
+
+
+def test_rollup_counts_repeated_agencies_like_explode():
+    df = pd.DataFrame(
+        {
+            "num_times": [3, 5],
+            "status": ["เสร็จสิ้น"] * 2,
+            "organization": ["เขตบางกะปิ,เขตบางกะปิ", "การไฟฟ้านครหลวง"],
+            "zone": ["โซนที่พักอาศัย", "โซนตลาด/พาณิชย์"],
+        }
+    )
+    rollup = Rollup(df)
+    assert rollup.organization_totals().to_dict() == {"เขตบางกะปิ": 6, "การไฟฟ้านครหลวง": 5}
+    # filtering on the agency still selects the cluster once
+    assert rollup.zone_totals(organization="เขตบางกะปิ").to_dict() == {"โซนที่พักอาศัย": 3}
+
+
+def test_rollup_unknown_key(df):
+    assert Rollup(df).zone_totals(organization="ไม่มีหน่วยงานนี้").empty
+
+
+def test_ranked(df):
+    index = FilterIndex(df)
+    rows = index.select(zone=ZONES[1])
+    expected = old_filter(df, ZONES[1]).sort_values("num_times", ascending=False, kind="stable").index
+    np.testing.assert_array_equal(index.ranked(rows), expected)
+    np.testing.assert_array_equal(
+        index.ranked(None), df.sort_values("num_times", ascending=False, kind="stable").index
+    )
+
+
+def test_view_cache_evicts_least_recently_used():
+    cache = ViewCache(maxsize=2)
+    builds = []
+
+    def build(key):
+        return lambda: builds.append(key) or np.arange(key)
+
+    cache.get(1, build(1))
+    cache.get(2, build(2))
+    cache.get(1, build(1))  # 1 is now the most recent
+    cache.get(3, build(3))  # evicts 2
+    cache.get(1, build(1))
+    cache.get(2, build(2))
+    assert builds == [1, 2, 3, 2]
+    assert (cache.hits, cache.misses, len(cache)) == (2, 4, 2)
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.metadata import (
+    METADATA_COLUMNS,
+    assign_cluster_ids,
+    assign_cluster_ids_spark,
+    cluster_metadata,
+    cluster_metadata_spark,
+)
+
+ORGANIZATIONS = ["เขตบางรัก", "เขตปทุมวัน", "การไฟฟ้านครหลวง", "สำนักการโยธา"]
+
+
+def synthetic_reports(n_rows, seed):
+    # df_with_clustering.csv and cluster_info_df.csv of traffy-cluster
+    rng = np.random.default_rng(seed)
+    cluster = rng.integers(-1, 8, n_rows)
+    text_cluster = rng.integers(0, 3, n_rows).astype(float)
+    text_cluster[cluster == -1] = np.nan
+    text_cluster[rng.random(n_rows) < 0.05] = np.nan  # skipped for an empty vocabulary
+    # each cluster has one clearly most frequent organization, so no ties
+    organization = np.where(
+        rng.random(n_rows) < 0.8, np.array(ORGANIZATIONS)[cluster % 4], np.array(ORGANIZATIONS)[(cluster + 1) % 4]
+    )
+    df = pd.DataFrame(
+        {
+            "cluster": cluster.astype(str),
+            "text_cluster": text_cluster,
+            "comment": [f"ความเห็น {i}" for i in range(n_rows)],
+            "latitude": rng.uniform(13.7, 13.8, n_rows),
+            "longitude": rng.uniform(100.5, 100.6, n_rows),
+            "organization": organization,
+        }
+    )
+    df.loc[rng.random(n_rows) < 0.05, "comment"] = None
+    pairs = df.loc[df["cluster"] != "-1", ["cluster", "text_cluster"]].dropna().drop_duplicates()
+    cluster_info = pd.DataFrame(
+        {
+            "cluster_id": pairs["cluster"].astype(int).to_numpy(),
+            "text_cluster": pairs["text_cluster"].to_numpy(),
+            "cluster_desc": [f"คำอธิบาย {c}_{int(t)}" for c, t in zip(pairs["cluster"], pairs["text_cluster"])],
+        }
+    )
+    return df, cluster_info
+
+
+def concat_ws(first, second):
+    # F.concat_ws('_', first, second.cast("int")) leaves a null second out
+    return [f if pd.isna(s) else f"{f}_{int(s)}" for f, s in zip(first, second)]
+
+
+def notebook_assign_cluster_ids(df):
+    # processing-traffy.ipynb: row_number over monotonically_increasing_id
+    df = df.copy()
+    row_number = np.arange(1, len(df) + 1)
+    noise = (df["cluster"] == "-1") | df["text_cluster"].isna()
+    df["cluster"] = [f"noise_{n}" if is_noise else c for n, is_noise, c in zip(row_number, noise, df["cluster"])]
+    df["cluster_id"] = concat_ws(df["cluster"], df["text_cluster"])
+    return df.drop(columns=["cluster", "text_cluster"])
+
+
+def notebook_cluster_metadata(df, cluster_info):
+    cluster_info = cluster_info.assign(cluster_id=concat_ws(cluster_info["cluster_id"], cluster_info["text_cluster"]))
+    cluster_info = cluster_info.drop(columns="text_cluster")
+    mean_coords = df.groupby("cluster_id").agg(lat=("latitude", "mean"), lon=("longitude", "mean")).reset_index()
+    cluster_info = cluster_info.merge(mean_coords, on="cluster_id", how="right")
+
+    noise_desc = (
+        df[df["cluster_id"].str.startswith("noise_")]
+        .groupby("cluster_id")["comment"]
+        .first()
+        .rename("noise_comment")
+        .reset_index()
+    )
+    filled = cluster_info.merge(noise_desc, on="cluster_id", how="left")
+    filled["cluster_desc"] = filled["cluster_desc"].where(filled["cluster_desc"].notna(), filled["noise_comment"])
+    filled = filled.drop(columns="noise_comment")
+
+    counts = df.groupby(["cluster_id", "organization"]).size().rename("count").reset_index()
+    top = counts.sort_values("count", ascending=False).drop_duplicates("cluster_id")
+    return filled.merge(top[["cluster_id", "organization"]], on="cluster_id", how="left")
+
+
+def by_cluster_id(metadata):
+    return metadata[METADATA_COLUMNS].sort_values("cluster_id").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_assign_cluster_ids_matches_notebook(seed):
+    df, _ = synthetic_reports(500, seed)
+    expected = notebook_assign_cluster_ids(df)
+    actual = assign_cluster_ids(df)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    assert actual["cluster_id"].str.startswith("noise_").any()
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_cluster_metadata_matches_notebook(seed):
+    df, cluster_info = synthetic_reports(500, seed)
+    df = assign_cluster_ids(df)
+    expected = notebook_cluster_metadata(df, cluster_info)
+    actual = cluster_metadata(df, cluster_info)
+    pd.testing.assert_frame_equal(by_cluster_id(actual), by_cluster_id(expected), check_dtype=False)
+
+
+@pytest.fixture(scope="module")
+def spark():
+    pytest.importorskip("pyspark")
+    from pyspark.sql import SparkSession
+
+    session = SparkSession.builder.master("local[3]").appName("test_metadata").getOrCreate()
+    yield session
+    session.stop()
+
+
+def to_spark(spark, df, schema):
+    # NaN -> null, as Spark reads missing CSV fields
+    records = df.astype(object).where(df.notna(), None).to_records(index=False).tolist()
+    return spark.createDataFrame(records, schema)
+
+
+REPORT_SCHEMA = (
+    "cluster string, text_cluster double, comment string, latitude double, longitude double, organization string"
+)
+
+
+def test_assign_cluster_ids_spark_matches_pandas(spark):
+    df, _ = synthetic_reports(500, 0)
+    # several partitions, so the numbering has to add up their counts
+    spark_df = to_spark(spark, df, REPORT_SCHEMA)
+    assert spark_df.rdd.getNumPartitions() > 1
+    actual = assign_cluster_ids_spark(spark_df).toPandas()
+    assert actual["cluster_id"].tolist() == assign_cluster_ids(df)["cluster_id"].tolist()
+
+
+def test_cluster_metadata_spark_matches_pandas(spark):
+    df, cluster_info = synthetic_reports(500, 1)
+    df = assign_cluster_ids(df)
+    spark_df = to_spark(
+        spark, df, "comment string, latitude double, longitude double, organization string, cluster_id string"
+    )
+    spark_info = to_spark(spark, cluster_info, "cluster_id long, text_cluster double, cluster_desc string")
+    actual = cluster_metadata_spark(spark_df, spark_info).toPandas()
+    pd.testing.assert_frame_equal(
+        by_cluster_id(actual), by_cluster_id(cluster_metadata(df, cluster_info)), check_dtype=False
+    )
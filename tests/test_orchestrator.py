@@ -0,0 +1,136 @@
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline import storage
+from pipeline.ingest import RAW_COLUMNS
+from pipeline.orchestrator import Stage, run_pipeline
+from pipeline.stages import build_stages
+
+
+def toy_stages(source, calls, scale=2):
+    def run_load(out_dir, inputs):
+        calls.append("load")
+        with open(source) as f, open(os.path.join(out_dir, "numbers.txt"), "w") as out:
+            out.write(f.read())
+
+    def run_scaled(out_dir, inputs, scale):
+        calls.append("scaled")
+        with open(os.path.join(inputs["load"], "numbers.txt")) as f:
+            numbers = [int(line) * scale for line in f]
+        with open(os.path.join(out_dir, "numbers.txt"), "w") as out:
+            out.write("\n".join(map(str, numbers)))
+
+    def run_total(out_dir, inputs):
+        calls.append("total")
+        with open(os.path.join(inputs["scaled"], "numbers.txt")) as f:
+            total = sum(int(line) for line in f)
+        with open(os.path.join(out_dir, "total.txt"), "w") as out:
+            out.write(str(total))
+
+    def run_other(out_dir, inputs):
+        calls.append("other")
+
+    return [
+        Stage("load", run_load, files=[source]),
+        Stage("scaled", run_scaled, ["load"], {"scale": scale}),
+        Stage("total", run_total, ["scaled"]),
+        Stage("other", run_other),
+    ]
+
+
+def read_total(results):
+    with open(os.path.join(results["total"]["path"], "total.txt")) as f:
+        return int(f.read())
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "numbers.txt"
+    path.write_text("1\n2\n3\n")
+    return str(path)
+
+
+def test_unchanged_stages_are_cached(tmp_path, source):
+    calls = []
+    first = run_pipeline(toy_stages(source, calls), str(tmp_path / "work"))
+    assert sorted(calls) == ["load", "other", "scaled", "total"]
+    assert read_total(first) == 12
+
+    calls.clear()
+    second = run_pipeline(toy_stages(source, calls), str(tmp_path / "work"))
+    assert calls == []
+    assert all(info["cached"] for info in second.values())
+    assert {name: info["path"] for name, info in second.items()} == {
+        name: info["path"] for name, info in first.items()
+    }
+
+
+def test_a_parameter_reruns_its_stage_and_what_reads_it(tmp_path, source):
+    calls = []
+    run_pipeline(toy_stages(source, calls), str(tmp_path / "work"))
+    calls.clear()
+    results = run_pipeline(toy_stages(source, calls, scale=3), str(tmp_path / "work"))
+    assert sorted(calls) == ["scaled", "total"]
+    assert results["load"]["cached"] and results["other"]["cached"]
+    assert read_total(results) == 18
+
+    # the old outputs are still there, so going back is free
+    calls.clear()
+    results = run_pipeline(toy_stages(source, calls, scale=2), str(tmp_path / "work"))
+    assert calls == []
+    assert read_total(results) == 12
+
+
+def test_a_changed_input_file_reruns_everything_downstream(tmp_path, source):
+    calls = []
+    run_pipeline(toy_stages(source, calls), str(tmp_path / "work"))
+    calls.clear()
+    with open(source, "a") as f:
+        f.write("4\n")
+    results = run_pipeline(toy_stages(source, calls), str(tmp_path / "work"))
+    assert sorted(calls) == ["load", "scaled", "total"]
+    assert read_total(results) == 20
+
+
+def test_targets_and_force(tmp_path, source):
+    calls = []
+    results = run_pipeline(toy_stages(source, calls), str(tmp_path / "work"), targets=["scaled"])
+    assert sorted(calls) == ["load", "scaled"]
+    assert set(results) == {"load", "scaled"}
+
+    calls.clear()
+    run_pipeline(toy_stages(source, calls), str(tmp_path / "work"), targets=["total"], force=["scaled"])
+    assert sorted(calls) == ["scaled", "total"]
+
+
+def test_a_failed_stage_is_not_cached(tmp_path, source):
+    def run_broken(out_dir, inputs):
+        raise RuntimeError("broken")
+
+    stages = toy_stages(source, []) + [Stage("broken", run_broken, ["load"])]
+    with pytest.raises(RuntimeError):
+        run_pipeline(stages, str(tmp_path / "work"), targets=["broken"], max_workers=1)
+    # only the unpublished .tmp directory is left, which the next run clears
+    assert all(name.endswith(".tmp") for name in os.listdir(tmp_path / "work" / "broken"))
+
+
+def test_spatial_stage_keeps_the_raw_comments(tmp_path):
+    rows = [
+        {"ticket_id": "a", "comment": "ถนน<br>ชำรุด!! 123", "coords": "100.5,13.7"},
+        {"ticket_id": "b", "comment": "ไฟดับ\nครับ", "coords": "100.5,13.7"},
+        {"ticket_id": "c", "comment": "ขยะ", "coords": ""},
+    ]
+    raw = pd.DataFrame(rows).reindex(columns=RAW_COLUMNS)
+    raw[["organization", "state"]] = "เขต", "เสร็จสิ้น"
+    raw[["timestamp", "last_activity"]] = "2024-01-01 00:00:00+00"
+    raw_path = tmp_path / "raw.csv"
+    raw.to_csv(raw_path, index=False)
+
+    stages = build_stages(str(raw_path), zone_points=str(raw_path), n_jobs=1)
+    results = run_pipeline(stages, str(tmp_path / "work"), targets=["spatial"])
+    df = storage.read_stage(os.path.join(results["spatial"]["path"], "table"))
+    assert df["ticket_id"].tolist() == ["a", "b"]  # no coordinates, no clustering
+    assert df["comment"].tolist() == ["ถนน<br>ชำรุด!! 123", "ไฟดับ\nครับ"]
+    assert df["clean_comment"].tolist() == ["ถนนbrชำรุด 123", "ไฟดับ ครับ"]
@@ -0,0 +1,156 @@
+import json
+import random
+
+import pytest
+
+from pipeline.osm_zones import (
+    AhoCorasick,
+    ZoneMatcher,
+    element_location,
+    extract_zone_points,
+    iter_tiled_elements,
+    local_fetch,
+    tiles,
+)
+from pipeline.zones import BANGKOK_BBOX, ZONES
+
+OTHER_TAGS = {
+    "name": ["ซอยสุขุมวิท 11", "Wat Pho", "7-Eleven", "Central World"],
+    "highway": ["residential", "primary", "footway", "bus_stop"],
+    "amenity": ["bench", "toilets", "cafe", "Restaurant", "school", "place_of_worship"],
+    "building": ["yes", "house", "commercial", "apartments"],
+}
+
+
+def notebook_zone(tags):
+    # the zone test of extract_tagged_zone_points in api_for_zone_module.ipynb
+    for zone, keywords in ZONES.items():
+        if any(
+            kw in str(tags.get(k, "")).lower() or k.lower() in keywords
+            for k, v in tags.items()
+            for kw in keywords
+        ):
+            return zone
+    return None
+
+
+def random_tags(rng):
+    keywords = [kw for words in ZONES.values() for kw in words]
+    tags = {}
+    for _ in range(rng.randint(0, 4)):
+        key = rng.choice(list(OTHER_TAGS))
+        tags[key] = rng.choice(OTHER_TAGS[key])
+    if rng.random() < 0.3:
+        tags[rng.choice(["leisure", "landuse", "shop", "Tourism"])] = rng.choice(keywords).upper()
+    if rng.random() < 0.1:
+        tags[rng.choice(keywords)] = "yes"
+    if rng.random() < 0.05:
+        tags["levels"] = rng.randint(1, 9)  # not a string
+    return tags
+
+
+def test_zone_matcher_matches_notebook():
+    rng = random.Random(0)
+    matcher = ZoneMatcher()
+    for _ in range(5000):
+        tags = random_tags(rng)
+        assert matcher.zone(tags) == notebook_zone(tags), tags
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick({"he": 1, "she": 2, "his": 4, "hers": 8})
+    assert automaton.search("ushers") == 1 | 2 | 8
+    assert automaton.search("this") == 4
+    assert automaton.search("xyz") == 0
+
+
+@pytest.mark.parametrize(
+    "bbox, tile_size, n_tiles",
+    [(BANGKOK_BBOX, 0.1, 84), ((0.0, 0.0, 0.7, 0.3), 0.1, 21), ((0.0, 0.0, 0.25, 0.25), 0.1, 9)],
+)
+def test_tiles_cover_bbox_without_slivers(bbox, tile_size, n_tiles):
+    south, west, north, east = bbox
+    grid = list(tiles(bbox, tile_size))
+    assert len(grid) == n_tiles
+    assert min(t[0] for t in grid) == south and max(t[2] for t in grid) == north
+    assert min(t[1] for t in grid) == west and max(t[3] for t in grid) == east
+    # rows and columns meet edge to edge
+    assert {t[2] for t in grid} - {north} <= {t[0] for t in grid}
+    assert {t[3] for t in grid} - {east} <= {t[1] for t in grid}
+    for t in grid:
+        assert t[2] - t[0] > tile_size / 2 or t[2] == north
+        assert t[3] - t[1] > tile_size / 2 or t[3] == east
+
+
+@pytest.fixture
+def extract(tmp_path):
+    rng = random.Random(1)
+    south, west, north, east = BANGKOK_BBOX
+    elements = []
+    for i in range(3000):
+        # some outside the bbox, some right on tile borders
+        lat = round(rng.uniform(south - 0.01, north + 0.01), rng.choice([1, 2, 7]))
+        lon = round(rng.uniform(west - 0.01, east + 0.01), rng.choice([1, 2, 7]))
+        if rng.random() < 0.6:
+            element = {"type": "node", "id": i, "lat": lat, "lon": lon}
+        else:
+            half_lat, half_lon = rng.uniform(0, 0.15), rng.uniform(0, 0.15)
+            element = {
+                "type": rng.choice(["way", "relation"]),
+                "id": i,
+                "bounds": {
+                    "minlat": lat - half_lat,
+                    "minlon": lon - half_lon,
+                    "maxlat": lat + half_lat,
+                    "maxlon": lon + half_lon,
+                },
+                "center": {"lat": lat, "lon": lon},
+            }
+        element["tags"] = random_tags(rng)
+        elements.append(element)
+    # a long way reaching into the bbox from the south, returned by several tiles
+    elements.append(
+        {
+            "type": "way",
+            "id": 10**6,
+            "bounds": {"minlat": south - 0.3, "minlon": west + 0.2, "maxlat": south + 0.05, "maxlon": west + 0.25},
+            "center": {"lat": south - 0.125, "lon": west + 0.225},
+            "tags": {"highway": "primary"},
+        }
+    )
+    path = tmp_path / "extract.json"
+    path.write_text(json.dumps({"elements": elements}))
+    return str(path)
+
+
+def key(element):
+    return element["type"], element["id"]
+
+
+@pytest.mark.parametrize("tile_size", [0.1, 0.07])
+def test_tiled_elements_match_whole_bbox(extract, tile_size):
+    fetch = local_fetch(extract)
+    whole = list(fetch(BANGKOK_BBOX))
+    tiled = list(iter_tiled_elements(tile_size=tile_size, fetch=fetch))
+    assert sorted(map(key, tiled)) == sorted(map(key, whole))
+    assert ("way", 10**6) in set(map(key, tiled))
+    assert sorted(extract_zone_points(tiled)) == sorted(extract_zone_points(whole))
+
+
+def test_crossing_elements_once_whichever_tiles_return_them():
+    # 3 x 3 tiles of 0.1 degree; Overpass returns a way from the tiles its
+    # geometry touches, which need not include the tile of its bbox center
+    bbox = (0.0, 0.0, 0.3, 0.3)
+    way = {"type": "way", "id": 1, "bounds": {"minlat": 0.05, "minlon": 0.05, "maxlat": 0.25, "maxlon": 0.15}}
+    border_node = {"type": "node", "id": 2, "lat": 0.1, "lon": 0.25}
+    inner_node = {"type": "node", "id": 3, "lat": 0.15, "lon": 0.25}
+    returned_by = {0: [way], 2: [border_node], 3: [way], 5: [border_node, inner_node], 6: [way], 7: [way]}
+    tile_list = list(tiles(bbox, 0.1))
+
+    def fetch(tile):
+        return returned_by.get(tile_list.index(tile), [])
+
+    elements = list(iter_tiled_elements(bbox, 0.1, fetch))
+    assert sorted(map(key, elements)) == [("node", 2), ("node", 3), ("way", 1)]
+    # no center: the location is the center of the bounds
+    assert element_location(way) == (0.15, 0.1)
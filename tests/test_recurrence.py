@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.recurrence import RecurrenceState, count_problems, count_problems_rows, prepare_reports
+
+STATES = ["เสร็จสิ้น", "กำลังดำเนินการ", "รอรับเรื่อง"]
+
+
+def synthetic_history(n_reports, n_clusters, seed):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2021-08-01", tz="UTC").value
+    day = 24 * 3600 * 10**9
+    timestamp = start + rng.integers(0, 365 * day, n_reports)
+    # mostly closed within days, some open for months, some ties
+    duration = (rng.exponential(5, n_reports) * day).astype(np.int64)
+    duration[rng.random(n_reports) < 0.05] *= 30
+    timestamp[rng.random(n_reports) < 0.05] = start
+    last_activity = timestamp + duration
+
+    cluster = rng.zipf(1.6, n_reports) % n_clusters
+    cluster_id = np.char.add(np.char.add(cluster.astype(str), "_"), rng.integers(0, 3, n_reports).astype(str))
+    cluster_id[rng.random(n_reports) < 0.1] = "noise_1"
+
+    def iso(values):
+        return pd.to_datetime(values, utc=True).strftime("%Y-%m-%d %H:%M:%S.%f+00")
+
+    return pd.DataFrame(
+        {
+            "cluster_id": cluster_id,
+            "timestamp": iso(timestamp),
+            "last_activity": iso(last_activity),
+            "state": rng.choice(STATES, n_reports),
+        }
+    )
+
+
+def notebook_counts(history):
+    # count_problems from Algo_Computing.ipynb, one Python loop per cluster
+    rows = []
+    for cluster_id, reports in prepare_reports(history).groupby("cluster_id"):
+        pairs = zip(reports["timestamp_ts"], reports["last_activity_ts"])
+        rows.append((cluster_id, count_problems_rows(pairs), reports["state"].iloc[-1]))
+    return pd.DataFrame(rows, columns=["cluster_id", "num_times", "status"])
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_count_problems_matches_notebook(seed):
+    history = synthetic_history(5000, 300, seed)
+    pd.testing.assert_frame_equal(count_problems(history), notebook_counts(history), check_dtype=False)
+
+
+@pytest.mark.parametrize("n_batches", [1, 7, 40])
+def test_incremental_matches_batch(n_batches):
+    history = synthetic_history(5000, 300, seed=n_batches)
+    expected = count_problems(history).sort_values("cluster_id").reset_index(drop=True)
+
+    # batches in filing order, with some reports arriving a batch late
+    rng = np.random.default_rng(0)
+    history = history.sort_values(["timestamp", "last_activity"], kind="stable")
+    batch_of = np.arange(len(history)) * n_batches // len(history)
+    late = rng.random(len(history)) < 0.02
+    batch_of[late] = np.minimum(batch_of[late] + 1, n_batches - 1)
+
+    state = RecurrenceState()
+    seen = []
+    for i in range(n_batches):
+        batch = history[batch_of == i]
+        seen.append(batch)
+        stale = state.apply(batch)
+        if stale:
+            state.rebuild(pd.concat(seen), stale)
+
+    pd.testing.assert_frame_equal(state.results(), expected, check_dtype=False)
+
+
+def test_state_round_trip(tmp_path):
+    history = synthetic_history(2000, 100, seed=3)
+    ordered = history.sort_values(["timestamp", "last_activity"], kind="stable")
+    half = len(ordered) // 2
+
+    state = RecurrenceState()
+    state.apply(ordered.iloc[:half])
+    path = str(tmp_path / "recurrence.parquet")
+    state.save(path)
+
+    resumed = RecurrenceState.load(path)
+    assert not resumed.apply(ordered.iloc[half:])
+    expected = count_problems(history).sort_values("cluster_id").reset_index(drop=True)
+    pd.testing.assert_frame_equal(resumed.results(), expected, check_dtype=False)
+
+
+def test_late_report_is_rebuilt():
+    history = pd.DataFrame(
+        {
+            "cluster_id": ["1_0", "1_0", "1_0"],
+            "timestamp": ["2022-01-01 00:00:00+00", "2022-03-01 00:00:00+00", "2022-01-05 00:00:00+00"],
+            "last_activity": ["2022-01-10 00:00:00+00", "2022-03-02 00:00:00+00", "2022-01-06 00:00:00+00"],
+            "state": ["เสร็จสิ้น", "เสร็จสิ้น", "รอรับเรื่อง"],
+        }
+    )
+    state = RecurrenceState()
+    state.apply(history.iloc[:2])
+    assert state.apply(history.iloc[2:]) == {"1_0"}
+    state.rebuild(history, {"1_0"})
+    pd.testing.assert_frame_equal(state.results(), count_problems(history), check_dtype=False)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from pipeline.spatial_cluster import EPS, dbscan, partitioned_dbscan
+
+
+def synthetic_coords(n_points, seed):
+    rng = np.random.default_rng(seed)
+    south, west = 13.70, 100.50
+    n_spots = max(n_points // 40, 1)
+    spots = np.c_[rng.uniform(south, south + 0.03, n_spots), rng.uniform(west, west + 0.03, n_spots)]
+    # some hot spots sit right on tile borders (multiples of the tile size)
+    spots[::4] = np.round(spots[::4] / 0.005) * 0.005
+    n_noise = n_points // 5
+    clustered = spots[rng.integers(0, n_spots, n_points - n_noise)] + rng.normal(0, 0.0001, (n_points - n_noise, 2))
+    noise = np.c_[rng.uniform(south, south + 0.03, n_noise), rng.uniform(west, west + 0.03, n_noise)]
+    coords = np.r_[clustered, noise]
+    return coords[rng.permutation(len(coords))]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("tile_size", [0.005, 0.02])
+def test_partitioned_dbscan_matches_sklearn(seed, tile_size):
+    coords = synthetic_coords(4000, seed)
+    expected = dbscan(coords)
+    labels = partitioned_dbscan(coords, tile_size=tile_size, n_jobs=2)
+    # same labels, not just the same partition: clusters are numbered alike
+    np.testing.assert_array_equal(labels, expected)
+    assert (expected >= 0).any() and (expected == -1).any()
+
+
+def test_partitioned_dbscan_min_samples():
+    coords = synthetic_coords(2000, seed=2)
+    for min_samples in [1, 5, 20]:
+        np.testing.assert_array_equal(
+            partitioned_dbscan(coords, EPS, min_samples, tile_size=0.005, n_jobs=1), dbscan(coords, EPS, min_samples)
+        )
+
+
+def test_partitioned_dbscan_empty():
+    assert len(partitioned_dbscan(np.empty((0, 2)))) == 0
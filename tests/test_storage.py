@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from pipeline.storage import MANIFEST, export_csv, iter_stage, read_manifest, read_stage, write_stage
+
+
+def synthetic_stage(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "cluster_id": [f"{c}_{t}" for c, t in zip(rng.integers(0, 50, n_rows), rng.integers(0, 3, n_rows))],
+            "state": rng.choice(["รอรับเรื่อง", "กำลังดำเนินการ", "เสร็จสิ้น"], n_rows),
+            "lat": rng.uniform(13.7, 13.8, n_rows),
+            "count": rng.integers(0, 1000, n_rows),
+            "timestamp": pd.to_datetime(rng.integers(1.6e9, 1.7e9, n_rows), unit="s", utc=True),
+        }
+    )
+
+
+def sorted_rows(df):
+    return df.sort_values(["cluster_id", "lat"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("partition_cols", [(), ("state",)])
+def test_round_trip_keeps_rows_and_types(tmp_path, partition_cols):
+    df = synthetic_stage(2000)
+    path = str(tmp_path / "stage")
+    manifest = write_stage(df, path, partition_cols=partition_cols, info={"eps": 0.5}, rows_per_group=256)
+
+    actual = read_stage(path)[df.columns]
+    if partition_cols:
+        actual["state"] = actual["state"].astype(str)
+    pd.testing.assert_frame_equal(sorted_rows(actual), sorted_rows(df), check_dtype=not partition_cols)
+    assert actual["timestamp"].dt.tz is not None and actual["count"].dtype == np.int64
+
+    assert manifest["rows"] == sum(entry["rows"] for entry in manifest["files"]) == len(df)
+    assert manifest["partition_cols"] == list(partition_cols)
+    assert manifest["info"] == {"eps": 0.5}
+    assert all(os.path.exists(os.path.join(path, entry["path"])) for entry in manifest["files"])
+    assert read_manifest(path)["schema"].equals(pa.Schema.from_pandas(df, preserve_index=False))
+
+
+def test_columns_and_filters(tmp_path):
+    df = synthetic_stage(2000)
+    path = str(tmp_path / "stage")
+    write_stage(df, path, partition_cols=["state"])
+    actual = read_stage(path, columns=["cluster_id", "count"], filters=[("state", "=", "เสร็จสิ้น"), ("count", "<", 100)])
+    expected = df.loc[(df["state"] == "เสร็จสิ้น") & (df["count"] < 100), ["cluster_id", "count"]]
+    assert list(actual.columns) == ["cluster_id", "count"]
+    assert sorted(actual.itertuples(index=False)) == sorted(expected.itertuples(index=False))
+
+
+def test_streamed_batches_round_trip(tmp_path):
+    df = synthetic_stage(3000)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    path = str(tmp_path / "stage")
+    manifest = write_stage(iter(table.to_batches(max_chunksize=100)), path, schema=table.schema, rows_per_group=500)
+    pd.testing.assert_frame_equal(read_stage(path), df)
+    assert manifest["rows"] == len(df)
+    assert sum(batch.num_rows for batch in iter_stage(path, batch_size=700)) == len(df)
+
+
+def test_empty_stage_keeps_its_schema(tmp_path):
+    df = synthetic_stage(0)
+    path = str(tmp_path / "stage")
+    write_stage(df, path)
+    actual = read_stage(path)
+    assert len(actual) == 0 and list(actual.columns) == list(df.columns)
+
+
+def test_rewrite_replaces_the_old_output(tmp_path):
+    path = str(tmp_path / "stage")
+    write_stage(synthetic_stage(2000, seed=0), path, partition_cols=["state"])
+    df = synthetic_stage(50, seed=1)
+    write_stage(df, path)
+    pd.testing.assert_frame_equal(read_stage(path), df)
+    assert sorted(os.listdir(tmp_path)) == ["stage"]  # no .tmp or .old left
+
+
+def test_unfinished_stage_is_not_read(tmp_path):
+    path = str(tmp_path / "stage")
+    write_stage(synthetic_stage(10), path)
+    os.remove(os.path.join(path, MANIFEST))
+    with pytest.raises(FileNotFoundError):
+        read_stage(path)
+
+
+def test_export_csv(tmp_path):
+    df = synthetic_stage(500)
+    path = str(tmp_path / "stage")
+    write_stage(df, path)
+    out = str(tmp_path / "cluster_data.csv")
+    count = export_csv(path, out, columns=["cluster_id", "lat"], rename={"lat": "latitude"})
+    exported = pd.read_csv(out)
+    assert count == len(df) and list(exported.columns) == ["cluster_id", "latitude"]
+    np.testing.assert_allclose(exported["latitude"], df["lat"])
+
+    assert export_csv(path, out, filters=[("count", "<", 0)]) == 0
+    assert list(pd.read_csv(out).columns) == list(df.columns)
@@ -0,0 +1,80 @@
+import re
+
+import pytest
+
+from pipeline.text_clean import clean_comment, clean_sentences, normalize_sentence, remove_list
+
+pytest.importorskip("pythainlp")
+
+SENTENCES = [
+    "ไฟดับหน้าบ้านครับ ช่วยด้วยค่ะ",
+    "ถนนชำรุด<br>หลุมใหญ่มาก!! https://t.co/AbC ดูด้วย",
+    "แจ้ง  ขยะเยอะมาก\n\tซ.5 ทางเท้า 123/4 me@mail.com",
+    "<a href='x'>ลิงก์</a>www.bangkok.go.th น้ำท่วมซอย　BTS",
+    "Traffy @BMA รบกวนตรวจสอบ 😡 İstanbul ก.ม.",
+    "",
+    "   ",
+    "ไฟดับหน้าบ้านครับ ช่วยด้วยค่ะ",  # follow-ups repeat a comment
+    None,
+    12345,
+]
+
+
+def notebook_clean_sentence(sentence, remove_stopwords=False):
+    # clean_sentence from traffy-cluster.ipynb
+    from pythainlp.corpus import thai_stopwords
+    from pythainlp.tokenize import word_tokenize
+
+    sentence = sentence.lower()
+    sentence = re.sub(r'<.*?>', '', sentence)
+    sentence = re.sub(r'http\S+|www\S+|https\S+', '', sentence)
+    sentence = re.sub(r'\S*@\S*', '', sentence)
+    sentence = re.sub(r'[^a-zA-Zก-ฮะ-์\s]', '', sentence)
+    sentence = re.sub(r'\s+', ' ', sentence).strip()
+    tokens = word_tokenize(sentence)
+    if remove_stopwords:
+        stop_words = set(thai_stopwords())
+        tokens = [word for word in tokens if word not in stop_words and word not in remove_list]
+    return ' '.join(tokens)
+
+
+def notebook_clean_text(text):
+    # clean_text from DataPreparation(spark).ipynb
+    if text:
+        text = re.sub(r'\n', ' ', text)
+        text = re.sub(r'[^\u0E00-\u0E7Fa-zA-Z0-9\s]', '', text)
+        return text.strip()
+    return ""
+
+
+@pytest.mark.parametrize("remove_stopwords", [False, True])
+def test_clean_sentences_matches_notebook(remove_stopwords):
+    expected = [notebook_clean_sentence(str(s), remove_stopwords) for s in SENTENCES]
+    assert clean_sentences(SENTENCES, remove_stopwords) == expected
+
+
+def test_clean_sentences_in_a_pool_matches_notebook():
+    sentences = SENTENCES * 30
+    expected = [notebook_clean_sentence(str(s)) for s in sentences]
+    assert clean_sentences(sentences, n_jobs=2, chunk_size=64) == expected
+
+
+@pytest.mark.parametrize("sentence", [s for s in SENTENCES if isinstance(s, str)])
+def test_normalize_sentence_matches_notebook_patterns(sentence):
+    expected = sentence.lower()
+    for pattern in [r'<.*?>', r'http\S+|www\S+|https\S+', r'\S*@\S*', r'[^a-zA-Zก-ฮะ-์\s]']:
+        expected = re.sub(pattern, '', expected)
+    assert normalize_sentence(sentence) == re.sub(r'\s+', ' ', expected).strip()
+
+
+@pytest.mark.parametrize("text", [s for s in SENTENCES if isinstance(s, str)] + [None])
+def test_clean_comment_matches_notebook(text):
+    assert clean_comment(text) == notebook_clean_text(text)
+
+
+def test_dictionary_words_with_a_space_are_kept_whole():
+    # "ข้าง ๆ" is one dictionary word, so the chunks around its space can't
+    # be tokenized apart
+    sentences = ["เดินข้าง ๆ บ้าน", "ข้าง ๆ", "บ้าน ข้าง ๆ ถนน", "ข้าง บ้าน", "ข้าง ๆ บ้าน"] * 2
+    expected = [notebook_clean_sentence(s) for s in sentences]
+    assert clean_sentences(sentences) == expected
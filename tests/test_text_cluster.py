@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from pipeline import text_cluster
+from pipeline.text_cluster import cluster_texts, dense_bytes
+
+WORDS = ["ไฟดับ", "ถนน", "หลุม", "ขยะ", "น้ำท่วม", "ซอย", "บ้าน", "ทางเท้า", "ชำรุด", "สายไฟ", "ต้นไม้", "รถ"]
+
+
+def synthetic_cluster(n_rows, seed, n_types, topic_scale):
+    # comments on a few topics; one type and close topics make one component
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(20, 384)) * topic_scale
+    embeddings = topics[rng.integers(0, 20, n_rows)] + rng.normal(scale=0.8, size=(n_rows, 384))
+    type_embeddings = rng.normal(size=(n_types, 384))[rng.integers(0, n_types, n_rows)]
+    vocabulary = WORDS + [f"ซอย{i}" for i in range(500)]
+    ner_features = [" ".join(rng.choice(vocabulary, 5)) for _ in range(n_rows)]
+    return embeddings.astype(np.float32), type_embeddings.astype(np.float32), ner_features
+
+
+def assert_same_partition(labels, expected):
+    # label numbers may differ between the modes, the groups may not
+    pairs = np.unique(np.c_[labels, expected], axis=0)
+    assert len(pairs) == len(np.unique(labels)) == len(np.unique(expected))
+
+
+@pytest.mark.parametrize("memory_limit", [dense_bytes(60), 20_000])
+def test_graph_mode_splits_components_like_the_dense_path(memory_limit):
+    features = synthetic_cluster(300, seed=0, n_types=8, topic_scale=1.0)
+    expected = cluster_texts(*features)
+    labels = cluster_texts(*features, memory_limit=memory_limit)
+    assert_same_partition(labels, expected)
+    assert 1 < len(np.unique(expected)) < 300
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_graph_mode_links_one_big_component_like_the_dense_path(seed, monkeypatch):
+    calls = []
+    cluster_knn = text_cluster._cluster_knn
+    monkeypatch.setattr(text_cluster, "_cluster_knn", lambda *args: calls.append(1) or cluster_knn(*args))
+
+    features = synthetic_cluster(200, seed=seed, n_types=1, topic_scale=0.65)
+    expected = cluster_texts(*features)
+    labels = cluster_texts(*features, memory_limit=20_000)
+    assert calls  # the component was too big for its dense matrix
+    assert_same_partition(labels, expected)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from pipeline.zones import ZONES, ZoneRaster
+from zone_lookup import ZoneLookup
+
+sklearn_neighbors = pytest.importorskip("sklearn.neighbors")
+
+BBOX = (13.70, 100.50, 13.80, 100.60)  # south, west, north, east
+
+
+def synthetic_zone_points(n_points, seed):
+    rng = np.random.default_rng(seed)
+    south, west, north, east = BBOX
+    n_areas = max(n_points // 50, 1)
+    areas = np.column_stack([rng.uniform(south, north, n_areas), rng.uniform(west, east, n_areas)])
+    area = rng.integers(0, n_areas, n_points)
+    coords = areas[area] + rng.normal(0, 0.003, (n_points, 2))
+    # mostly the area's zone, some mixed in
+    area_zone = rng.integers(0, len(ZONES), n_areas)
+    zone = np.where(rng.random(n_points) < 0.8, area_zone[area], rng.integers(0, len(ZONES), n_points))
+    return coords, np.array(list(ZONES), dtype=object)[zone]
+
+
+def random_locations(n, seed):
+    rng = np.random.default_rng(seed)
+    south, west, north, east = BBOX
+    # some outside the raster, which fall back to the exact query
+    return rng.uniform(south - 0.02, north + 0.02, n), rng.uniform(west - 0.02, east + 0.02, n)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("cell_size", [0.0005, 0.002])
+def test_raster_matches_knn(seed, cell_size):
+    coords, zone = synthetic_zone_points(2000, seed)
+    knn = sklearn_neighbors.KNeighborsClassifier(n_neighbors=1).fit(coords, zone)
+    raster = ZoneRaster.from_points(coords[:, 0], coords[:, 1], zone, bbox=BBOX, cell_size=cell_size)
+    assert 0 < raster.ambiguous_fraction < 1
+
+    lat, lon = random_locations(50000, seed)
+    np.testing.assert_array_equal(raster.predict(lat, lon), knn.predict(np.column_stack([lat, lon])))
+    # the notebook's test point and the training points themselves
+    np.testing.assert_array_equal(raster.predict(coords[:, 0], coords[:, 1]), zone)
+
+
+def test_unknown_zone_names_are_kept():
+    coords, zone = synthetic_zone_points(500, seed=2)
+    zone[:10] = "โซนใหม่"
+    raster = ZoneRaster.from_points(coords[:, 0], coords[:, 1], zone, bbox=BBOX, cell_size=0.002)
+    assert raster.predict(coords[:10, 0], coords[:10, 1]).tolist() == ["โซนใหม่"] * 10
+
+
+def test_save_load(tmp_path):
+    coords, zone = synthetic_zone_points(500, seed=3)
+    raster = ZoneRaster.from_points(coords[:, 0], coords[:, 1], zone, bbox=BBOX, cell_size=0.002)
+    path = str(tmp_path / "zone_raster.npz")
+    raster.save(path)
+    loaded = ZoneRaster.load(path)
+    lat, lon = random_locations(5000, seed=3)
+    np.testing.assert_array_equal(loaded.predict(lat, lon), raster.predict(lat, lon))
+    assert loaded.bbox == raster.bbox and loaded.cell_size == raster.cell_size
+
+
+def test_dashboard_lookup_reads_the_raster(tmp_path):
+    coords, zone = synthetic_zone_points(500, seed=4)
+    raster = ZoneRaster.from_points(coords[:, 0], coords[:, 1], zone, bbox=BBOX, cell_size=0.002)
+    path = str(tmp_path / "zone_raster.npz")
+    raster.save(path)
+    lat, lon = random_locations(5000, seed=4)
+    np.testing.assert_array_equal(ZoneLookup.load(path).predict(lat, lon), raster.predict(lat, lon))